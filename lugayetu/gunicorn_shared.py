@@ -0,0 +1,65 @@
+"""
+Configuration Gunicorn pour servir plusieurs workers avec une seule copie des poids.
+
+Les modèles sont chargés une fois dans le processus maître (preload_app), puis
+les workers sont créés par fork : les pages des poids restent partagées en
+copie à l'écriture, car l'inférence ne les modifie jamais. Avec
+MODEL_MMAP_WEIGHTS=true, les poids sont en plus projetés depuis le fichier
+safetensors, donc partagés via le cache de pages même sans preload.
+
+Usage :
+    gunicorn -c python:lugayetu.gunicorn_shared
+
+Mesure de la mémoire par worker : python manage.py benchmark_workers
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import torch
+
+os.environ.setdefault('MODEL_MMAP_WEIGHTS', 'true')
+# Métriques Prometheus partagées entre workers : le dossier est défini avant tout import de
+# prometheus_client et vidé avant le préchargement, pour ne pas agréger un lancement précédent
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'lugayetu-prometheus'))
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+# Pas de pool OpenMP dans le maître (qui charge l'application avant le fork) :
+# un pool créé avant le fork n'est pas réutilisable par les workers
+torch.set_num_threads(1)
+
+cpu_count = multiprocessing.cpu_count()
+
+wsgi_app = 'lugayetu.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = 300
+graceful_timeout = 120
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+# Avec preload, le maître charge les modèles avant le fork : les workers démarrent prêts et
+# partagent les poids. Sans preload, chaque worker les charge en arrière-plan (voir /readyz)
+os.environ.setdefault('TRANSLATION_WARMUP', 'blocking' if preload_app else 'background')
+
+# Threads torch par worker : les cœurs sont répartis entre les workers
+torch_threads = int(os.environ.get('TORCH_THREADS_PER_WORKER', max(1, cpu_count // workers)))
+
+
+def when_ready(server):
+    # Les objets chargés par le maître passent dans la génération permanente du GC :
+    # les collectes des workers ne réécrivent plus leurs en-têtes, les pages restent partagées
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    torch.set_num_threads(torch_threads)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -82,6 +82,7 @@ JAZMIN_UI_TWEAKS = {
 }
 
 MIDDLEWARE = [
+    'translator.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -136,6 +137,26 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Niveau partagé du cache des traductions, commun à tous les workers Gunicorn
+if os.environ.get('TRANSLATION_CACHE_LOCATION'):
+    CACHES['translations'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('TRANSLATION_CACHE_LOCATION'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('TRANSLATION_CACHE_MAX_ENTRIES', '100000')),
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -3,12 +3,17 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from translator.views import healthz_view, metrics_view, readyz_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),
     path('', include('core.urls')),
     path('translator/', include('translator.urls')),
     path('contribution/', include('contribution.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('healthz', healthz_view, name='healthz'),
+    path('readyz', readyz_view, name='readyz'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 handler404 = 'core.views.error_404'
@@ -0,0 +1,169 @@
+import contextlib
+import os
+import threading
+import time
+import logging
+
+from django.core import signing
+
+from .inference import PRIORITIES, AdmissionRefused, request_deadline, request_priority
+from .metrics import ADMISSIONS
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HEADER = 'X-Translation-Priority'
+# Jeton signé rendu dans la page du traducteur, seul moyen d'obtenir la classe interactive
+PAGE_TOKEN_HEADER = 'X-Translation-Page-Token'
+PAGE_TOKEN_SALT = 'translator.admission.page'
+
+
+class QuotaExceeded(AdmissionRefused):
+    """Le client a déjà trop de requêtes, ou de tokens, en cours de traduction"""
+
+
+def page_token(client):
+    """Jeton de la page du traducteur, signé par le serveur pour ce client (client_key)"""
+    return signing.TimestampSigner(salt=PAGE_TOKEN_SALT).sign(client)
+
+
+def has_page_token(request, client):
+    """
+    Vrai si la requête porte un jeton de page valide, émis pour ce même client il y a moins de
+    TRANSLATION_PAGE_TOKEN_MAX_AGE secondes. Un en-tête comme Sec-Fetch-Site se forge : le
+    jeton, lui, ne s'obtient qu'en chargeant la page, et ne sert qu'au client qui l'a chargée.
+    """
+    token = request.headers.get(PAGE_TOKEN_HEADER)
+    if not token:
+        return False
+    max_age = int(os.environ.get('TRANSLATION_PAGE_TOKEN_MAX_AGE', '86400'))
+    try:
+        return signing.TimestampSigner(salt=PAGE_TOKEN_SALT).unsign(token, max_age=max_age) == client
+    except signing.BadSignature:
+        return False
+
+
+def request_class(request, client, bulk=False):
+    """
+    Classe de priorité d'une requête : bulk pour la traduction en masse, interactive pour la
+    page du traducteur (jeton de page du client, voir has_page_token), api sinon. L'en-tête
+    X-Translation-Priority permet à un client de baisser sa propre priorité (ex. un
+    traitement par lots sur l'endpoint simple), jamais de la relever.
+    """
+    if bulk:
+        priority = 'bulk'
+    elif has_page_token(request, client):
+        priority = 'interactive'
+    else:
+        priority = 'api'
+    requested = request.headers.get(PRIORITY_HEADER)
+    if requested in PRIORITIES and PRIORITIES.index(requested) > PRIORITIES.index(priority):
+        return requested
+    return priority
+
+
+def client_key(request, user):
+    """Identité du client pour les quotas : utilisateur connecté, sinon adresse IP"""
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def request_timeout(priority):
+    """
+    Échéance d'une requête en secondes (TRANSLATION_BULK_REQUEST_TIMEOUT pour bulk). Elle doit
+    rester sous le --timeout de Gunicorn (120 s dans l'image Docker) : au-delà, le worker est tué
+    et le client perd la connexion au lieu de recevoir un 503.
+    """
+    if priority == 'bulk':
+        return float(os.environ.get('TRANSLATION_BULK_REQUEST_TIMEOUT', '90'))
+    return float(os.environ.get('TRANSLATION_REQUEST_TIMEOUT', '30'))
+
+
+class AdmissionController:
+    """
+    Quotas de concurrence par client, dans chaque worker : au plus TRANSLATION_CLIENT_MAX_REQUESTS
+    requêtes et TRANSLATION_CLIENT_MAX_TOKENS tokens source en cours de traduction (0 = sans
+    limite). Au-delà, la requête est refusée (QuotaExceeded, 429) avant d'entrer dans la file
+    d'inférence : un gros client par lots ne peut pas l'occuper seul. Une requête plus grosse
+    que le quota de tokens passe si le client n'a rien d'autre en cours. Singleton.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(AdmissionController, cls).__new__(cls)
+                instance.max_requests = int(os.environ.get('TRANSLATION_CLIENT_MAX_REQUESTS', '8'))
+                instance.max_tokens = int(os.environ.get('TRANSLATION_CLIENT_MAX_TOKENS', '8192'))
+                instance._lock = threading.Lock()
+                # client -> (requêtes, tokens) en cours
+                instance._clients = {}
+                instance.refused = 0
+                cls._instance = instance
+            return cls._instance
+
+    def _refusal(self, client, tokens):
+        """Motif de refus de la requête du client, ou None (à appeler sous le verrou)"""
+        requests, in_flight = self._clients.get(client, (0, 0))
+        if self.max_requests and requests >= self.max_requests:
+            return 'quota_requests'
+        if self.max_tokens and in_flight and in_flight + tokens > self.max_tokens:
+            return 'quota_tokens'
+        return None
+
+    def would_refuse(self, client, tokens=0):
+        """Vrai si une requête du client serait refusée maintenant (sans réserver de place)"""
+        with self._lock:
+            return self._refusal(client, tokens) is not None
+
+    @contextlib.contextmanager
+    def admit(self, client, priority, tokens=0):
+        """Réserve la place du client pendant le bloc, ou lève QuotaExceeded"""
+        with self._lock:
+            reason = self._refusal(client, tokens)
+            if reason is None:
+                requests, in_flight = self._clients.get(client, (0, 0))
+                self._clients[client] = (requests + 1, in_flight + tokens)
+            else:
+                self.refused += 1
+        ADMISSIONS.labels(priority=priority, decision=reason or 'admitted').inc()
+        if reason is not None:
+            logger.info(f"Requête {priority} de {client} refusée ({reason}).")
+            raise QuotaExceeded("Trop de traductions en cours pour ce client, réessayez plus tard.")
+        try:
+            yield
+        finally:
+            with self._lock:
+                requests, in_flight = self._clients[client]
+                if requests == 1:
+                    del self._clients[client]
+                else:
+                    self._clients[client] = (requests - 1, in_flight - tokens)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_requests': self.max_requests,
+                'max_tokens': self.max_tokens,
+                'clients': len(self._clients),
+                'requests_in_flight': sum(requests for requests, _ in self._clients.values()),
+                'tokens_in_flight': sum(tokens for _, tokens in self._clients.values()),
+                'refused': self.refused,
+            }
+
+
+@contextlib.contextmanager
+def admitted(client, priority, tokens=0):
+    """
+    Autour du traitement d'une requête : quota du client, puis classe de priorité et échéance
+    (request_timeout), qui suivent la requête jusqu'à l'exécuteur d'inférence et generate().
+    """
+    with AdmissionController().admit(client, priority, tokens):
+        priority_token = request_priority.set(priority)
+        deadline_token = request_deadline.set(time.monotonic() + request_timeout(priority))
+        try:
+            yield
+        finally:
+            request_deadline.reset(deadline_token)
+            request_priority.reset(priority_token)
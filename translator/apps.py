@@ -13,15 +13,25 @@ class TranslatorConfig(AppConfig):
         management_commands = {
             'migrate', 'makemigrations', 'collectstatic', 'test', 'shell',
             'dbshell', 'flush', 'loaddata', 'dumpdata', 'createsuperuser',
+            # Commandes qui chargent elles-mêmes les modèles dont elles ont besoin
+            'evaluate_precision', 'evaluate_bidirectional', 'benchmark_workers', 'benchmark_presets',
+            'prune_vocabulary', 'benchmark_suggest', 'translate_file', 'benchmark_api', 'prepare_models',
+            'benchmark_lookup', 'inference_server', 'benchmark_compile',
         }
         if len(sys.argv) > 1 and sys.argv[1] in management_commands:
             return
 
-        # Pré-chargement du modèle au démarrage du worker, pour éviter le timeout Gunicorn
+        # Pré-chargement des paires épinglées, par défaut en arrière-plan : les autres routes sont
+        # servies aussitôt, la traduction répond 503 jusqu'à ce que le modèle soit prêt (/readyz).
+        # Les autres paires sont chargées à leur première utilisation.
         try:
-            from .models import TranslationModel
-            logger.info('Préchargement des modèles de traduction Hugging Face au démarrage.')
-            TranslationModel(model_type='ruu_fr')
-            TranslationModel(model_type='fr_ruu')
+            from .remote import inference_sockets
+            from .warmup import ModelWarmup, warmup_mode
+            mode = warmup_mode()
+            if inference_sockets():
+                logger.info(f"Inférence déléguée au serveur {', '.join(inference_sockets())} : aucun modèle chargé.")
+            elif mode != 'off':
+                logger.info(f"Préchargement des modèles de traduction Hugging Face ({mode}).")
+                ModelWarmup().start(blocking=mode == 'blocking')
         except Exception as e:
             logger.exception('Échec du préchargement du modèle de traduction : %s', e)
@@ -0,0 +1,203 @@
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future, TimeoutError
+
+from .inference import PRIORITIES, AdmissionRefused, refuse_past_deadline, request_deadline, request_priority
+from .memory import lookup_memory, memory_usage, observed_memory
+from .models import TranslationModel, resolve_preset
+from .profiling import add_timing
+from .remote import translation_model
+from .segmentation import SegmentedText
+
+logger = logging.getLogger(__name__)
+
+
+def batching_enabled():
+    """Le micro-batching est activé via TRANSLATION_BATCHING=true"""
+    return os.environ.get('TRANSLATION_BATCHING', 'False').lower() == 'true'
+
+
+class _PendingTranslation:
+    """Une requête en attente dans la file du planificateur"""
+    __slots__ = ('text', 'src_lang', 'tgt_lang', 'preset', 'n_tokens', 'priority', 'deadline', 'usage', 'future')
+
+    def __init__(self, text, src_lang, tgt_lang, preset):
+        self.text = text
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.preset = preset
+        self.n_tokens = 0
+        # Classe de priorité et échéance de la requête, reprises par le lot dans le thread du planificateur
+        self.priority = request_priority.get()
+        self.deadline = request_deadline.get()
+        # Origines des traductions de la requête, complétées après le lot
+        self.usage = memory_usage.get()
+        self.future = Future()
+
+
+class BatchScheduler:
+    """
+    Planificateur de micro-lots placé devant TranslationModel.
+    Les requêtes arrivées dans une courte fenêtre (TRANSLATION_BATCH_WINDOW_MS),
+    jusqu'à TRANSLATION_BATCH_MAX_SIZE, sont regroupées par direction et par
+    longueur de tokens similaire, puis traduites en un seul generate() avec padding.
+    Un planificateur (et un thread) par checkpoint, en tant que Singletons : les deux
+    directions d'un checkpoint bidirectionnel (MODEL_BIDIRECTIONAL) partagent une file.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __new__(cls, model_type="ruu_fr"):
+        key = TranslationModel.resolve(model_type)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                instance = super(BatchScheduler, cls).__new__(cls)
+                instance.model_type = model_type
+                instance.window = int(os.environ.get('TRANSLATION_BATCH_WINDOW_MS', '10')) / 1000
+                instance.max_batch_size = int(os.environ.get('TRANSLATION_BATCH_MAX_SIZE', '16'))
+                # Écart maximal de longueur (en ratio) toléré à l'intérieur d'un groupe
+                instance.max_length_ratio = float(os.environ.get('TRANSLATION_BATCH_LENGTH_RATIO', '2.0'))
+                instance._queue = queue.Queue()
+                instance._thread = threading.Thread(
+                    target=instance._run,
+                    name=f"translation-batcher-{key[0]}",
+                    daemon=True,
+                )
+                instance._thread.start()
+                logger.info(
+                    f"Planificateur de micro-lots démarré pour {key[0]} "
+                    f"(fenêtre {instance.window * 1000:.0f} ms, lot max {instance.max_batch_size})."
+                )
+                cls._instances[key] = instance
+            return cls._instances[key]
+
+    @property
+    def model(self):
+        return translation_model(self.model_type)
+
+    def submit(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", preset=None):
+        """Met la requête en file et retourne un Future portant la traduction"""
+        pending = _PendingTranslation(text, src_lang, tgt_lang, resolve_preset(preset))
+        self._queue.put(pending)
+        return pending.future
+
+    def translate(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", timeout=None, preset=None):
+        """
+        Équivalent bloquant de TranslationModel.translate() : chaque phrase du
+        texte est mise en file et peut rejoindre le lot d'autres requêtes.
+        Sans timeout, l'attente des lots est bornée par l'échéance de la requête.
+        """
+        segmented = SegmentedText(text)
+        # Une phrase seule est cherchée dans la mémoire par translate_batch, dans le lot
+        if len(segmented.segments) > 1:
+            match = lookup_memory(text, src_lang, tgt_lang)
+            if match is not None:
+                return match.translation
+        futures = [self.submit(segment, src_lang, tgt_lang, preset) for segment in segmented.segments]
+        deadline = request_deadline.get()
+        wait_start = time.perf_counter()
+        try:
+            translations = []
+            for future in futures:
+                remaining = timeout
+                if remaining is None and deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                try:
+                    translations.append(future.result(timeout=remaining))
+                except TimeoutError:
+                    if timeout is None and deadline is not None:
+                        refuse_past_deadline("Échéance de la requête atteinte en attente du lot.")
+                    raise
+        except AdmissionRefused:
+            raise
+        except Exception as e:
+            return f"Erreur de traduction: {str(e)}"
+        finally:
+            # Les phases du modèle sont partagées par le lot : seule l'attente est attribuée à la requête
+            add_timing('batch', time.perf_counter() - wait_start)
+        return segmented.join(translations)
+
+    def _collect(self):
+        """Attend une première requête puis accumule celles qui arrivent pendant la fenêtre"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _group(self, batch):
+        """Découpe le lot par direction et préréglage, puis par longueur de tokens similaire"""
+        by_direction = {}
+        for pending in batch:
+            try:
+                pending.n_tokens = self.model.count_tokens(pending.text)
+            except Exception as e:
+                # Modèle indisponible (ex. serveur d'inférence redémarré) : la requête échoue, pas le planificateur
+                logger.error(f"Requête écartée du lot ({self.model_type}) : {e}")
+                pending.future.set_exception(e)
+                continue
+            by_direction.setdefault((pending.src_lang, pending.tgt_lang, pending.preset), []).append(pending)
+
+        groups = []
+        for items in by_direction.values():
+            items.sort(key=lambda p: p.n_tokens)
+            current = [items[0]]
+            for pending in items[1:]:
+                if pending.n_tokens > max(current[0].n_tokens, 1) * self.max_length_ratio:
+                    groups.append(current)
+                    current = []
+                current.append(pending)
+            groups.append(current)
+        return groups
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                for group in self._group(batch):
+                    self._execute(group)
+            except Exception as e:
+                # Le thread ne doit jamais s'arrêter : les requêtes suivantes attendraient indéfiniment
+                logger.exception(f"Erreur du planificateur de micro-lots ({self.model_type}) : {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _execute(self, group):
+        src_lang, tgt_lang, preset = group[0].src_lang, group[0].tgt_lang, group[0].preset
+        start_time = time.perf_counter()
+        # Le lot prend la priorité la plus haute de ses requêtes et l'échéance la plus lointaine
+        deadlines = [p.deadline for p in group]
+        priority_token = request_priority.set(min((p.priority for p in group), key=PRIORITIES.index))
+        deadline_token = request_deadline.set(None if None in deadlines else max(deadlines))
+        try:
+            with observed_memory() as usage:
+                translations = self.model.translate_batch(
+                    [p.text for p in group], src_lang, tgt_lang, raise_errors=True, preset=preset
+                )
+        except Exception as e:
+            logger.error(f"Échec du lot de traduction ({self.model_type}) : {e}")
+            for pending in group:
+                pending.future.set_exception(e)
+            return
+        finally:
+            request_deadline.reset(deadline_token)
+            request_priority.reset(priority_token)
+
+        for pending, translation in zip(group, translations):
+            if pending.usage is not None:
+                pending.usage.add(pending.text, usage.origin(pending.text))
+            pending.future.set_result(translation)
+        logger.debug(
+            f"Lot {self.model_type} de {len(group)} phrase(s) traduit en "
+            f"{time.perf_counter() - start_time:.3f}s."
+        )
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Surcoût approximatif d'une entrée (objets Python, tuple, nœud de l'OrderedDict)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def cache_enabled():
+    """Le cache des traductions est actif sauf si TRANSLATION_CACHE=false"""
+    return os.environ.get('TRANSLATION_CACHE', 'True').lower() == 'true'
+
+
+def normalize_text(text):
+    """Normalisation NFC et repli des espaces, utilisée pour la clé du cache"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def make_cache_key(model_id, revision, src_lang, tgt_lang, generation_params, text):
+    """Clé (model_id, révision, langues, paramètres de génération, texte normalisé)"""
+    payload = json.dumps(
+        [model_id, revision, src_lang, tgt_lang, generation_params, normalize_text(text)],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """
+    Cache à deux niveaux des traductions terminées :
+    - un LRU en mémoire du processus, borné en octets (TRANSLATION_CACHE_MAX_BYTES) ;
+    - un niveau partagé optionnel entre workers Gunicorn, via l'alias de cache
+      Django « translations » s'il est configuré (voir TRANSLATION_CACHE_LOCATION).
+    Les entrées expirent après TRANSLATION_CACHE_TTL secondes. Les requêtes
+    identiques en cours de traduction sont fusionnées (un seul generate()).
+    Le changement de modèle invalide le cache car la clé contient model_id et révision.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(TranslationCache, cls).__new__(cls)
+                instance.max_bytes = int(os.environ.get('TRANSLATION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+                instance.ttl = int(os.environ.get('TRANSLATION_CACHE_TTL', '86400'))
+                instance._entries = OrderedDict()
+                instance._size = 0
+                instance._inflight = {}
+                instance._lock = threading.Lock()
+                instance._counters = {
+                    'hits': 0, 'shared_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0,
+                }
+                cls._instance = instance
+            return cls._instance
+
+    @property
+    def shared(self):
+        """Niveau partagé (cache Django « translations ») ou None"""
+        from django.conf import settings
+        from django.core.cache import caches
+        if 'translations' not in getattr(settings, 'CACHES', {}):
+            return None
+        return caches['translations']
+
+    def _get_local(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key, value):
+        size = len(key) + len(value.encode('utf-8')) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self._counters['evictions'] += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def get(self, key):
+        """Cherche une traduction dans le LRU local puis dans le niveau partagé"""
+        with self._lock:
+            value = self._get_local(key)
+            if value is not None:
+                self._counters['hits'] += 1
+                CACHE_LOOKUPS.labels(result='hit').inc()
+                return value
+
+        shared = self.shared
+        if shared is not None:
+            try:
+                value = shared.get(f"translation:{key}")
+            except Exception as e:
+                logger.warning(f"Cache partagé des traductions indisponible : {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._counters['shared_hits'] += 1
+                    self._set_local(key, value)
+                CACHE_LOOKUPS.labels(result='shared_hit').inc()
+                return value
+
+        with self._lock:
+            self._counters['misses'] += 1
+        CACHE_LOOKUPS.labels(result='miss').inc()
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._set_local(key, value)
+        shared = self.shared
+        if shared is not None:
+            try:
+                shared.set(f"translation:{key}", value, timeout=self.ttl)
+            except Exception as e:
+                logger.warning(f"Écriture dans le cache partagé impossible : {e}")
+
+    def translate_many(self, keys, texts, generate):
+        """
+        Retourne les traductions de texts en ne passant à generate() que les
+        textes absents du cache et non déjà en cours de traduction ailleurs.
+        generate(liste_de_textes) doit retourner une liste de traductions ou lever une exception.
+        """
+        results = [None] * len(texts)
+        owned = OrderedDict()   # clé -> indices à calculer par cet appel
+        waiting = []            # (indice, Future d'un autre appel en cours)
+
+        for i, key in enumerate(keys):
+            if key in owned:
+                owned[key].append(i)
+                continue
+            value = self.get(key)
+            if value is not None:
+                results[i] = value
+                continue
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is None:
+                    self._inflight[key] = Future()
+                    owned[key] = [i]
+                else:
+                    self._counters['coalesced'] += 1
+                    waiting.append((i, future))
+
+        if owned:
+            try:
+                translations = generate([texts[indices[0]] for indices in owned.values()])
+            except Exception as e:
+                self._release(owned, exception=e)
+                raise
+            for (key, indices), translation in zip(owned.items(), translations):
+                self.set(key, translation)
+                for i in indices:
+                    results[i] = translation
+            self._release(owned, values=translations)
+
+        for i, future in waiting:
+            results[i] = future.result()
+        return results
+
+    def _release(self, owned, values=None, exception=None):
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in owned]
+        for n, future in enumerate(futures):
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(values[n])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['shared_hits'] + self._counters['misses']
+            hits = self._counters['hits'] + self._counters['shared_hits']
+            return {
+                **self._counters,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,63 @@
+import os
+import logging
+
+from transformers import CompileConfig
+from transformers.cache_utils import EncoderDecoderCache, StaticCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LENGTH_BUCKETS = (16, 32, 64, 128)
+
+
+def compiled_decoding_enabled():
+    """Décodage compilé (cache KV statique + torch.compile), activé via TRANSLATION_COMPILE=true"""
+    return os.environ.get('TRANSLATION_COMPILE', 'False').lower() == 'true'
+
+
+def length_buckets():
+    """
+    Paliers de longueur des sources, en tokens (TRANSLATION_COMPILE_BUCKETS) : les entrées
+    sont complétées jusqu'au palier supérieur, chaque palier correspond à un graphe compilé.
+    """
+    value = os.environ.get('TRANSLATION_COMPILE_BUCKETS', '')
+    if not value.strip():
+        return DEFAULT_LENGTH_BUCKETS
+    try:
+        buckets = sorted({int(length) for length in value.split(',') if length.strip()})
+    except ValueError:
+        raise ValueError(f"TRANSLATION_COMPILE_BUCKETS invalide : {value} (attendu : longueurs séparées par des virgules)")
+    if not buckets or buckets[0] <= 0:
+        raise ValueError(f"TRANSLATION_COMPILE_BUCKETS invalide : {value} (longueurs positives attendues)")
+    return tuple(buckets)
+
+
+def bucket_length(length, buckets=None):
+    """Plus petit palier contenant length ; au-delà du dernier, multiple de celui-ci"""
+    buckets = buckets or length_buckets()
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return -(-length // buckets[-1]) * buckets[-1]
+
+
+def compile_config():
+    """
+    torch.compile du pas du décodeur. transformers ne compile d'office que sur GPU : sur CPU,
+    il faut _compile_all_devices, et le mode par défaut (reduce-overhead vise les graphes CUDA).
+    """
+    config = CompileConfig(mode='default', fullgraph=False)
+    config._compile_all_devices = True
+    return config
+
+
+def static_cache(config, max_cache_len, encoder_length):
+    """
+    Cache KV statique d'un appel de generate(), comme celui de cache_implementation='static',
+    mais propre à l'appel : transformers garde le sien sur le modèle, partagé par les workers
+    de l'exécuteur d'inférence. La taille de l'attention croisée est celle de l'encodeur.
+    """
+    decoder_config = config.get_text_config(decoder=True)
+    return EncoderDecoderCache(
+        StaticCache(config=decoder_config, max_cache_len=max_cache_len),
+        StaticCache(config=decoder_config, max_cache_len=encoder_length),
+    )
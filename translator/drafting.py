@@ -0,0 +1,164 @@
+import contextlib
+import contextvars
+import inspect
+import threading
+import logging
+
+import torch
+import transformers
+from transformers.generation.candidate_generator import CandidateGenerator
+
+from .metrics import DRAFT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Arguments de GenerationMixin._get_candidate_generator (méthode privée) utilisés par le brouillon
+# copié de la source ; vérifiés à l'installation, transformers étant épinglé dans requirements.txt
+CANDIDATE_GENERATOR_PARAMETERS = ('generation_config', 'input_ids', 'inputs_tensor')
+
+# Brouillons de la requête en cours (taux d'acceptation renvoyé par l'API), positionnés par les vues
+draft_stats = contextvars.ContextVar('draft_stats', default=None)
+# Brouillons du generate() en cours, dans le thread de l'exécuteur d'inférence
+_call_drafts = contextvars.ContextVar('call_drafts', default=None)
+
+
+class DraftStats:
+    """Tokens proposés par copie de la source et tokens acceptés par le modèle"""
+
+    def __init__(self):
+        self.calls = 0
+        self.proposed = 0
+        self.accepted = 0
+        self._lock = threading.Lock()
+
+    def add(self, proposed, accepted, calls=0):
+        with self._lock:
+            self.calls += calls
+            self.proposed += proposed
+            self.accepted += accepted
+
+    def merge(self, other):
+        """Ajoute les brouillons d'un autre DraftStats (ex. reçus du serveur d'inférence)"""
+        self.add(other['proposed'], other['accepted'], calls=other['calls'])
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'proposed': self.proposed,
+                'accepted': self.accepted,
+                'acceptance_rate': round(self.accepted / self.proposed, 3) if self.proposed else 0.0,
+            }
+
+
+@contextlib.contextmanager
+def observed_drafts():
+    """Compte les brouillons des generate() de la requête en cours ; fournit le DraftStats"""
+    stats = DraftStats()
+    token = draft_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        draft_stats.reset(token)
+
+
+@contextlib.contextmanager
+def drafting(stats):
+    """Autour d'un generate() assisté : les brouillons proposés et acceptés sont comptés dans stats"""
+    token = _call_drafts.set(stats)
+    try:
+        yield
+    finally:
+        _call_drafts.reset(token)
+
+
+def record_drafts(direction, stats):
+    """Reporte les brouillons d'un generate() dans les métriques et dans ceux de la requête"""
+    DRAFT_TOKENS.labels(direction=direction, outcome='proposed').inc(stats.proposed)
+    DRAFT_TOKENS.labels(direction=direction, outcome='accepted').inc(stats.accepted)
+    request_stats = draft_stats.get()
+    if request_stats is not None:
+        request_stats.add(stats.proposed, stats.accepted, calls=1)
+
+
+class SourceLookupCandidateGenerator(CandidateGenerator):
+    """
+    Prompt lookup appliqué à la source : le dernier n-gramme généré est cherché dans les ids
+    de la source, et les tokens qui l'y suivent (noms propres, nombres, références recopiés)
+    sont proposés au modèle, qui les vérifie en un seul forward du décodeur. En décodage
+    glouton, la sortie est celle qu'aurait produite le modèle sans brouillon. La copie
+    avançant dans la source, les occurrences après le dernier passage copié sont préférées.
+    """
+
+    def __init__(self, source_ids, num_output_tokens=10, max_matching_ngram_size=2, max_length=20, stats=None):
+        self.source_ids = source_ids
+        self.num_output_tokens = num_output_tokens
+        self.max_matching_ngram_size = max_matching_ngram_size
+        self.max_length = max_length
+        self.stats = stats
+        self._proposed = 0
+        self._start = 0
+        # Position dans la source qui suit le dernier passage copié
+        self._cursor = 0
+
+    def get_candidates(self, input_ids, **kwargs):
+        length = input_ids.shape[1]
+        self._proposed = 0
+        # generate() produit lui-même un token de plus que les candidats
+        budget = self.max_length - length - 1
+        if budget <= 0:
+            return input_ids, None
+        for ngram_size in range(min(self.max_matching_ngram_size, length, len(self.source_ids)), 0, -1):
+            ngram = input_ids[0, -ngram_size:]
+            windows = self.source_ids.unfold(0, ngram_size, 1)
+            starts = [index + ngram_size for index in (windows == ngram).all(dim=1).nonzero().flatten().tolist()]
+            for start in sorted(starts, key=lambda start: start < self._cursor):
+                candidates = self.source_ids[start:start + min(self.num_output_tokens, budget)]
+                if len(candidates):
+                    self._proposed, self._start = len(candidates), start
+                    return torch.cat([input_ids, candidates.unsqueeze(0).to(input_ids.device)], dim=1), None
+        return input_ids, None
+
+    def update_candidate_strategy(self, input_ids, scores, num_matches):
+        if not self._proposed:
+            return
+        if num_matches:
+            self._cursor = self._start + int(num_matches)
+        if self.stats is not None:
+            self.stats.add(self._proposed, int(num_matches))
+
+
+def install_source_lookup(model):
+    """
+    Le prompt lookup de transformers cherche les brouillons dans la sortie déjà générée
+    (le prompt d'un modèle décodeur seul) : pour un modèle encodeur-décodeur, on le fait
+    chercher dans la source. Les generate() sans prompt_lookup_num_tokens sont inchangés.
+    Remplace la méthode privée _get_candidate_generator : si elle manque ou a changé de
+    signature (autre version de transformers), rien n'est installé et la fonction renvoie
+    False ; le préréglage lookup décode alors en glouton simple, sans brouillon.
+    """
+    default = getattr(model, '_get_candidate_generator', None)
+    try:
+        parameters = inspect.signature(default).parameters if default is not None else {}
+    except (TypeError, ValueError):
+        parameters = {}
+    if not all(name in parameters for name in CANDIDATE_GENERATOR_PARAMETERS):
+        logger.warning(
+            f"transformers {transformers.__version__} : _get_candidate_generator introuvable ou modifié, "
+            f"le préréglage lookup décode sans brouillon."
+        )
+        return False
+
+    def get_candidate_generator(generation_config, input_ids, inputs_tensor, **kwargs):
+        if generation_config.prompt_lookup_num_tokens is None:
+            return default(generation_config=generation_config, input_ids=input_ids, inputs_tensor=inputs_tensor, **kwargs)
+        return SourceLookupCandidateGenerator(
+            inputs_tensor[0],
+            num_output_tokens=generation_config.prompt_lookup_num_tokens,
+            max_matching_ngram_size=generation_config.max_matching_ngram_size or 2,
+            max_length=generation_config.max_length,
+            stats=_call_drafts.get(),
+        )
+
+    model._get_candidate_generator = get_candidate_generator
+    return True
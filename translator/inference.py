@@ -0,0 +1,273 @@
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+
+from .metrics import (
+    ADMISSIONS, PRIORITY_QUEUE_DEPTH, PRIORITY_WAIT_SECONDS, QUEUE_DEPTH, QUEUE_WAIT_SECONDS, REFUSED, RUNNING,
+)
+from .profiling import add_timing
+from .utils import percentile
+
+logger = logging.getLogger(__name__)
+
+# Échéance (horloge time.monotonic()) de la requête en cours, positionnée par les vues.
+# Elle suit la requête dans les threads via le contexte, jusqu'à InferenceExecutor.submit().
+request_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+# Classes de priorité, de la plus à la moins prioritaire : page du traducteur, intégrations
+# API, traduction en masse. Celle de la requête en cours suit, comme l'échéance, le contexte.
+PRIORITIES = ('interactive', 'api', 'bulk')
+request_priority = contextvars.ContextVar('request_priority', default='api')
+
+
+class AdmissionRefused(Exception):
+    """Génération refusée par le contrôle d'admission (file pleine, échéance, quota du client)"""
+
+
+class InferenceQueueFull(AdmissionRefused):
+    """La file d'attente des générations est pleine, ou la génération en a été évincée"""
+
+
+class DeadlineExceeded(AdmissionRefused):
+    """L'échéance de la requête est passée avant ou pendant la génération"""
+
+
+def refuse_past_deadline(message="Échéance de la requête dépassée avant la génération.", priority=None):
+    """Compte une génération abandonnée à l'échéance et lève DeadlineExceeded"""
+    REFUSED.labels(reason='deadline').inc()
+    ADMISSIONS.labels(priority=priority or request_priority.get(), decision='deadline').inc()
+    raise DeadlineExceeded(message)
+
+
+def generation_time_limit():
+    """
+    max_time de generate() : secondes restantes avant l'échéance de la requête en cours, ou
+    None. generate() s'arrête au pas suivant l'échéance, plutôt que d'occuper un worker pour
+    une réponse que le client n'attend plus.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def check_deadline():
+    """Après generate() : une génération interrompue par son échéance est refusée, pas renvoyée tronquée"""
+    deadline = request_deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        refuse_past_deadline("Échéance de la requête atteinte pendant la génération.")
+
+
+class _QueuedCall:
+    """Une génération en file ; l'ordre du tas est (rang de priorité, ordre d'arrivée)"""
+    __slots__ = ('rank', 'seq', 'priority', 'fn', 'args', 'kwargs', 'context', 'deadline', 'enqueued_at',
+                 'future', 'removed')
+
+    def __init__(self, priority, seq, fn, args, kwargs, context, deadline):
+        self.rank = PRIORITIES.index(priority)
+        self.seq = seq
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context = context
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+        # Sortie de la file (démarrée, évincée ou annulée)
+        self.removed = False
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class InferenceExecutor:
+    """
+    Exécuteur borné des appels generate(), partagé par tous les modèles du processus.
+    Au plus TRANSLATION_INFERENCE_WORKERS générations tournent en parallèle, chacune
+    avec TORCH_THREADS_PER_INFERENCE threads torch ; au plus TRANSLATION_MAX_QUEUE_DEPTH
+    attendent leur tour, servies par classe de priorité (interactive, api, bulk) puis par
+    ordre d'arrivée. File pleine : la dernière arrivée des générations moins prioritaires
+    est évincée au profit de la nouvelle, sinon submit() lève InferenceQueueFull. Une
+    génération dont la requête a dépassé son échéance n'est pas lancée (DeadlineExceeded).
+    Les threads des requêtes (gthread, ASGI) partagent ainsi une seule copie des
+    poids sans se disputer les cœurs. Singleton.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            # Les threads ne survivent pas au fork : un worker Gunicorn recrée son propre exécuteur
+            if cls._instance is None or cls._instance.pid != os.getpid():
+                instance = super(InferenceExecutor, cls).__new__(cls)
+                instance.pid = os.getpid()
+                instance.workers = int(os.environ.get('TRANSLATION_INFERENCE_WORKERS', '1'))
+                # Par défaut, les cœurs alloués au processus sont répartis entre les workers
+                instance.threads_per_call = int(
+                    os.environ.get('TORCH_THREADS_PER_INFERENCE')
+                    or max(1, torch.get_num_threads() // instance.workers)
+                )
+                instance.max_queue_depth = int(os.environ.get('TRANSLATION_MAX_QUEUE_DEPTH', '32'))
+                # Le nombre de threads intra-op de torch est global au processus :
+                # il est fixé une fois pour toutes les générations
+                torch.set_num_threads(instance.threads_per_call)
+                instance._executor = ThreadPoolExecutor(
+                    max_workers=instance.workers, thread_name_prefix='translation-inference'
+                )
+                instance._lock = threading.Lock()
+                instance._pending = []
+                instance._seq = itertools.count()
+                instance.queued_by_priority = dict.fromkeys(PRIORITIES, 0)
+                instance.shed = 0
+                instance.queued = 0
+                instance.running = 0
+                instance.completed = 0
+                instance.rejected = 0
+                instance.expired = 0
+                # Fenêtres glissantes des attentes en file et des durées de génération (secondes)
+                instance._wait_times = deque(maxlen=1000)
+                instance._run_times = deque(maxlen=1000)
+                logger.info(
+                    f"Exécuteur d'inférence : {instance.workers} génération(s) en parallèle, "
+                    f"{instance.threads_per_call} thread(s) torch chacune, file de {instance.max_queue_depth}."
+                )
+                cls._instance = instance
+            return cls._instance
+
+    def saturated(self, priority=None):
+        """Vrai si une nouvelle génération de cette priorité serait refusée (aucune moins prioritaire à évincer)"""
+        rank = PRIORITIES.index(priority or request_priority.get())
+        with self._lock:
+            if self.queued < self.max_queue_depth:
+                return False
+            return not any(self.queued_by_priority[lower] for lower in PRIORITIES[rank + 1:])
+
+    def retry_after(self):
+        """Délai conseillé (secondes entières) avant de réessayer, d'après la file et les durées récentes"""
+        with self._lock:
+            mean_run = sum(self._run_times) / len(self._run_times) if self._run_times else 1.0
+            backlog = self.queued + self.running
+        return max(1, math.ceil(backlog / self.workers * mean_run))
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Planifie fn dans un des workers d'inférence et retourne un Future.
+        fn s'exécute dans une copie du contexte de l'appelant (échéance, priorité, mesure des phases,
+        profileur).
+        """
+        context = contextvars.copy_context()
+        priority = request_priority.get()
+        with self._lock:
+            call = _QueuedCall(priority, next(self._seq), fn, args, kwargs, context, request_deadline.get())
+            evicted = None
+            if self.queued >= self.max_queue_depth:
+                evicted = self._lowest_priority_below(call)
+                if evicted is None:
+                    self.rejected += 1
+                    REFUSED.labels(reason='queue_full').inc()
+                    ADMISSIONS.labels(priority=priority, decision='queue_full').inc()
+                    raise InferenceQueueFull(f"File d'inférence pleine ({self.queued} en attente).")
+                self._dequeue(evicted)
+                self.shed += 1
+            heapq.heappush(self._pending, call)
+            self.queued += 1
+            self.queued_by_priority[priority] += 1
+        QUEUE_DEPTH.inc()
+        PRIORITY_QUEUE_DEPTH.labels(priority=priority).inc()
+        if evicted is not None:
+            REFUSED.labels(reason='shed').inc()
+            ADMISSIONS.labels(priority=evicted.priority, decision='shed').inc()
+            logger.warning(f"File d'inférence pleine : génération {evicted.priority} évincée pour une génération {priority}.")
+            if evicted.future.set_running_or_notify_cancel():
+                evicted.future.set_exception(InferenceQueueFull("Génération évincée de la file par une requête prioritaire."))
+        # Un worker par génération en file : il démarre la plus prioritaire au moment où il se libère
+        self._executor.submit(self._run_next)
+        return call.future
+
+    def _lowest_priority_below(self, call):
+        """Génération en file la moins prioritaire (la dernière arrivée) de rang inférieur à call, ou None"""
+        candidates = [queued for queued in self._pending if not queued.removed and queued.rank > call.rank]
+        return max(candidates, default=None)
+
+    def _dequeue(self, call):
+        call.removed = True
+        self.queued -= 1
+        self.queued_by_priority[call.priority] -= 1
+        QUEUE_DEPTH.dec()
+        PRIORITY_QUEUE_DEPTH.labels(priority=call.priority).dec()
+
+    def _next_call(self):
+        """Retire du tas la génération la plus prioritaire encore en file, ou None"""
+        with self._lock:
+            while self._pending:
+                call = heapq.heappop(self._pending)
+                if call.removed:
+                    continue
+                self._dequeue(call)
+                # Annulée par l'appelant avant d'avoir démarré : on passe à la suivante
+                if call.future.set_running_or_notify_cancel():
+                    self.running += 1
+                    return call
+            return None
+
+    def _run_next(self):
+        call = self._next_call()
+        if call is None:
+            return
+        started_at = time.monotonic()
+        waited = started_at - call.enqueued_at
+        with self._lock:
+            self._wait_times.append(waited)
+        RUNNING.inc()
+        QUEUE_WAIT_SECONDS.observe(waited)
+        PRIORITY_WAIT_SECONDS.labels(priority=call.priority).observe(waited)
+        try:
+            call.context.run(add_timing, 'queue', waited)
+            if call.deadline is not None and started_at > call.deadline:
+                with self._lock:
+                    self.expired += 1
+                refuse_past_deadline(priority=call.priority)
+            result = call.context.run(call.fn, *call.args, **call.kwargs)
+        except BaseException as e:
+            call.future.set_exception(e)
+        else:
+            call.future.set_result(result)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._run_times.append(time.monotonic() - started_at)
+            RUNNING.dec()
+
+    def run(self, fn, *args, **kwargs):
+        """Exécute fn dans un des workers d'inférence et attend son résultat"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        """Profondeur de file et temps d'attente, pour la supervision"""
+        with self._lock:
+            wait_times = list(self._wait_times)
+            return {
+                'workers': self.workers,
+                'threads_per_call': self.threads_per_call,
+                'running': self.running,
+                'queued': self.queued,
+                'max_queue_depth': self.max_queue_depth,
+                'completed': self.completed,
+                'queued_by_priority': dict(self.queued_by_priority),
+                'rejected': self.rejected,
+                'shed': self.shed,
+                'expired': self.expired,
+                'wait_ms_p50': percentile(wait_times, 50) * 1000 if wait_times else 0.0,
+                'wait_ms_p95': percentile(wait_times, 95) * 1000 if wait_times else 0.0,
+            }
@@ -0,0 +1,227 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from translator.models import TranslationModel
+from translator.registry import pair_for_model_type
+from translator.tiny_model import build_tiny_model
+from translator.utils import percentile, sample_pairs
+from translator.views import TranslateAPIView
+
+
+def parse_length_mix(values):
+    """[(mots, poids)] depuis « 8:6 24:3 64:1 » (longueur en mots : poids relatif)"""
+    mix = []
+    for value in values:
+        words, _, weight = value.partition(':')
+        try:
+            mix.append((int(words), float(weight or 1)))
+        except ValueError:
+            raise CommandError(f"Longueur invalide : {value} (attendu mots:poids, par ex. 24:3)")
+    return mix
+
+
+def text_of_length(rng, sentences, words):
+    """Texte d'exactement words mots, fait de phrases du corpus mises bout à bout"""
+    chosen = []
+    while len(chosen) < words:
+        chosen += rng.choice(sentences).split()
+    return ' '.join(chosen[:words])
+
+
+def git_revision():
+    """Commit courant, suffixé de « -dirty » si l'arbre de travail est modifié, ou None"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{revision}-dirty" if dirty else revision
+
+
+def parse_server_timing(header):
+    """{phase: millisecondes} depuis l'en-tête Server-Timing"""
+    phases = {}
+    for item in filter(None, (part.strip() for part in (header or '').split(','))):
+        name, _, duration = item.partition(';dur=')
+        if duration:
+            phases[name] = float(duration)
+    return phases
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge de l'API de traduction (TranslateAPIView et TranslationModel réels) avec un "
+        "modèle mBART minuscule construit localement : latences p50/p95/p99 et requêtes par seconde "
+        "par niveau de concurrence, enregistrées en JSON pour comparer des commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help="Clients simultanés")
+        parser.add_argument('--requests', type=int, default=200, help="Requêtes par niveau de concurrence")
+        parser.add_argument(
+            '--length-mix', nargs='+', default=['8:6', '24:3', '64:1'],
+            help="Distribution des longueurs d'entrée, en mots:poids",
+        )
+        parser.add_argument('--warmup', type=int, default=5, help="Requêtes non mesurées avant chaque niveau")
+        parser.add_argument('--model', help="Checkpoint à mesurer à la place du modèle minuscule")
+        parser.add_argument('--tiny-dir', help="Dossier où construire (ou réutiliser) le modèle minuscule")
+        parser.add_argument('--output', help="Fichier JSON des résultats")
+        parser.add_argument('--compare', help="Résultats JSON de référence (par ex. d'un autre commit)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        model_type = options['direction']
+        src_lang, tgt_lang = pair_for_model_type(model_type)
+        length_mix = parse_length_mix(options['length_mix'])
+
+        model_path = options['model']
+        if model_path is None:
+            model_path = options['tiny_dir'] or os.path.join(tempfile.gettempdir(), 'lugayetu-tiny-mbart')
+            if not os.path.exists(os.path.join(model_path, 'config.json')):
+                build_tiny_model(model_path, seed=options['seed'])
+        # Toutes les requêtes passent par le modèle : ni mémoire de traduction ni cache
+        os.environ.update({
+            'MODEL_RUU_FR': model_path, 'MODEL_FR_RUU': model_path,
+            'TRANSLATION_MEMORY': 'false', 'TRANSLATION_CACHE': 'false',
+        })
+        model = TranslationModel(model_type=model_type)
+        if model.model is None:
+            raise CommandError(f"Modèle {model_path} non chargé.")
+
+        rng = random.Random(options['seed'])
+        sentences = [source for source, _ in sample_pairs(model_type, size=2000, seed=options['seed'])]
+        lengths, weights = zip(*length_mix)
+
+        def workload(count):
+            return [text_of_length(rng, sentences, words) for words in rng.choices(lengths, weights, k=count)]
+
+        view = TranslateAPIView.as_view()
+        factory = APIRequestFactory()
+
+        def translate(text):
+            request = factory.post(
+                '/translator/api/translate/', {'text': text, 'src_lang': src_lang, 'tgt_lang': tgt_lang}, format='json',
+            )
+            start = time.perf_counter()
+            response = view(request)
+            latency = time.perf_counter() - start
+            failed = response.status_code != 200 or response.data['translation'].startswith('Erreur de traduction')
+            return latency, failed, parse_server_timing(response.get('Server-Timing'))
+
+        results = []
+        self.stdout.write(
+            f"{model_path} ({model_type}), longueurs {' '.join(options['length_mix'])}, "
+            f"{options['requests']} requêtes par niveau\n"
+            f"{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erreurs':>9}"
+        )
+        for concurrency in options['concurrency']:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(translate, workload(options['warmup'])))
+                texts = workload(options['requests'])
+                start = time.perf_counter()
+                measures = list(executor.map(translate, texts))
+                elapsed = time.perf_counter() - start
+
+            latencies = [latency for latency, _, _ in measures]
+            phases = defaultdict(float)
+            for _, _, timing in measures:
+                for name, duration in timing.items():
+                    phases[name] += duration / len(measures)
+            result = {
+                'concurrency': concurrency,
+                'requests': len(measures),
+                'errors': sum(failed for _, failed, _ in measures),
+                'requests_per_second': len(measures) / elapsed,
+                'latency_ms': {
+                    'p50': percentile(latencies, 50) * 1000,
+                    'p95': percentile(latencies, 95) * 1000,
+                    'p99': percentile(latencies, 99) * 1000,
+                    'mean': sum(latencies) / len(latencies) * 1000,
+                },
+                'mean_input_words': sum(len(text.split()) for text in texts) / len(texts),
+                # Moyenne par requête des phases de l'en-tête Server-Timing
+                'phases_ms': dict(phases),
+            }
+            results.append(result)
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{concurrency:>8}{result['requests_per_second']:>9.2f}{latency['p50']:>9.1f}"
+                f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}{result['errors']:>9}"
+            )
+
+        report = {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': {
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'torch_threads': torch.get_num_threads(),
+                'machine': platform.machine(),
+                'cpu_count': os.cpu_count(),
+            },
+            'model': {
+                'path': model_path,
+                'tiny': options['model'] is None,
+                'parameters': sum(parameter.numel() for parameter in model.model.parameters()),
+                'precision': model.precision,
+            },
+            'config': {
+                'direction': model_type,
+                'requests': options['requests'],
+                'length_mix': [{'words': words, 'weight': weight} for words, weight in length_mix],
+                'seed': options['seed'],
+                'inference_workers': os.environ.get('TRANSLATION_INFERENCE_WORKERS', '1'),
+                'batching': os.environ.get('TRANSLATION_BATCHING', 'False'),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Résultats enregistrés dans {options['output']}.")
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def compare(self, report, baseline_path):
+        """Écart relatif du débit et des latences avec des résultats de référence, par niveau de concurrence"""
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['config'] != report['config']:
+            self.stdout.write(self.style.WARNING(f"{baseline_path} a été mesuré avec une autre configuration."))
+        previous = {result['concurrency']: result for result in baseline['results']}
+        self.stdout.write(
+            f"Comparaison avec {baseline.get('revision')} :\n"
+            f"{'clients':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+        )
+
+        def change(new, old):
+            return f"{(new / old - 1) * 100:+.1f}%" if old else 'n/a'
+
+        for result in report['results']:
+            old = previous.get(result['concurrency'])
+            if old is None:
+                continue
+            self.stdout.write(
+                f"{result['concurrency']:>8}{change(result['requests_per_second'], old['requests_per_second']):>9}"
+                + ''.join(
+                    f"{change(result['latency_ms'][name], old['latency_ms'][name]):>9}" for name in ('p50', 'p95', 'p99')
+                )
+            )
@@ -0,0 +1,79 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from translator.batching import BatchScheduler
+from translator.models import TranslationModel
+from translator.utils import percentile, sample_pairs
+
+
+class Command(BaseCommand):
+    help = "Compare le débit et la latence p99 de la traduction avec et sans micro-batching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--requests', type=int, default=200, help="Nombre de requêtes par mode")
+        parser.add_argument('--concurrency', type=int, default=16, help="Nombre de clients simultanés")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        model_type = options['direction']
+        src_lang, tgt_lang = ('ruu_CM', 'fr_XX') if model_type == 'ruu_fr' else ('fr_XX', 'ruu_CM')
+
+        # Les phrases du corpus sont toutes dans la mémoire de traduction : on mesure le modèle
+        os.environ['TRANSLATION_MEMORY'] = 'false'
+
+        rng = random.Random(options['seed'])
+        sentences = [source for source, _ in sample_pairs(model_type, size=1000, seed=options['seed'])]
+        workload = [rng.choice(sentences) for _ in range(options['requests'])]
+
+        model = TranslationModel(model_type=model_type)
+        if model.model is None:
+            self.stderr.write(self.style.ERROR(f"Modèle {model.model_id} non chargé."))
+            return
+
+        # Sans batching, un worker Gunicorn synchrone traite une requête à la fois
+        lock = threading.Lock()
+
+        def unbatched(text):
+            with lock:
+                return model.translate(text, src_lang, tgt_lang)
+
+        scheduler = BatchScheduler(model_type=model_type)
+
+        def batched(text):
+            return scheduler.translate(text, src_lang, tgt_lang)
+
+        # Échauffement pour ne pas compter les premières allocations
+        model.translate(workload[0], src_lang, tgt_lang)
+
+        self.stdout.write(
+            f"{len(workload)} requêtes, {options['concurrency']} clients, "
+            f"fenêtre {scheduler.window * 1000:.0f} ms, lot max {scheduler.max_batch_size}"
+        )
+        for label, translate in (('sans batching', unbatched), ('avec batching', batched)):
+            self.report(label, *self.run(translate, workload, options['concurrency']))
+
+    def run(self, translate, workload, concurrency):
+        latencies = []
+
+        def timed(text):
+            start = time.perf_counter()
+            translate(text)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, workload))
+        return latencies, time.perf_counter() - start
+
+    def report(self, label, latencies, elapsed):
+        self.stdout.write(
+            f"{label:>14} : {len(latencies) / elapsed:7.2f} req/s | "
+            f"p50 {percentile(latencies, 50) * 1000:8.1f} ms | "
+            f"p99 {percentile(latencies, 99) * 1000:8.1f} ms"
+        )
@@ -0,0 +1,85 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.compiled import bucket_length, length_buckets
+from translator.models import TranslationModel
+from translator.profiling import observed_request
+from translator.registry import pair_for_model_type
+from translator.utils import percentile, sample_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le décodage compilé (TRANSLATION_COMPILE : cache KV statique et torch.compile) au "
+        "chemin eager, phrase par phrase en décodage glouton, par palier de longueur de la source : "
+        "latence par token du décodeur, latence par phrase et traductions identiques."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--size', type=int, default=100, help="Nombre de phrases évaluées")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        model_type = options['direction']
+        src_lang, tgt_lang = pair_for_model_type(model_type)
+        sources = [source for source, _ in sample_pairs(model_type, options['size'], seed=options['seed'])]
+
+        # Instance hors registre : chargée sans compilation, puis tracée pour la seconde mesure
+        os.environ['TRANSLATION_COMPILE'] = 'False'
+        model = TranslationModel._create(model_type, *TranslationModel.resolve(model_type))
+        if model.model is None:
+            raise CommandError(f"Modèle {model.model_id} non chargé.")
+        buckets = {source: bucket_length(model.encode([source], src_lang)['input_ids'].shape[1]) for source in sources}
+
+        # Chauffe : première exécution des noyaux hors mesure
+        model._generate(sources[:1], src_lang, tgt_lang, 'fast')
+        eager = self.measure(model, sources, src_lang, tgt_lang)
+
+        trace_start = time.perf_counter()
+        model._trace_compiled()
+        trace_seconds = time.perf_counter() - trace_start
+        if not model.compiled:
+            raise CommandError("Décodage compilé indisponible pour ce modèle, voir les journaux.")
+        # Phrases plus longues que le dernier palier : compilées à leur première utilisation
+        for bucket in sorted(set(buckets.values()) - set(length_buckets())):
+            model._generate([next(source for source in sources if buckets[source] == bucket)], src_lang, tgt_lang, 'fast')
+        compiled = self.measure(model, sources, src_lang, tgt_lang)
+
+        self.stdout.write(
+            f"{len(sources)} phrases {src_lang} -> {tgt_lang}, une phrase par appel (fast), "
+            f"paliers tracés en {trace_seconds:.1f}s\n"
+            f"{'palier':>7}{'phrases':>9}{'eager ms/tok':>14}{'compilé ms/tok':>16}{'gain':>8}"
+            f"{'eager p50 ms':>14}{'compilé p50 ms':>16}{'identiques':>12}"
+        )
+        for bucket in sorted(set(buckets.values())) + [None]:
+            selected = [index for index, source in enumerate(sources) if bucket is None or buckets[source] == bucket]
+            eager_row, compiled_row = self.summary(eager, selected), self.summary(compiled, selected)
+            identical = sum(eager['outputs'][index] == compiled['outputs'][index] for index in selected)
+            self.stdout.write(
+                f"{bucket if bucket is not None else 'total':>7}{len(selected):>9}"
+                f"{eager_row['ms_per_token']:>14.2f}{compiled_row['ms_per_token']:>16.2f}"
+                f"{eager_row['ms_per_token'] / compiled_row['ms_per_token']:>7.2f}x"
+                f"{eager_row['p50_ms']:>14.1f}{compiled_row['p50_ms']:>16.1f}{identical / len(selected) * 100:>11.1f}%"
+            )
+
+    def measure(self, model, sources, src_lang, tgt_lang):
+        outputs, latencies, decoder_seconds, tokens = [], [], [], []
+        for source in sources:
+            start = time.perf_counter()
+            with observed_request() as (timing, _):
+                outputs.extend(model._generate([source], src_lang, tgt_lang, 'fast'))
+            latencies.append(time.perf_counter() - start)
+            decoder_seconds.append(timing.phases.get('decoder', 0.0))
+            # Tokens générés : sous-mots de la traduction, code de langue cible et eos
+            tokens.append(model.count_tokens(outputs[-1]) + 2)
+        return {'outputs': outputs, 'latencies': latencies, 'decoder_seconds': decoder_seconds, 'tokens': tokens}
+
+    def summary(self, measures, selected):
+        return {
+            'ms_per_token': sum(measures['decoder_seconds'][index] for index in selected)
+            / sum(measures['tokens'][index] for index in selected) * 1000,
+            'p50_ms': percentile([measures['latencies'][index] for index in selected], 50) * 1000,
+        }
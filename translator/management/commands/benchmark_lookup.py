@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.drafting import observed_drafts
+from translator.models import GENERATION_PRESETS, TranslationModel
+from translator.utils import percentile, sample_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le préréglage lookup (brouillons copiés de la source) face au décodage glouton "
+        "fast, phrase par phrase, sur les versets du corpus parallèle : latence, taux d'acceptation "
+        "des brouillons et traductions identiques."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--size', type=int, default=100, help="Nombre de versets évalués")
+        parser.add_argument(
+            '--draft-tokens', type=int, nargs='+',
+            default=[GENERATION_PRESETS['lookup']['prompt_lookup_num_tokens']],
+            help="Longueurs maximales de brouillon comparées (prompt_lookup_num_tokens)",
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        model_type = options['direction']
+        src_lang, tgt_lang = ('ruu_CM', 'fr_XX') if model_type == 'ruu_fr' else ('fr_XX', 'ruu_CM')
+        sources = [source for source, _ in sample_pairs(model_type, options['size'], seed=options['seed'], verses=True)]
+
+        model = TranslationModel(model_type=model_type)
+        if model.model is None:
+            raise CommandError(f"Modèle {model.model_id} non chargé.")
+        # Chauffe : première exécution des noyaux hors mesure
+        model._generate(sources[:1], src_lang, tgt_lang, 'fast')
+        model._generate(sources[:1], src_lang, tgt_lang, 'lookup')
+
+        # Référence : glouton sans brouillon, même budget de tokens (une phrase par appel)
+        baseline, baseline_latencies = self.measure(model, sources, src_lang, tgt_lang, 'fast')
+        rows = [{'label': 'fast', **self.summary(baseline_latencies), 'rate': None, 'identical': 100.0}]
+
+        lookup = GENERATION_PRESETS['lookup']
+        draft_tokens = lookup['prompt_lookup_num_tokens']
+        try:
+            for tokens in options['draft_tokens']:
+                lookup['prompt_lookup_num_tokens'] = tokens
+                with observed_drafts() as drafts:
+                    outputs, latencies = self.measure(model, sources, src_lang, tgt_lang, 'lookup')
+                rows.append({
+                    'label': f"lookup/{tokens}",
+                    **self.summary(latencies),
+                    'rate': drafts.as_dict()['acceptance_rate'] * 100,
+                    'identical': sum(a == b for a, b in zip(outputs, baseline)) / len(sources) * 100,
+                })
+        finally:
+            lookup['prompt_lookup_num_tokens'] = draft_tokens
+
+        self.stdout.write(
+            f"{len(sources)} versets {src_lang} -> {tgt_lang}, une phrase par appel\n"
+            f"{'décodage':<12}{'moy. ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'gain':>8}{'acceptation':>13}{'identiques':>12}"
+        )
+        for row in rows:
+            rate = f"{row['rate']:.1f} %" if row['rate'] is not None else '-'
+            self.stdout.write(
+                f"{row['label']:<12}{row['mean_ms']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{rows[0]['mean_ms'] / row['mean_ms']:>7.2f}x{rate:>13}{row['identical']:>11.1f}%"
+            )
+
+    def measure(self, model, sources, src_lang, tgt_lang, preset):
+        outputs, latencies = [], []
+        for source in sources:
+            start = time.perf_counter()
+            outputs.extend(model._generate([source], src_lang, tgt_lang, preset))
+            latencies.append(time.perf_counter() - start)
+        return outputs, latencies
+
+    def summary(self, latencies):
+        return {
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+        }
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.models import GENERATION_PRESETS, TranslationModel
+from translator.utils import percentile, sample_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les préréglages de génération (fast, balanced, best, lookup) : BLEU/chrF par rapport "
+        "aux références, latence et débit, sur un échantillon du corpus parallèle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--presets', nargs='+', choices=list(GENERATION_PRESETS), default=list(GENERATION_PRESETS))
+        parser.add_argument('--size', type=int, default=200, help="Nombre de phrases évaluées")
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--n-best', type=int, default=3, help="Alternatives demandées pour la mesure n-best")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            import sacrebleu
+        except ImportError:
+            raise CommandError("Cette commande nécessite sacrebleu : pip install sacrebleu")
+
+        model_type = options['direction']
+        src_lang, tgt_lang = ('ruu_CM', 'fr_XX') if model_type == 'ruu_fr' else ('fr_XX', 'ruu_CM')
+        pairs = sample_pairs(model_type, options['size'], seed=options['seed'])
+        sources = [source for source, _ in pairs]
+        references = [reference for _, reference in pairs]
+        batch_size = options['batch_size']
+        n_best = options['n_best']
+
+        model = TranslationModel(model_type=model_type)
+        if model.model is None:
+            raise CommandError(f"Modèle {model.model_id} non chargé.")
+
+        rows = []
+        for preset in options['presets']:
+            # Latence par phrase (lots de 1), sans passer par le cache
+            latencies = []
+            for source in sources[:min(len(sources), 50)]:
+                start = time.perf_counter()
+                model._generate([source], src_lang, tgt_lang, preset)
+                latencies.append(time.perf_counter() - start)
+
+            # Une recherche en faisceau renvoyant n_best hypothèses
+            nbest_latencies = []
+            for source in sources[:min(len(sources), 20)]:
+                start = time.perf_counter()
+                model._generate([source], src_lang, tgt_lang, preset, num_return_sequences=n_best)
+                nbest_latencies.append(time.perf_counter() - start)
+
+            hypotheses = []
+            budgets = []
+            batch_start = time.perf_counter()
+            for start in range(0, len(sources), batch_size):
+                batch = sources[start:start + batch_size]
+                budgets.append(model.generation_kwargs(model.encode(batch, src_lang), preset)['max_new_tokens'])
+                hypotheses.extend(model._generate(batch, src_lang, tgt_lang, preset))
+            batch_duration = time.perf_counter() - batch_start
+
+            rows.append({
+                'preset': preset,
+                'bleu': sacrebleu.corpus_bleu(hypotheses, [references]).score,
+                'chrf': sacrebleu.corpus_chrf(hypotheses, [references]).score,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'nbest_p50_ms': percentile(nbest_latencies, 50) * 1000,
+                'sent_per_s': len(sources) / batch_duration,
+                'max_new_tokens': sum(budgets) / len(budgets),
+            })
+
+        self.stdout.write(
+            f"{len(sources)} phrases {src_lang} -> {tgt_lang}, lots de {batch_size}\n"
+            f"{'préréglage':<12}{'BLEU':>7}{'chrF':>7}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{f'{n_best}-best p50 ms':>17}{'phr/s':>8}{'max_new_tokens':>16}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['preset']:<12}{row['bleu']:>7.2f}{row['chrf']:>7.2f}{row['p50_ms']:>9.1f}"
+                f"{row['p95_ms']:>9.1f}{row['nbest_p50_ms']:>17.1f}{row['sent_per_s']:>8.2f}"
+                f"{row['max_new_tokens']:>16.1f}"
+            )
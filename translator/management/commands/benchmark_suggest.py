@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from translator.memory import MemoryMatch
+from translator.suggest import NgramIndex
+from translator.utils import load_parallel_pairs, percentile
+
+
+def synthetic_sentence(rng, sentences):
+    """Phrase artificielle : début d'une phrase du corpus suivi de la fin d'une autre"""
+    first, second = rng.choice(sentences).split(), rng.choice(sentences).split()
+    return ' '.join(first[:max(1, len(first) // 2)] + second[len(second) // 2:])
+
+
+def with_typos(rng, text, count):
+    """Le texte avec count caractères remplacés, supprimés ou dupliqués"""
+    chars = list(text)
+    for _ in range(count):
+        if len(chars) < 2:
+            break
+        i = rng.randrange(len(chars))
+        edit = rng.choice(('replace', 'delete', 'duplicate'))
+        if edit == 'replace':
+            chars[i] = rng.choice('aeiouknmdl')
+        elif edit == 'delete':
+            del chars[i]
+        else:
+            chars.insert(i, chars[i])
+    return ''.join(chars)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la construction et la latence de l'index de suggestions (n-grammes de caractères) "
+        "sur le corpus parallèle agrandi synthétiquement à différentes tailles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000, 200000])
+        parser.add_argument('--queries', type=int, default=500, help="Requêtes mesurées par taille")
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sentences = [ruund for ruund, _ in load_parallel_pairs()]
+        # Phrases du corpus avec quelques fautes de frappe ; la phrase d'origine est attendue en tête
+        originals = [rng.choice(sentences) for _ in range(options['queries'])]
+        queries = [with_typos(rng, original, rng.randint(1, 3)) for original in originals]
+
+        self.stdout.write(
+            f"{'paires':>9}{'construction s':>16}{'tableaux Mo':>13}{'n-grammes':>11}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'phrase d’origine en tête %':>27}"
+        )
+        corpus = list(sentences)
+        for size in sorted(options['sizes']):
+            while len(corpus) < size:
+                corpus.append(synthetic_sentence(rng, sentences))
+            entries = [MemoryMatch('', 'benchmark', text) for text in corpus[:size]]
+
+            start = time.perf_counter()
+            index = NgramIndex(entries)
+            build_seconds = time.perf_counter() - start
+
+            latencies = []
+            found = 0
+            for query, original in zip(queries, originals):
+                start = time.perf_counter()
+                results = index.search(query, k=options['k'])
+                latencies.append(time.perf_counter() - start)
+                found += bool(results) and results[0][1].source_text == original
+            self.stdout.write(
+                f"{size:>9}{build_seconds:>16.2f}{index.nbytes() / 2 ** 20:>13.1f}{len(index.gram_ids):>11}"
+                f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 95) * 1000:>9.2f}"
+                f"{percentile(latencies, 99) * 1000:>9.2f}{found / len(queries) * 100:>27.1f}"
+            )
@@ -0,0 +1,121 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def read_smaps_rollup(pid):
+    """RSS, PSS et mémoire partagée (en octets) d'un processus, depuis /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'shared': values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0),
+    }
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance Gunicorn avec lugayetu.gunicorn_shared pour différents nombres de workers "
+        "et rapporte la mémoire RSS/PSS de chaque worker, avec et sans preload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--requests', type=int, default=8, help="Requêtes de traduction par worker")
+        parser.add_argument('--no-preload', action='store_true', help="Ajoute la comparaison sans preload_app")
+        parser.add_argument('--startup-timeout', type=int, default=600)
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("Cette mesure nécessite Linux (/proc/<pid>/smaps_rollup).")
+
+        modes = [True, False] if options['no_preload'] else [True]
+        self.stdout.write(
+            f"{'preload':<9}{'workers':>8}{'RSS/worker Mo':>15}{'PSS/worker Mo':>15}"
+            f"{'partagé/worker Mo':>19}{'PSS total Mo':>14}"
+        )
+        for preload in modes:
+            for workers in options['workers']:
+                stats = self.measure(workers, preload, options)
+                worker_stats = stats['workers']
+                count = len(worker_stats)
+                self.stdout.write(
+                    f"{'oui' if preload else 'non':<9}{count:>8}"
+                    f"{sum(s['rss'] for s in worker_stats) / count / 2 ** 20:>15.1f}"
+                    f"{sum(s['pss'] for s in worker_stats) / count / 2 ** 20:>15.1f}"
+                    f"{sum(s['shared'] for s in worker_stats) / count / 2 ** 20:>19.1f}"
+                    f"{(stats['master']['pss'] + sum(s['pss'] for s in worker_stats)) / 2 ** 20:>14.1f}"
+                )
+
+    def measure(self, workers, preload, options):
+        env = dict(
+            os.environ,
+            GUNICORN_WORKERS=str(workers),
+            GUNICORN_BIND=f"127.0.0.1:{options['port']}",
+            GUNICORN_PRELOAD='true' if preload else 'false',
+            # La phrase de test est dans la mémoire de traduction : elle doit passer par le modèle
+            TRANSLATION_MEMORY='false',
+        )
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'python:lugayetu.gunicorn_shared'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_until_serving(process, options['port'], options['startup_timeout'])
+
+            # Chaque worker traduit quelques phrases pour toucher toutes les pages des poids
+            url = f"http://127.0.0.1:{options['port']}/translator/api/translate/"
+            payload = json.dumps({'text': "Aay aana, aay iin twuvum", 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'})
+
+            def translate(_):
+                request = urllib.request.Request(
+                    url, data=payload.encode('utf-8'), headers={'Content-Type': 'application/json'}
+                )
+                with urllib.request.urlopen(request, timeout=options['startup_timeout']) as response:
+                    response.read()
+
+            with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+                list(executor.map(translate, range(workers * options['requests'])))
+
+            return {
+                'master': read_smaps_rollup(process.pid),
+                'workers': [read_smaps_rollup(pid) for pid in child_pids(process.pid)],
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+
+    def wait_until_serving(self, process, port, timeout):
+        """Attend que tous les workers soient démarrés et que le port accepte les connexions"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("Gunicorn s'est arrêté pendant le démarrage.")
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.5)
+        raise CommandError(f"Gunicorn n'a pas démarré en {timeout}s.")
@@ -0,0 +1,121 @@
+import gc
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.models import TranslationModel
+from translator.registry import bidirectional_checkpoint, pair_for_model_type
+from translator.utils import current_rss_bytes, model_size_bytes, sample_pairs
+
+DIRECTIONS = ('ruu_fr', 'fr_ruu')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare un checkpoint bidirectionnel (MODEL_BIDIRECTIONAL) aux deux modèles par direction : "
+        "BLEU/chrF, mémoire des poids, RSS, chargement et débit, sur un échantillon du corpus parallèle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkpoint', help="Checkpoint bidirectionnel (par défaut MODEL_BIDIRECTIONAL)")
+        parser.add_argument('--size', type=int, default=200, help="Nombre de phrases évaluées par direction")
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            import sacrebleu
+        except ImportError:
+            raise CommandError("Cette commande nécessite sacrebleu : pip install sacrebleu")
+
+        candidate = options['checkpoint'] or bidirectional_checkpoint()
+        if not candidate:
+            raise CommandError("Indiquez --checkpoint ou MODEL_BIDIRECTIONAL.")
+        # Les checkpoints par direction (MODEL_RUU_FR / MODEL_FR_RUU) servent de référence
+        os.environ['MODEL_BIDIRECTIONAL'] = ''
+        setups = (
+            ('deux modèles', {direction: TranslationModel.resolve(direction, 'fp32')[0] for direction in DIRECTIONS}),
+            ('bidirectionnel', {direction: candidate for direction in DIRECTIONS}),
+        )
+        samples = {direction: sample_pairs(direction, options['size'], seed=options['seed']) for direction in DIRECTIONS}
+        batch_size = options['batch_size']
+
+        baseline = {}
+        rows, totals = [], []
+        for label, checkpoints in setups:
+            gc.collect()
+            rss_before = current_rss_bytes()
+            load_start = time.perf_counter()
+            models = {}
+            for direction, model_id in checkpoints.items():
+                # Une instance par checkpoint, comme dans le ModelRegistry
+                model = next((m for m in models.values() if m.model_id == model_id), None)
+                if model is None:
+                    model = TranslationModel._create(direction, model_id, 'fp32')
+                    if model.model is None:
+                        raise CommandError(f"Modèle {model_id} non chargé.")
+                models[direction] = model
+            load_duration = time.perf_counter() - load_start
+            distinct = {id(model): model for model in models.values()}.values()
+
+            for direction, model in models.items():
+                src_lang, tgt_lang = pair_for_model_type(direction)
+                sources = [source for source, _ in samples[direction]]
+                references = [reference for _, reference in samples[direction]]
+                hypotheses = []
+                batch_start = time.perf_counter()
+                for start in range(0, len(sources), batch_size):
+                    hypotheses.extend(model._generate(sources[start:start + batch_size], src_lang, tgt_lang))
+                batch_duration = time.perf_counter() - batch_start
+                baseline.setdefault(direction, hypotheses)
+                rows.append({
+                    'setup': label,
+                    'direction': f"{src_lang} -> {tgt_lang}",
+                    'bleu': sacrebleu.corpus_bleu(hypotheses, [references]).score,
+                    'chrf': sacrebleu.corpus_chrf(hypotheses, [references]).score,
+                    'bleu_vs_two': sacrebleu.corpus_bleu(hypotheses, [baseline[direction]]).score,
+                    'identical': sum(a == b for a, b in zip(hypotheses, baseline[direction])) / len(hypotheses) * 100,
+                    'sent_per_s': len(sources) / batch_duration,
+                })
+
+            # Trafic mixte : lots des deux directions en alternance
+            mixed = [
+                (models[direction], *pair_for_model_type(direction), [source for source, _ in samples[direction][start:start + batch_size]])
+                for start in range(0, options['size'], batch_size)
+                for direction in DIRECTIONS
+            ]
+            mixed = [batch for batch in mixed if batch[3]]
+            mixed_start = time.perf_counter()
+            for model, src_lang, tgt_lang, sources in mixed:
+                model._generate(sources, src_lang, tgt_lang)
+            mixed_duration = time.perf_counter() - mixed_start
+
+            totals.append({
+                'setup': label,
+                'checkpoints': len(distinct),
+                'weights_mb': sum(model_size_bytes(model.model) for model in distinct) / 2 ** 20,
+                'rss_mb': (current_rss_bytes() - rss_before) / 2 ** 20,
+                'load_s': load_duration,
+                'mixed_sent_per_s': sum(len(batch[3]) for batch in mixed) / mixed_duration,
+            })
+            del models, distinct, model
+            gc.collect()
+
+        self.stdout.write(
+            f"Checkpoint bidirectionnel : {candidate}, {options['size']} phrases par direction, lots de {batch_size}\n"
+            f"{'configuration':<16}{'direction':<18}{'BLEU':>7}{'chrF':>7}{'BLEU/2 mod.':>13}{'identiques':>12}{'phr/s':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['setup']:<16}{row['direction']:<18}{row['bleu']:>7.2f}{row['chrf']:>7.2f}"
+                f"{row['bleu_vs_two']:>13.2f}{row['identical']:>11.1f}%{row['sent_per_s']:>8.2f}"
+            )
+        self.stdout.write(
+            f"\n{'configuration':<16}{'checkpoints':>12}{'poids Mo':>10}{'RSS Mo':>9}{'charg. s':>10}{'mixte phr/s':>13}"
+        )
+        for total in totals:
+            self.stdout.write(
+                f"{total['setup']:<16}{total['checkpoints']:>12}{total['weights_mb']:>10.1f}{total['rss_mb']:>9.1f}"
+                f"{total['load_s']:>10.2f}{total['mixed_sent_per_s']:>13.2f}"
+            )
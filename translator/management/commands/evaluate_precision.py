@@ -0,0 +1,97 @@
+import gc
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.models import PRECISION_MODES, TranslationModel
+from translator.utils import current_rss_bytes, model_size_bytes, percentile, sample_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les modes de précision (fp32, int8-dynamic, bf16) : BLEU/chrF par rapport aux "
+        "références et à fp32, mémoire et latence, sur un échantillon du corpus parallèle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--modes', nargs='+', choices=PRECISION_MODES, default=list(PRECISION_MODES))
+        parser.add_argument('--size', type=int, default=200, help="Nombre de phrases évaluées")
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            import sacrebleu
+        except ImportError:
+            raise CommandError("Cette commande nécessite sacrebleu : pip install sacrebleu")
+
+        model_type = options['direction']
+        src_lang, tgt_lang = ('ruu_CM', 'fr_XX') if model_type == 'ruu_fr' else ('fr_XX', 'ruu_CM')
+        pairs = sample_pairs(model_type, options['size'], seed=options['seed'])
+        sources = [source for source, _ in pairs]
+        references = [reference for _, reference in pairs]
+        batch_size = options['batch_size']
+
+        # fp32 sert de référence pour mesurer la dérive des autres modes
+        modes = sorted(options['modes'], key=lambda mode: mode != 'fp32')
+        baseline = None
+        rows = []
+        for mode in modes:
+            gc.collect()
+            rss_before = current_rss_bytes()
+            load_start = time.perf_counter()
+            model = TranslationModel(model_type=model_type, precision=mode)
+            load_duration = time.perf_counter() - load_start
+            if model.model is None:
+                raise CommandError(f"Modèle {model.model_id} non chargé ({mode}).")
+            if model.precision != mode:
+                self.stderr.write(self.style.WARNING(f"{mode} indisponible sur cette machine, ignoré."))
+                TranslationModel.unload(model_type, mode)
+                continue
+
+            # Latence par phrase (lots de 1) puis débit par lots, sans passer par le cache
+            latencies = []
+            for source in sources[:min(len(sources), 50)]:
+                start = time.perf_counter()
+                model._generate([source], src_lang, tgt_lang)
+                latencies.append(time.perf_counter() - start)
+
+            hypotheses = []
+            batch_start = time.perf_counter()
+            for start in range(0, len(sources), batch_size):
+                hypotheses.extend(model._generate(sources[start:start + batch_size], src_lang, tgt_lang))
+            batch_duration = time.perf_counter() - batch_start
+
+            row = {
+                'mode': mode,
+                'bleu': sacrebleu.corpus_bleu(hypotheses, [references]).score,
+                'chrf': sacrebleu.corpus_chrf(hypotheses, [references]).score,
+                'weights_mb': model_size_bytes(model.model) / 2 ** 20,
+                'rss_mb': (current_rss_bytes() - rss_before) / 2 ** 20,
+                'load_s': load_duration,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'sent_per_s': len(sources) / batch_duration,
+            }
+            if baseline is None:
+                baseline = hypotheses
+            row['bleu_vs_fp32'] = sacrebleu.corpus_bleu(hypotheses, [baseline]).score
+            row['identical'] = sum(a == b for a, b in zip(hypotheses, baseline)) / len(hypotheses) * 100
+            rows.append(row)
+
+            TranslationModel.unload(model_type, mode)
+            del model
+            gc.collect()
+
+        self.stdout.write(
+            f"{len(sources)} phrases {src_lang} -> {tgt_lang}, lots de {batch_size}\n"
+            f"{'mode':<13}{'BLEU':>7}{'chrF':>7}{'BLEU/fp32':>11}{'identiques':>12}"
+            f"{'poids Mo':>10}{'RSS Mo':>9}{'charg. s':>10}{'p50 ms':>9}{'p95 ms':>9}{'phr/s':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['mode']:<13}{row['bleu']:>7.2f}{row['chrf']:>7.2f}{row['bleu_vs_fp32']:>11.2f}"
+                f"{row['identical']:>11.1f}%{row['weights_mb']:>10.1f}{row['rss_mb']:>9.1f}"
+                f"{row['load_s']:>10.2f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['sent_per_s']:>8.2f}"
+            )
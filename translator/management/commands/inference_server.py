@@ -0,0 +1,66 @@
+import os
+import signal
+import sys
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.remote import InferenceServer
+from translator.warmup import ModelWarmup
+
+
+def parse_cores(value):
+    """« 0-3,6 » -> {0, 1, 2, 3, 6}"""
+    cores = set()
+    for part in value.split(','):
+        first, _, last = part.strip().partition('-')
+        try:
+            cores.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise CommandError(f"Liste de cœurs invalide : {value} (attendu par ex. 0-3,6)")
+    return cores
+
+
+class Command(BaseCommand):
+    help = (
+        "Serveur d'inférence : charge les modèles une fois, fixe les threads torch sur des cœurs "
+        "choisis et traduit pour les workers web via un socket Unix (TRANSLATION_INFERENCE_SOCKET)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=os.environ.get('TRANSLATION_INFERENCE_SOCKET', '').split(',')[0] or None,
+                            help="Chemin du socket (par défaut le premier de TRANSLATION_INFERENCE_SOCKET)")
+        parser.add_argument('--cores', help="Cœurs réservés à l'inférence, par ex. 0-3 (par défaut tous)")
+        parser.add_argument('--workers', type=int, help="Générations en parallèle (TRANSLATION_INFERENCE_WORKERS)")
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError("Indiquez --socket ou TRANSLATION_INFERENCE_SOCKET.")
+        # Ce processus exécute lui-même les modèles
+        os.environ.pop('TRANSLATION_INFERENCE_SOCKET', None)
+
+        # Avant tout thread : les threads créés ensuite (pool OpenMP, exécuteur) héritent de l'affinité
+        if options['cores']:
+            if not hasattr(os, 'sched_setaffinity'):
+                raise CommandError("L'affinité des cœurs n'est disponible que sous Linux.")
+            os.sched_setaffinity(0, parse_cores(options['cores']))
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        workers = options['workers'] or int(os.environ.get('TRANSLATION_INFERENCE_WORKERS', '1'))
+        os.environ['TRANSLATION_INFERENCE_WORKERS'] = str(workers)
+        os.environ.setdefault('TORCH_THREADS_PER_INFERENCE', str(max(1, cores // workers)))
+        torch.set_num_threads(int(os.environ['TORCH_THREADS_PER_INFERENCE']))
+
+        # Le socket n'est ouvert qu'une fois les modèles épinglés chargés : les workers web
+        # répondent 503 (Retry-After) tant qu'il est injoignable
+        ModelWarmup().start(blocking=True)
+
+        server = InferenceServer(options['socket'])
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.stdout.write(
+            f"Serveur d'inférence sur {options['socket']} : {cores} cœur(s), {workers} génération(s) "
+            f"en parallèle de {os.environ['TORCH_THREADS_PER_INFERENCE']} thread(s) torch."
+        )
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.models import TranslationModel
+from translator.prepared import prepared_model_dir, save_prepared
+from translator.registry import pair_for_model_type
+from translator.utils import percentile, sample_pairs
+from translator.vocab import pruned_vocab_enabled
+
+# Chargement mesuré dans un processus neuf, comme au démarrage d'un worker
+COLD_START_SCRIPT = """
+import json, time
+from translator.models import TranslationModel
+start = time.perf_counter()
+model = TranslationModel._create({model_type!r}, {model_id!r}, 'fp32')
+print(json.dumps({{'load': time.perf_counter() - start, 'loaded': model.model is not None}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Prépare une fois pour toutes les modèles servis : tokenizer complété (ruu_CM) et modèle "
+        "redimensionné, enregistrés en safetensors dans models/prepared/, puis chargés tels quels "
+        "et hors ligne par TranslationModel. Compare le démarrage à froid avant et après."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', nargs='+', choices=['ruu_fr', 'fr_ruu'], default=['ruu_fr', 'fr_ruu'])
+        parser.add_argument('--runs', type=int, default=3, help="Démarrages à froid mesurés par variante")
+        parser.add_argument('--no-measure', action='store_true', help="Prépare sans mesurer le démarrage")
+        parser.add_argument('--check', type=int, default=20, help="Phrases traduites pour vérifier l'artefact")
+
+    def handle(self, *args, **options):
+        if pruned_vocab_enabled():
+            raise CommandError("Un checkpoint réduit est déjà local et redimensionné : désactivez MODEL_PRUNED_VOCAB.")
+        # Un checkpoint bidirectionnel (MODEL_BIDIRECTIONAL) sert les deux directions : traité une fois
+        checkpoints = set()
+        for model_type in options['direction']:
+            model_id, _ = TranslationModel.resolve(model_type, 'fp32')
+            if model_id not in checkpoints:
+                checkpoints.add(model_id)
+                self.prepare(model_type, options)
+
+    def prepare(self, model_type, options):
+        model_id, _ = TranslationModel.resolve(model_type, 'fp32')
+        path = prepared_model_dir(model_id)
+
+        # Chargement depuis le checkpoint d'origine, sans l'éventuel artefact existant
+        os.environ['MODEL_PREPARED'] = 'false'
+        model = TranslationModel._create(model_type, model_id, 'fp32')
+        if model.model is None:
+            raise CommandError(f"Modèle {model_id} non chargé.")
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        manifest = save_prepared(model.model, model.tokenizer, model_id, model.revision, path)
+
+        os.environ['MODEL_PREPARED'] = 'true'
+        prepared = TranslationModel._create(model_type, model_id, 'fp32')
+        if prepared.model is None or prepared.prepared is None:
+            raise CommandError(f"L'artefact {path} ne se charge pas.")
+        src_lang, tgt_lang = pair_for_model_type(model_type)
+        sources = [source for source, _ in sample_pairs(model_type, options['check'])]
+        identical = sum(
+            a == b for a, b in zip(
+                model._generate(sources, src_lang, tgt_lang, preset='fast'),
+                prepared._generate(sources, src_lang, tgt_lang, preset='fast'),
+            )
+        )
+        if identical != len(sources):
+            raise CommandError(f"{path} : {len(sources) - identical} traductions différentes du modèle d'origine.")
+        self.stdout.write(
+            f"{model_id} -> {path} (vocabulaire {manifest['vocab_size']}, révision {manifest['revision']}), "
+            f"{len(sources)} traductions identiques"
+        )
+        del model, prepared
+
+        if not options['no_measure']:
+            for label, enabled in (('origine', 'false'), ('préparé', 'true')):
+                self.report(label, self.cold_starts(model_type, model_id, enabled, options['runs']))
+
+    def cold_starts(self, model_type, model_id, prepared, runs):
+        """[(durée du processus, durée de _load_model)] de runs démarrages dans des processus neufs"""
+        script = COLD_START_SCRIPT.format(model_type=model_type, model_id=model_id)
+        env = dict(os.environ, MODEL_PREPARED=prepared)
+        measures = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, 'manage.py', 'shell', '-c', script],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                raise CommandError(f"Échec du démarrage mesuré : {result.stderr[-2000:]}")
+            measure = json.loads(result.stdout.strip().splitlines()[-1])
+            if not measure['loaded']:
+                raise CommandError(f"Modèle {model_id} non chargé lors du démarrage mesuré.")
+            measures.append((elapsed, measure['load']))
+        return measures
+
+    def report(self, label, measures):
+        processes = [elapsed for elapsed, _ in measures]
+        loads = [load for _, load in measures]
+        self.stdout.write(
+            f"  {label:>8} : chargement p50 {percentile(loads, 50):6.2f}s (min {min(loads):.2f}s), "
+            f"processus p50 {percentile(processes, 50):6.2f}s"
+        )
@@ -0,0 +1,101 @@
+import copy
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from translator.cache import normalize_text
+from translator.models import TranslationModel
+from translator.utils import load_parallel_pairs, model_size_bytes, sample_pairs
+from translator.vocab import VocabMap, pruned_checkpoint_dir, pruned_vocab_enabled, prune_model, used_token_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Construit des checkpoints au vocabulaire réduit aux sous-mots du corpus parallèle "
+        "(chargés avec MODEL_PRUNED_VOCAB=true), puis compare mémoire, latence par token "
+        "et traductions avec le modèle complet sur des phrases mises de côté."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--direction', nargs='+', choices=['ruu_fr', 'fr_ruu'], default=['ruu_fr', 'fr_ruu'])
+        parser.add_argument('--held-out', type=int, default=200, help="Phrases exclues de l'analyse, pour la vérification")
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--output-dir', help="Dossier du checkpoint réduit (par défaut MODEL_PRUNED_DIR/<modèle>)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if pruned_vocab_enabled():
+            raise CommandError("La réduction part du modèle complet : désactivez MODEL_PRUNED_VOCAB.")
+
+        pairs = load_parallel_pairs()
+        for path in sorted((settings.BASE_DIR / 'data' / 'languages').glob('*/phrases.tsv')):
+            pairs.extend(load_parallel_pairs(path))
+
+        # Un checkpoint bidirectionnel (MODEL_BIDIRECTIONAL) sert les deux directions : traité une fois
+        checkpoints = set()
+        for model_type in options['direction']:
+            model_id, _ = TranslationModel.resolve(model_type, 'fp32')
+            if model_id not in checkpoints:
+                checkpoints.add(model_id)
+                self.prune(model_type, pairs, options)
+
+    def prune(self, model_type, pairs, options):
+        src_lang, tgt_lang = ('ruu_CM', 'fr_XX') if model_type == 'ruu_fr' else ('fr_XX', 'ruu_CM')
+        model = TranslationModel(model_type=model_type, precision='fp32')
+        if model.model is None:
+            raise CommandError(f"Modèle {model.model_id} non chargé.")
+
+        # Les phrases mises de côté ne participent pas au choix du vocabulaire
+        held_out = sample_pairs(model_type, options['held_out'], seed=options['seed'])
+        excluded = {normalize_text(text) for pair in held_out for text in pair}
+        texts = [text for pair in pairs for text in pair if normalize_text(text) not in excluded]
+        kept_ids = used_token_ids(model.tokenizer, texts)
+        vocab_map = VocabMap(kept_ids, model.tokenizer.unk_token_id)
+
+        output_dir = options['output_dir'] or pruned_checkpoint_dir(model.model_id)
+        os.makedirs(output_dir, exist_ok=True)
+        pruned = prune_model(copy.deepcopy(model.model), kept_ids)
+        pruned.save_pretrained(output_dir)
+        model.tokenizer.save_pretrained(output_dir)
+        vocab_map.save(output_dir)
+        del pruned
+
+        pruned_model = TranslationModel._create(model_type, output_dir, 'fp32')
+        if pruned_model.model is None:
+            raise CommandError(f"Le checkpoint réduit {output_dir} ne se charge pas.")
+
+        sources = [source for source, _ in held_out]
+        full_outputs, full_ms_per_token = self.measure(model, sources, src_lang, tgt_lang, options['batch_size'])
+        pruned_outputs, pruned_ms_per_token = self.measure(
+            pruned_model, sources, src_lang, tgt_lang, options['batch_size']
+        )
+        identical = sum(a == b for a, b in zip(full_outputs, pruned_outputs)) / len(sources) * 100
+
+        source_ids = [token_id for ids in model.encode(sources, src_lang)['input_ids'].tolist() for token_id in ids]
+        kept = set(kept_ids)
+        out_of_vocab = sum(token_id not in kept for token_id in source_ids) / len(source_ids) * 100
+
+        vocab_size = model.model.get_input_embeddings().num_embeddings
+        self.stdout.write(
+            f"{src_lang} -> {tgt_lang} : {output_dir}\n"
+            f"  vocabulaire      {vocab_size:>10} -> {len(kept_ids)} tokens ({len(kept_ids) / vocab_size * 100:.1f} %)\n"
+            f"  poids Mo         {model_size_bytes(model.model) / 2 ** 20:>10.1f} -> "
+            f"{model_size_bytes(pruned_model.model) / 2 ** 20:.1f}\n"
+            f"  ms/token         {full_ms_per_token:>10.2f} -> {pruned_ms_per_token:.2f}\n"
+            f"  {len(sources)} phrases mises de côté : {identical:.1f} % de traductions identiques, "
+            f"{out_of_vocab:.2f} % de sous-mots source hors vocabulaire"
+        )
+
+    def measure(self, model, sources, src_lang, tgt_lang, batch_size):
+        """Traductions par lots (sans cache) et durée moyenne par token généré, en ms"""
+        outputs = []
+        duration = 0.0
+        for start in range(0, len(sources), batch_size):
+            batch = sources[start:start + batch_size]
+            batch_start = time.perf_counter()
+            outputs.extend(model._generate(batch, src_lang, tgt_lang))
+            duration += time.perf_counter() - batch_start
+        generated_tokens = sum(model.count_tokens(output) + 2 for output in outputs)
+        return outputs, duration / generated_tokens * 1000
@@ -0,0 +1,211 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from translator.models import GENERATION_PRESETS, PRECISION_MODES
+from translator.registry import pair_for_model_type
+from translator.segmentation import SegmentedText
+
+# Modèle du processus de traduction, créé par init_worker()
+_worker_model = None
+
+
+def init_worker(model_type, precision, threads):
+    """Initialisation d'un processus : threads torch, puis son propre TranslationModel"""
+    global _worker_model
+    torch.set_num_threads(threads)
+    os.environ['TORCH_THREADS_PER_INFERENCE'] = str(threads)
+    from translator.models import TranslationModel
+    # Un échec de chargement est signalé par le premier bloc (translate_segments lève une erreur)
+    _worker_model = TranslationModel(model_type=model_type, precision=precision)
+
+
+def translate_lines(lines, src_lang, tgt_lang, batch_size, preset):
+    """
+    Traduit un bloc de lignes : toutes leurs phrases sont traduites ensemble, triées par
+    longueur et par lots de batch_size, puis chaque ligne est reconstruite.
+    """
+    segmented = [SegmentedText(line) for line in lines]
+    segments = [segment for text in segmented for segment in text.segments]
+    translations = _worker_model.translate_segments(
+        segments, src_lang, tgt_lang, batch_size=batch_size, raise_errors=True, preset=preset
+    )
+    results = []
+    start = 0
+    for text in segmented:
+        end = start + len(text.segments)
+        # Une traduction ne doit pas introduire de saut de ligne ni de tabulation dans la sortie
+        results.append(' '.join(text.join(translations[start:end]).replace('\t', ' ').split('\n')))
+        start = end
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Traduit hors ligne un fichier TXT (une ligne par unité) ou une colonne d'un TSV, réparti "
+        "sur plusieurs processus. La sortie suit l'ordre de l'entrée ; un fichier de reprise permet "
+        "de relancer une traduction interrompue là où elle s'est arrêtée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Fichier .txt ou .tsv à traduire")
+        parser.add_argument('--output', help="Fichier de sortie (par défaut <entrée>.<langue cible>.<ext>)")
+        parser.add_argument('--direction', choices=['ruu_fr', 'fr_ruu'], default='ruu_fr')
+        parser.add_argument('--column', type=int, default=0, help="Colonne TSV à traduire ; la traduction est ajoutée en fin de ligne")
+        parser.add_argument(
+            '--no-header', action='store_true',
+            help="Le TSV n'a pas de ligne d'en-tête (par défaut, la première ligne est recopiée sans être traduite)",
+        )
+        parser.add_argument('--workers', type=int, default=1, help="Processus de traduction, chacun avec son modèle")
+        parser.add_argument('--chunk-size', type=int, default=256, help="Lignes par bloc confié à un processus")
+        parser.add_argument('--batch-size', type=int, default=16)
+        parser.add_argument('--preset', choices=list(GENERATION_PRESETS))
+        parser.add_argument('--precision', choices=list(PRECISION_MODES))
+        parser.add_argument('--restart', action='store_true', help="Ignore le fichier de reprise et recommence")
+
+    def handle(self, *args, **options):
+        input_path = options['input']
+        if not os.path.isfile(input_path):
+            raise CommandError(f"Fichier introuvable : {input_path}")
+        model_type = options['direction']
+        src_lang, tgt_lang = pair_for_model_type(model_type)
+        is_tsv = input_path.endswith('.tsv')
+        header = is_tsv and not options['no_header']
+        root, ext = os.path.splitext(input_path)
+        output_path = options['output'] or f"{root}.{tgt_lang}{ext}"
+        checkpoint_path = f"{output_path}.checkpoint"
+
+        # Ce qui doit être identique pour reprendre un fichier de sortie existant
+        run = {
+            'input': os.path.abspath(input_path),
+            'input_size': os.path.getsize(input_path),
+            'direction': model_type,
+            'column': options['column'] if is_tsv else None,
+            'header': header,
+            'preset': options['preset'],
+        }
+        done_lines, output_bytes = self.resume(checkpoint_path, output_path, run, options['restart'])
+
+        workers = max(1, options['workers'])
+        threads = max(1, torch.get_num_threads() // workers)
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus enfants
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        pool = context.Pool(
+            workers, initializer=init_worker, initargs=(model_type, options['precision'], threads)
+        )
+        self.stdout.write(
+            f"{input_path} -> {output_path} ({src_lang} -> {tgt_lang}), {workers} processus "
+            f"de {threads} thread(s) torch" + (f", reprise après {done_lines} lignes" if done_lines else "")
+        )
+
+        started_at = time.perf_counter()
+        translated = 0
+        # Blocs en cours, écrits dans l'ordre ; au plus 2 par processus en attente
+        pending = deque()
+        with open(input_path, encoding='utf-8', newline='') as source, \
+                open(output_path, 'r+b' if output_bytes else 'wb') as output:
+            output.truncate(output_bytes)
+            output.seek(output_bytes)
+            try:
+                source_rows = self.read_rows(source, is_tsv)
+                if header:
+                    # L'en-tête n'est pas traduit : la colonne ajoutée prend le code de la langue cible
+                    title = next(source_rows, None)
+                    if title is not None and not done_lines:
+                        done_lines = self.write_lines(output, ['\t'.join(title + [tgt_lang])], checkpoint_path, run, 1)
+                # L'en-tête compte parmi les lignes déjà écrites
+                skip = done_lines - 1 if header and done_lines else done_lines
+                for rows in self.read_chunks(source_rows, skip, options['chunk_size']):
+                    texts = [row[options['column']] if len(row) > options['column'] else '' for row in rows] \
+                        if is_tsv else rows
+                    task = pool.apply_async(
+                        translate_lines, (texts, src_lang, tgt_lang, options['batch_size'], options['preset'])
+                    )
+                    pending.append((rows, task))
+                    while len(pending) >= workers * 2:
+                        done_lines, translated = self.write_chunk(
+                            pending.popleft(), output, is_tsv, checkpoint_path, run, done_lines, translated,
+                            started_at,
+                        )
+                while pending:
+                    done_lines, translated = self.write_chunk(
+                        pending.popleft(), output, is_tsv, checkpoint_path, run, done_lines, translated, started_at,
+                    )
+            finally:
+                pool.terminate()
+                pool.join()
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        duration = time.perf_counter() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f"{translated} lignes traduites en {duration:.1f}s ({translated / duration if duration else 0:.1f} lignes/s)."
+        ))
+
+    def resume(self, checkpoint_path, output_path, run, restart):
+        """(lignes déjà traduites, octets valides du fichier de sortie) d'après le fichier de reprise"""
+        if restart or not os.path.exists(checkpoint_path):
+            return 0, 0
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint['run'] != run:
+            raise CommandError(
+                f"{checkpoint_path} correspond à une autre traduction ; relancez avec --restart pour recommencer."
+            )
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < checkpoint['output_bytes']:
+            raise CommandError(f"{output_path} est plus court que l'indique {checkpoint_path} ; relancez avec --restart.")
+        return checkpoint['lines'], checkpoint['output_bytes']
+
+    @staticmethod
+    def read_rows(source, is_tsv):
+        """Lignes (ou lignes TSV découpées) du fichier d'entrée, en flux"""
+        if is_tsv:
+            return csv.reader(source, delimiter='\t', quoting=csv.QUOTE_NONE)
+        return (line.rstrip('\r\n') for line in source)
+
+    @staticmethod
+    def read_chunks(rows, skip, chunk_size):
+        """Blocs de chunk_size lignes, après les skip premières"""
+        chunk = []
+        for n, row in enumerate(rows):
+            if n < skip:
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def write_chunk(self, item, output, is_tsv, checkpoint_path, run, done_lines, translated, started_at):
+        """Écrit un bloc terminé, puis enregistre la reprise une fois la sortie sur disque"""
+        rows, task = item
+        translations = task.get()
+        lines = ['\t'.join(row + [translation]) if is_tsv else translation for row, translation in zip(rows, translations)]
+        done_lines = self.write_lines(output, lines, checkpoint_path, run, done_lines + len(rows))
+        translated += len(rows)
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(f"{done_lines} lignes, {translated / elapsed:.1f} lignes/s")
+        return done_lines, translated
+
+    @staticmethod
+    def write_lines(output, lines, checkpoint_path, run, done_lines):
+        """Ajoute des lignes à la sortie, puis enregistre la reprise (done_lines lues) une fois sur disque"""
+        output.write(''.join(f"{line}\n" for line in lines).encode('utf-8'))
+        output.flush()
+        os.fsync(output.fileno())
+
+        temporary_path = f"{checkpoint_path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump({'run': run, 'lines': done_lines, 'output_bytes': output.tell()}, f)
+        os.replace(temporary_path, checkpoint_path)
+        return done_lines
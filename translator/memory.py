@@ -0,0 +1,309 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import normalize_text
+from .metrics import MEMORY_LOOKUPS
+from .profiling import add_timing
+from .utils import load_parallel_pairs
+
+logger = logging.getLogger(__name__)
+
+# Langues du corpus (nom du dossier data/languages/<Nom>, code ou nom de core.Language) -> code mBART-50
+MEMORY_LANGUAGES = {'ruund': 'ruu_CM', 'ruu': 'ruu_CM'}
+FRENCH = 'fr_XX'
+CONTRIBUTIONS_SOURCE = 'contributions'
+
+# Traduction validée, source qui la fournit, et texte d'origine tel qu'il y est écrit
+MemoryMatch = namedtuple('MemoryMatch', ['translation', 'origin', 'source_text'])
+
+# Origine des traductions de la requête en cours (champ « source » de l'API), positionnée par les vues
+memory_usage = contextvars.ContextVar('memory_usage', default=None)
+
+
+def memory_enabled():
+    """La mémoire de traduction est consultée avant le modèle, sauf si TRANSLATION_MEMORY=false"""
+    return os.environ.get('TRANSLATION_MEMORY', 'True').lower() == 'true'
+
+
+def memory_contributions():
+    """
+    Contributions indexées (TRANSLATION_MEMORY_CONTRIBUTIONS) : staff (par défaut, celles des
+    membres de l'équipe), all ou none. Une contribution indexée remplace la sortie du modèle
+    pour tous les utilisateurs, et les contributions ne sont pas modérées.
+    """
+    value = os.environ.get('TRANSLATION_MEMORY_CONTRIBUTIONS', 'staff').lower()
+    if value not in ('staff', 'all', 'none'):
+        raise ValueError(f"TRANSLATION_MEMORY_CONTRIBUTIONS inconnu : {value} (attendu : staff, all ou none)")
+    return value
+
+
+class MemoryUsage:
+    """Textes traduits pour la requête en cours et leur origine : source de la mémoire, ou None (modèle)"""
+
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, text, origin=None):
+        with self._lock:
+            self.entries.append((text, origin))
+
+    def merge(self, entries):
+        """Ajoute les origines d'un autre MemoryUsage (ex. reçues du serveur d'inférence)"""
+        for text, origin in entries:
+            self.add(text, origin)
+
+    def origin(self, text):
+        """Origine de la dernière traduction de text"""
+        with self._lock:
+            return next((origin for entry, origin in reversed(self.entries) if entry == text), None)
+
+    def source(self):
+        """Champs de la réponse : « memory » si tout le texte vient de la mémoire, « model » sinon"""
+        with self._lock:
+            origins = [origin for _, origin in self.entries]
+        if origins and None not in origins:
+            return {'source': 'memory', 'memory_origin': origins[0]}
+        return {'source': 'model'}
+
+
+@contextlib.contextmanager
+def observed_memory():
+    """Relève l'origine des traductions de la requête en cours ; fournit le MemoryUsage"""
+    usage = MemoryUsage()
+    token = memory_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        memory_usage.reset(token)
+
+
+def record_translation(text, origin=None):
+    """Reporte l'origine d'une traduction dans celles de la requête en cours"""
+    usage = memory_usage.get()
+    if usage is not None:
+        usage.add(text, origin)
+
+
+def lookup_memory(text, src_lang, tgt_lang):
+    """Correspondance exacte dans la mémoire de traduction (si activée), ou None"""
+    if not memory_enabled():
+        return None
+    start = time.perf_counter()
+    match = TranslationMemory().lookup(text, src_lang, tgt_lang)
+    add_timing('memory', time.perf_counter() - start)
+    if match is not None:
+        record_translation(text, match.origin)
+    return match
+
+
+def memory_key(text):
+    """Clé de recherche : texte normalisé (NFC, espaces), apostrophes unifiées, sans casse"""
+    return normalize_text(text).replace('’', "'").casefold()
+
+
+class TranslationMemory:
+    """
+    Mémoire de traduction exacte construite à partir des paires validées :
+    data/languages/<Langue>/phrases.tsv, corpus/both/ruund-french.tsv et les ContributionText
+    retenues par TRANSLATION_MEMORY_CONTRIBUTIONS, indexées dans les deux directions.
+    En cas d'égalité, les TSV passent avant les contributions.
+    Chaque source est indexée séparément et seule une source modifiée est relue :
+    les TSV d'après leur date et leur taille, les contributions d'après (nombre, id max),
+    avec lecture des seules nouvelles lignes quand il n'y a eu que des ajouts.
+    Les sources sont vérifiées au plus toutes les TRANSLATION_MEMORY_CHECK_SECONDS secondes,
+    et immédiatement après une modification de contribution dans ce processus. Singleton.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(TranslationMemory, cls).__new__(cls)
+                instance.check_interval = float(os.environ.get('TRANSLATION_MEMORY_CHECK_SECONDS', '10'))
+                # Source -> {(src_lang, tgt_lang, clé): (texte d'origine, traduction)}, et son empreinte
+                instance._sources = {}
+                instance._fingerprints = {}
+                instance._contribution_max_id = 0
+                # Index fusionné (src_lang, tgt_lang, clé) -> MemoryMatch, remplacé d'un bloc
+                instance._index = None
+                # Incrémentée à chaque reconstruction de l'index
+                instance.version = 0
+                instance._checked_at = 0.0
+                instance._dirty = True
+                instance._reload_contributions = False
+                instance._lock = threading.Lock()
+                instance.hits = 0
+                instance.misses = 0
+                cls._instance = instance
+            return cls._instance
+
+    def tsv_sources(self):
+        """Fichiers TSV (Ruund, Français) indexés : {chemin relatif: code de la langue source}"""
+        base_dir = settings.BASE_DIR
+        sources = {}
+        for path in sorted((base_dir / 'data' / 'languages').glob('*/phrases.tsv')):
+            lang_code = MEMORY_LANGUAGES.get(path.parent.name.lower())
+            if lang_code:
+                sources[str(path.relative_to(base_dir))] = lang_code
+        sources[os.path.join('corpus', 'both', 'ruund-french.tsv')] = 'ruu_CM'
+        return sources
+
+    def lookup(self, text, src_lang, tgt_lang):
+        """Traduction validée du texte exact, ou None"""
+        self.refresh()
+        match = self._index.get((src_lang, tgt_lang, memory_key(text)))
+        if match is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        MEMORY_LOOKUPS.labels(result='miss' if match is None else 'hit').inc()
+        return match
+
+    def mark_dirty(self, reload_contributions=False):
+        """
+        Force la vérification des sources à la prochaine recherche ; avec reload_contributions,
+        les contributions sont entièrement relues (modification ou suppression d'une ligne)
+        """
+        self._reload_contributions = self._reload_contributions or reload_contributions
+        self._dirty = True
+
+    def refresh(self, force=False):
+        """Relit les sources modifiées depuis la dernière vérification"""
+        if not (force or self._dirty or self._index is None
+                or time.monotonic() - self._checked_at >= self.check_interval):
+            return
+        # Une seule vérification à la fois ; les autres threads gardent l'index courant
+        if not self._lock.acquire(blocking=self._index is None or force):
+            return
+        try:
+            self._dirty = False
+            self._checked_at = time.monotonic()
+            changed = self._refresh_tsv_sources()
+            changed = self._refresh_contributions() or changed
+            if changed or self._index is None:
+                self._rebuild_index()
+        finally:
+            self._lock.release()
+
+    def _refresh_tsv_sources(self):
+        changed = False
+        sources = self.tsv_sources()
+        for name in [name for name in self._sources if name != CONTRIBUTIONS_SOURCE and name not in sources]:
+            del self._sources[name]
+            del self._fingerprints[name]
+            changed = True
+        for name, lang_code in sources.items():
+            path = settings.BASE_DIR / name
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+            if self._fingerprints.get(name) == fingerprint:
+                continue
+            entries = {}
+            for native, french in load_parallel_pairs(path):
+                self._add_pair(entries, lang_code, native, french)
+            self._sources[name] = entries
+            self._fingerprints[name] = fingerprint
+            changed = True
+            logger.info(f"Mémoire de traduction : {name} indexé ({len(entries)} entrées).")
+        return changed
+
+    def _refresh_contributions(self):
+        from contribution.models import ContributionText
+
+        contributions = memory_contributions()
+        if contributions == 'none':
+            changed = CONTRIBUTIONS_SOURCE in self._sources
+            self._sources.pop(CONTRIBUTIONS_SOURCE, None)
+            self._fingerprints.pop(CONTRIBUTIONS_SOURCE, None)
+            return changed
+        queryset = ContributionText.objects.all()
+        if contributions == 'staff':
+            # Contributions non modérées : seules celles de l'équipe font autorité
+            queryset = queryset.filter(user__is_staff=True)
+        try:
+            fingerprint = queryset.aggregate(count=Count('id'), max_id=Max('id'))
+            fingerprint = (fingerprint['count'], fingerprint['max_id'] or 0)
+            previous = self._fingerprints.get(CONTRIBUTIONS_SOURCE)
+            if self._reload_contributions:
+                self._reload_contributions = False
+                previous = None
+            elif previous == fingerprint:
+                return False
+            rows = queryset.select_related('language')
+            entries = self._sources.get(CONTRIBUTIONS_SOURCE)
+            added = fingerprint[0] - previous[0] if previous else None
+            new_rows = rows.filter(id__gt=self._contribution_max_id)
+            if entries is not None and added is not None and added == new_rows.count():
+                # Uniquement des ajouts : seules les nouvelles lignes sont lues
+                rows = new_rows
+            else:
+                entries = {}
+            for contribution in rows.order_by('id'):
+                language = contribution.language
+                lang_code = MEMORY_LANGUAGES.get(language.code.lower()) or MEMORY_LANGUAGES.get(language.name.lower())
+                if lang_code:
+                    self._add_pair(entries, lang_code, contribution.phrase_native, contribution.phrase_french)
+        except DatabaseError as e:
+            logger.warning(f"Mémoire de traduction : contributions illisibles ({e}).")
+            return False
+        self._sources[CONTRIBUTIONS_SOURCE] = entries
+        self._fingerprints[CONTRIBUTIONS_SOURCE] = fingerprint
+        self._contribution_max_id = fingerprint[1]
+        return True
+
+    @staticmethod
+    def _add_pair(entries, lang_code, native, french):
+        native, french = native.strip(), french.strip()
+        if not native or not french:
+            return
+        # La première traduction rencontrée pour un texte est conservée
+        entries.setdefault((lang_code, FRENCH, memory_key(native)), (native, french))
+        entries.setdefault((FRENCH, lang_code, memory_key(french)), (french, native))
+
+    def _rebuild_index(self):
+        index = {}
+        names = [name for name in self._sources if name != CONTRIBUTIONS_SOURCE]
+        if CONTRIBUTIONS_SOURCE in self._sources:
+            names.append(CONTRIBUTIONS_SOURCE)
+        for name in names:
+            for key, (source_text, translation) in self._sources[name].items():
+                if key not in index:
+                    index[key] = MemoryMatch(translation, name, source_text)
+        self._index = index
+        self.version += 1
+
+    def pairs(self, src_lang, tgt_lang):
+        """Toutes les paires validées d'une direction, sous forme de MemoryMatch"""
+        self.refresh()
+        return [match for (src, tgt, _), match in self._index.items() if src == src_lang and tgt == tgt_lang]
+
+    def stats(self):
+        return {
+            'entries': len(self._index or {}),
+            'sources': {name: len(entries) for name, entries in self._sources.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+@receiver(post_save, sender='contribution.ContributionText')
+@receiver(post_delete, sender='contribution.ContributionText')
+def contribution_changed(sender, created=False, **kwargs):
+    # Un ajout est lu incrémentalement ; une modification ou une suppression relit les contributions
+    TranslationMemory().mark_dirty(reload_contributions=not created)
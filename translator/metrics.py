@@ -0,0 +1,124 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+STAGE_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    'translation_stage_seconds', "Durée des étapes de la traduction (tokenize, generate, decode)",
+    ['stage', 'direction'], buckets=STAGE_BUCKETS,
+)
+INPUT_TOKENS = Counter('translation_input_tokens', "Tokens source envoyés au modèle", ['direction'])
+OUTPUT_TOKENS = Counter('translation_output_tokens', "Tokens générés par le modèle", ['direction'])
+TOKENS_PER_SECOND = Histogram(
+    'translation_tokens_per_second', "Débit de generate() en tokens générés par seconde",
+    ['direction'], buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+)
+QUEUE_DEPTH = Gauge('translation_inference_queue_depth', "Générations en attente", multiprocess_mode='livesum')
+RUNNING = Gauge('translation_inference_running', "Générations en cours", multiprocess_mode='livesum')
+QUEUE_WAIT_SECONDS = Histogram(
+    'translation_inference_wait_seconds', "Attente en file avant le début de la génération", buckets=STAGE_BUCKETS,
+)
+REFUSED = Counter('translation_inference_refused', "Générations refusées (file pleine, évincées, échéance)", ['reason'])
+PRIORITY_QUEUE_DEPTH = Gauge(
+    'translation_inference_queue_depth_by_priority', "Générations en attente par classe de priorité",
+    ['priority'], multiprocess_mode='livesum',
+)
+PRIORITY_WAIT_SECONDS = Histogram(
+    'translation_inference_wait_by_priority_seconds', "Attente en file par classe de priorité",
+    ['priority'], buckets=STAGE_BUCKETS,
+)
+ADMISSIONS = Counter(
+    'translation_admission_decisions',
+    "Décisions du contrôle d'admission par classe de priorité (admise, quota, file pleine, évincée, échéance)",
+    ['priority', 'decision'],
+)
+CACHE_LOOKUPS = Counter('translation_cache_lookups', "Recherches dans le cache des traductions", ['result'])
+MEMORY_LOOKUPS = Counter('translation_memory_lookups', "Recherches dans la mémoire de traduction", ['result'])
+DRAFT_TOKENS = Counter(
+    'translation_draft_tokens', "Tokens copiés de la source proposés au modèle, et acceptés (préréglage lookup)",
+    ['direction', 'outcome'],
+)
+MODEL_LOAD_SECONDS = Histogram(
+    'translation_model_load_seconds', "Durée de chargement des modèles",
+    ['direction', 'precision'], buckets=(.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "Durée des requêtes HTTP jusqu'à la réponse",
+    ['view', 'method', 'status'], buckets=STAGE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'http_db_queries', "Requêtes SQL par requête HTTP des vues de contribution",
+    ['view'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+
+
+def observe_generation(direction, input_tokens, output_tokens, seconds):
+    """Volume et débit d'un appel generate()"""
+    STAGE_SECONDS.labels(stage='generate', direction=direction).observe(seconds)
+    INPUT_TOKENS.labels(direction=direction).inc(input_tokens)
+    OUTPUT_TOKENS.labels(direction=direction).inc(output_tokens)
+    if seconds > 0:
+        TOKENS_PER_SECOND.labels(direction=direction).observe(output_tokens / seconds)
+
+
+class QueryCounter:
+    """execute_wrapper comptant les requêtes SQL de la connexion"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def observe_request(request, response, start, queries=None):
+    match = request.resolver_match
+    view = match.view_name if match else 'unmatched'
+    # Classe du statut (2xx, 4xx...) pour borner le nombre de séries
+    status = f"{response.status_code // 100}xx"
+    REQUEST_SECONDS.labels(view=view, method=request.method, status=status).observe(time.perf_counter() - start)
+    if queries is not None and match and match.app_name == 'contribution':
+        DB_QUERIES.labels(view=view).observe(queries.count)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Durée de chaque requête par vue, et nombre de requêtes SQL des vues de contribution"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            observe_request(request, response, start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                response = get_response(request)
+            observe_request(request, response, start, queries)
+            return response
+    return middleware
+
+
+def render_metrics():
+    """
+    (contenu, type MIME) au format texte Prometheus. Avec plusieurs workers Gunicorn,
+    PROMETHEUS_MULTIPROC_DIR désigne un dossier partagé, vidé au démarrage
+    (lugayetu.gunicorn_shared) et défini avant le premier import de prometheus_client :
+    chaque processus y écrit ses valeurs (fichiers mmap), agrégées à chaque collecte.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,37 +1,133 @@
+import contextlib
+import math
+import threading
 import time
 import torch
-from transformers import MBartForConditionalGeneration, AutoTokenizer
+from transformers import (
+    MBartForConditionalGeneration, AutoTokenizer,
+    StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer,
+)
 import logging
 import sys
 import os
 
+from .cache import TranslationCache, cache_enabled, make_cache_key
+from .compiled import bucket_length, compile_config, compiled_decoding_enabled, length_buckets, static_cache
+from .drafting import DraftStats, drafting, install_source_lookup, record_drafts
+from .inference import AdmissionRefused, InferenceExecutor, check_deadline, generation_time_limit
+from .memory import lookup_memory, record_translation
+from .metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS, observe_generation
+from .prepared import load_manifest, prepared_model_dir, prepared_models_enabled
+from .profiling import add_timing, generation_phases, register_encoder_hooks
+from .registry import ModelRegistry, configured_pairs, model_type_for_pair, pair_for_model_type
+from .segmentation import SegmentedText
+from .vocab import VocabMap, pruned_checkpoint_dir, pruned_vocab_enabled
+from .weights import load_mmap_model, mmap_weights_enabled
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class RemappedStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer d'un modèle au vocabulaire réduit : ids du modèle -> ids du tokenizer"""
+
+    def __init__(self, tokenizer, vocab_map, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.vocab_map = vocab_map
+
+    def put(self, value):
+        super().put(self.vocab_map.tokenizer_ids(value))
+
+
+class StopOnEvent(StoppingCriteria):
+    """Interrompt generate() dès que l'événement est positionné (ex. client déconnecté)"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+PRECISION_MODES = ("fp32", "int8-dynamic", "bf16")
+
+
+def bf16_supported():
+    """Vrai si le CPU dispose d'instructions bf16 exploitables par oneDNN (AVX512-BF16, AMX)"""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+# Préréglages de décodage, sélectionnables par les appelants de l'API (champ « preset »)
+GENERATION_PRESETS = {
+    "fast": {"num_beams": 1, "do_sample": False},
+    "balanced": {"num_beams": 3, "do_sample": False, "early_stopping": True},
+    "best": {"num_beams": 5, "do_sample": False, "early_stopping": True},
+    # Glouton assisté : brouillons copiés de la source (noms, nombres, références de versets),
+    # vérifiés en un forward ; même sortie que fast, une phrase par generate()
+    "lookup": {"num_beams": 1, "do_sample": False, "prompt_lookup_num_tokens": 10, "max_matching_ngram_size": 2},
+}
+
+
+def resolve_preset(preset=None):
+    """Nom du préréglage demandé, ou celui par défaut (TRANSLATION_GENERATION_PRESET)"""
+    preset = preset or os.environ.get('TRANSLATION_GENERATION_PRESET', 'best')
+    if preset not in GENERATION_PRESETS:
+        raise ValueError(f"Préréglage de génération inconnu : {preset} (attendu : {', '.join(GENERATION_PRESETS)})")
+    return preset
+
+
+def uses_source_lookup(preset=None):
+    """Vrai si le préréglage décode avec des brouillons copiés de la source"""
+    return "prompt_lookup_num_tokens" in GENERATION_PRESETS[resolve_preset(preset)]
+
+
 class TranslationModel:
     """
     Gestionnaire des modèles de traduction.
-    Gère plusieurs modèles (Ruund->Français et Français->Ruund) en tant que Singletons.
+    Une instance par checkpoint et par mode de précision (MODEL_PRECISION), conservée
+    dans le ModelRegistry : chargement à la première utilisation, retrait LRU au-delà
+    du budget mémoire.
     """
-    _instances = {}
 
-    def __new__(cls, model_type="ruu_fr"):
-        model_id = os.environ.get('MODEL_RUU_FR', 'eliezermga/ruund-translate') if model_type == "ruu_fr" else os.environ.get('MODEL_FR_RUU', 'eliezermga/french-rund-translator')
-        
-        if model_id not in cls._instances:
-            logger.info(f"Création d'une nouvelle instance pour {model_type} ({model_id})")
-            instance = super(TranslationModel, cls).__new__(cls)
-            instance.model_id = model_id
-            instance.model_type = model_type
-            instance._load_model()
-            cls._instances[model_id] = instance
-        return cls._instances[model_id]
+    @staticmethod
+    def resolve(model_type="ruu_fr", precision=None):
+        """Checkpoint et mode de précision configurés pour une direction"""
+        pair = pair_for_model_type(model_type)
+        model_id = configured_pairs().get(pair)
+        if model_id is None:
+            raise ValueError(f"Aucun checkpoint configuré pour la paire {pair[0]} -> {pair[1]}")
+        precision = precision or os.environ.get('MODEL_PRECISION', 'fp32')
+        if precision not in PRECISION_MODES:
+            raise ValueError(f"MODEL_PRECISION inconnu : {precision} (attendu : {', '.join(PRECISION_MODES)})")
+        return model_id, precision
+
+    def __new__(cls, model_type="ruu_fr", precision=None):
+        key = cls.resolve(model_type, precision)
+        return ModelRegistry().acquire(key, lambda: cls._create(model_type, *key))
+
+    @classmethod
+    def _create(cls, model_type, model_id, precision):
+        logger.info(f"Création d'une nouvelle instance pour {model_type} ({model_id}, {precision})")
+        instance = super(TranslationModel, cls).__new__(cls)
+        instance.model_id = model_id
+        instance.model_type = model_type
+        instance.precision = precision
+        instance._load_model()
+        return instance
+
+    @classmethod
+    def unload(cls, model_type="ruu_fr", precision=None):
+        """Retire l'instance du registre pour libérer sa mémoire"""
+        ModelRegistry().evict(cls.resolve(model_type, precision))
 
     def _load_model(self):
         """Charge le modèle et le tokenizer depuis Hugging Face"""
         start_time = time.perf_counter()
         logger.info(f"Chargement du modèle {self.model_id}...")
+        self.vocab_map = None
         
         try:
             # Utiliser le token HF s'il est présent dans l'environnement
@@ -40,6 +136,27 @@ class TranslationModel:
             
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Utilisation du périphérique: {self.device}")
+
+            # Checkpoint à vocabulaire réduit (python manage.py prune_vocabulary), si activé
+            self.checkpoint = self.model_id
+            self.prepared = None
+            if pruned_vocab_enabled():
+                pruned_dir = pruned_checkpoint_dir(self.model_id)
+                if os.path.isdir(pruned_dir):
+                    self.checkpoint = pruned_dir
+                else:
+                    logger.warning(f"Pas de checkpoint réduit pour {self.model_id} ({pruned_dir}), vocabulaire complet.")
+            # Sinon, artefact préparé (python manage.py prepare_models) : local, déjà redimensionné
+            if self.checkpoint == self.model_id and prepared_models_enabled():
+                prepared_dir = prepared_model_dir(self.model_id)
+                self.prepared = load_manifest(prepared_dir)
+                if self.prepared is not None:
+                    self.checkpoint = prepared_dir
+                    logger.info(f"Artefact préparé pour {self.model_id} : {prepared_dir}.")
+            if os.path.isdir(self.checkpoint):
+                self.vocab_map = VocabMap.load(self.checkpoint)
+                if self.vocab_map is not None:
+                    logger.info(f"Vocabulaire réduit à {len(self.vocab_map)} tokens ({self.checkpoint}).")
             
             # 1. Charger le tokenizer
             logger.info(f"Chargement du tokenizer pour {self.model_id}...")
@@ -47,7 +164,7 @@ class TranslationModel:
                 # On force fr_XX au début car ruu_CM n'est pas encore dans le vocabulaire
                 # et mBART crashe à l'init s'il ne connaît pas la src_lang.
                 self.tokenizer = AutoTokenizer.from_pretrained(
-                    self.model_id, 
+                    self.checkpoint, 
                     token=hf_token,
                     trust_remote_code=True,
                     src_lang="fr_XX"
@@ -55,7 +172,7 @@ class TranslationModel:
             except Exception as e:
                 logger.warning(f"Erreur init tokenizer avec fr_XX: {e}")
                 self.tokenizer = AutoTokenizer.from_pretrained(
-                    self.model_id, 
+                    self.checkpoint, 
                     token=hf_token,
                     trust_remote_code=True
                 )
@@ -74,26 +191,52 @@ class TranslationModel:
                 self.tokenizer.lang_code_to_id["ruu_CM"] = self.tokenizer.convert_tokens_to_ids("ruu_CM")
 
             # Définir les langues par défaut pour ce tokenizer
-            if self.model_type == "ruu_fr":
-                self.tokenizer.src_lang = "ruu_CM"
-                self.tokenizer.tgt_lang = "fr_XX"
-            else:
-                self.tokenizer.src_lang = "fr_XX"
-                self.tokenizer.tgt_lang = "ruu_CM"
+            src_lang, tgt_lang = pair_for_model_type(self.model_type)
+            if src_lang in self.tokenizer.lang_code_to_id:
+                self.tokenizer.src_lang = src_lang
+                self.tokenizer.tgt_lang = tgt_lang
+
+            # Tokens spéciaux encadrant la source, le code de langue étant remplacé à chaque
+            # appel : le tokenizer n'est plus modifié après le chargement (partage entre threads)
+            self.source_template = self._source_template()
             
             # 2. Charger le modèle
             logger.info(f"Chargement du modèle {self.model_id} (peut prendre du temps)...")
-            self.model = MBartForConditionalGeneration.from_pretrained(
-                self.model_id,
-                token=hf_token,
-                ignore_mismatched_sizes=True
-            ).to(self.device)
-            
-            # 3. Ajuster le vocabulaire si nécessaire
-            self.model.resize_token_embeddings(len(self.tokenizer))
+            self.model = None
+            if mmap_weights_enabled() and self.device == "cpu":
+                # Poids projetés en mémoire : partagés via le cache de pages entre workers
+                vocab_size = len(self.vocab_map) if self.vocab_map is not None else len(self.tokenizer)
+                self.model = load_mmap_model(self.checkpoint, token=hf_token, vocab_size=vocab_size)
+                if self.model is not None:
+                    logger.info(f"Poids de {self.model_id} projetés en mémoire (mmap), sans copie.")
+
+            if self.model is None:
+                self.model = MBartForConditionalGeneration.from_pretrained(
+                    self.checkpoint,
+                    token=hf_token,
+                    ignore_mismatched_sizes=True
+                ).to(self.device)
+
+                # 3. Ajuster le vocabulaire si nécessaire (jamais pour un vocabulaire réduit ou un artefact préparé)
+                if self.vocab_map is None and self.prepared is None:
+                    self.model.resize_token_embeddings(len(self.tokenizer))
             self.model.eval()
+
+            # 4. Mode de précision
+            self._apply_precision()
+            # Durée de l'encodeur, pour l'en-tête Server-Timing
+            register_encoder_hooks(self.model)
+            # Brouillons du préréglage lookup cherchés dans la source (glouton simple sinon)
+            self.source_lookup = install_source_lookup(self.model)
+            # Décodage compilé : paliers de longueur tracés avant la première requête
+            if compiled_decoding_enabled():
+                self._trace_compiled()
+
+            # Révision du checkpoint, utilisée dans la clé du cache des traductions
+            self.revision = self._resolve_revision()
             
             load_duration = time.perf_counter() - start_time
+            MODEL_LOAD_SECONDS.labels(direction=self.model_type, precision=self.precision).observe(load_duration)
             logger.info(f"Modèle {self.model_id} chargé avec succès en {load_duration:.3f}s.")
         except Exception as e:
             logger.error(f"Erreur lors du chargement du modèle {self.model_id}: {str(e)}")
@@ -102,31 +245,489 @@ class TranslationModel:
             self.model = None
             self.tokenizer = None
 
-    def translate(self, text, src_lang="ruu_CM", tgt_lang="fr_XX"):
-        """Traduit le texte source vers la langue cible"""
+    def _apply_precision(self):
+        """
+        fp32 : poids d'origine.
+        int8-dynamic : couches Linear quantifiées en int8 (activations quantifiées à la volée).
+        bf16 : calcul en autocast bfloat16, si le CPU le supporte ; sinon repli en fp32.
+        """
+        if self.precision == "int8-dynamic":
+            if self.device != "cpu":
+                logger.warning("La quantification int8 dynamique n'est disponible que sur CPU, repli en fp32.")
+                self.precision = "fp32"
+                return
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif self.precision == "bf16" and self.device == "cpu" and not bf16_supported():
+            logger.warning("Ce CPU ne supporte pas bf16, repli en fp32.")
+            self.precision = "fp32"
+
+    def inference_context(self):
+        """Contexte d'exécution de generate() selon le mode de précision"""
+        if self.precision == "bf16":
+            return torch.autocast(device_type=self.device, dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    # Longueur maximale d'une sortie, comme à l'entraînement (max_length=128)
+    max_output_tokens = 128
+
+    def generation_params(self, preset=None):
+        """Paramètres de décodage du préréglage, également inclus dans la clé du cache"""
+        preset = resolve_preset(preset)
+        return {
+            "preset": preset,
+            **GENERATION_PRESETS[preset],
+            "max_length_ratio": float(os.environ.get('TRANSLATION_MAX_LENGTH_RATIO', '2.0')),
+        }
+
+    def output_budget(self, source_tokens, max_length_ratio):
+        """Nombre maximal de tokens générés pour une source de source_tokens sous-mots"""
+        # + 2 : code de langue cible forcé et eos ; la marge couvre l'écart entre mots
+        # (unité du ratio) et sous-mots sur les phrases très courtes
+        return min(self.max_output_tokens, math.ceil(source_tokens * max_length_ratio) + 2 + 8)
+
+    def generation_kwargs(self, encoded_input, preset=None, num_return_sequences=1):
+        """
+        Arguments de generate() : ceux du préréglage, et un max_new_tokens déduit de la
+        plus longue source du lot, borné par le ratio de longueur cible/source du
+        filtrage du corpus d'entraînement (≤ 2.0).
+        """
+        params = self.generation_params(preset)
+        special_tokens = sum(len(tokens) for tokens in self.source_template)
+        source_tokens = max(1, int(encoded_input["attention_mask"].sum(dim=1).max()) - special_tokens)
+        kwargs = {
+            key: value for key, value in params.items() if key not in ("preset", "max_length_ratio")
+        }
+        kwargs["max_new_tokens"] = self.output_budget(source_tokens, params["max_length_ratio"])
+        if num_return_sequences > 1 or not self.source_lookup:
+            # Recherche en faisceau, ou brouillons de la source non installés : pas de décodage assisté
+            kwargs.pop("prompt_lookup_num_tokens", None)
+            kwargs.pop("max_matching_ngram_size", None)
+        if num_return_sequences > 1:
+            kwargs["num_beams"] = max(kwargs["num_beams"], num_return_sequences)
+            kwargs["num_return_sequences"] = num_return_sequences
+        if self.compiles(preset, num_return_sequences):
+            # Cache dimensionné d'après le palier (la source est complétée jusqu'à lui par
+            # encode()) : un seul graphe compilé par palier, quelle que soit la phrase
+            encoder_length = encoded_input["input_ids"].shape[1]
+            cache_length = self.output_budget(encoder_length - special_tokens, params["max_length_ratio"]) + 1
+            kwargs["past_key_values"] = static_cache(self.model.config, cache_length, encoder_length)
+            kwargs["compile_config"] = compile_config()
+        return kwargs
+
+    # Vrai une fois les paliers de longueur tracés (TRANSLATION_COMPILE)
+    compiled = False
+    # Vrai si les brouillons du préréglage lookup sont cherchés dans la source (install_source_lookup)
+    source_lookup = False
+
+    def compiles(self, preset=None, num_return_sequences=1):
+        """
+        Vrai si les generate() du préréglage passent par le décodage compilé : transformers ne
+        compile que le décodage glouton ou par échantillonnage, pas la recherche en faisceau,
+        et le décodage assisté (lookup) exige un cache dynamique.
+        """
+        preset = resolve_preset(preset)
+        return (
+            self.compiled and num_return_sequences == 1
+            and GENERATION_PRESETS[preset]["num_beams"] == 1 and not uses_source_lookup(preset)
+        )
+
+    def _trace_compiled(self):
+        """
+        Compile le pas du décodeur pour chaque palier de longueur (un lot d'une phrase, décodage
+        glouton), afin que les premières requêtes ne paient pas la compilation. En cas
+        d'échec (ex. opérateur non supporté par le mode de précision), repli sur le chemin eager.
+        """
+        self.compiled = True
+        src_lang, tgt_lang = pair_for_model_type(self.model_type)
+        # Source vide complétée jusqu'au palier : seules les dimensions comptent pour le graphe
+        encoded_input = self.encode([""], src_lang)
+        length = encoded_input["input_ids"].shape[1]
+        pad_id = self.model_token_id(self.tokenizer.pad_token_id)
+        try:
+            for bucket in length_buckets():
+                if bucket < length:
+                    continue
+                start = time.perf_counter()
+                padded_input = {
+                    "input_ids": torch.nn.functional.pad(encoded_input["input_ids"], (0, bucket - length), value=pad_id),
+                    "attention_mask": torch.nn.functional.pad(encoded_input["attention_mask"], (0, bucket - length)),
+                }
+                # Deux tokens : le premier pas (préremplissage) n'est pas compilé
+                with self.inference_context():
+                    self.model.generate(
+                        **padded_input,
+                        forced_bos_token_id=self.model_token_id(self.get_lang_id(tgt_lang)),
+                        **{**self.generation_kwargs(padded_input, "fast"), "max_new_tokens": 2},
+                    )
+                logger.info(
+                    f"Décodage compilé de {self.model_id} : palier de {bucket} tokens tracé "
+                    f"en {time.perf_counter() - start:.1f}s."
+                )
+        except Exception as e:
+            logger.warning(f"Décodage compilé indisponible pour {self.model_id}, repli sur le chemin eager : {e}")
+            self.compiled = False
+
+    def _resolve_revision(self):
+        """Hash du commit Hugging Face, ou date de modification pour un checkpoint local"""
+        if self.vocab_map is not None:
+            # Checkpoint réduit : ses traductions ne partagent pas le cache du modèle complet
+            return f"pruned-{int(os.path.getmtime(self.checkpoint))}"
+        if self.prepared is not None and self.prepared.get('revision'):
+            return self.prepared['revision']
+        commit_hash = getattr(self.model.config, '_commit_hash', None)
+        if commit_hash:
+            return commit_hash
+        if os.path.isdir(self.checkpoint):
+            return str(int(os.path.getmtime(self.checkpoint)))
+        return "unknown"
+
+    def cache_key(self, text, src_lang, tgt_lang, preset=None):
+        """Clé du cache des traductions pour ce modèle et ces paramètres"""
+        return make_cache_key(
+            self.model_id, f"{self.revision}:{self.precision}", src_lang, tgt_lang,
+            self.generation_params(preset), text
+        )
+
+    def _source_template(self):
+        """(préfixe, suffixe) des ids spéciaux de la source, None à la place du code de langue"""
+        lang_id = self.get_lang_id(self.tokenizer.src_lang) if getattr(self.tokenizer, 'src_lang', None) else None
+        prefix = getattr(self.tokenizer, 'prefix_tokens', [])
+        suffix = getattr(self.tokenizer, 'suffix_tokens', [self.tokenizer.eos_token_id])
+        # Appel sans padding ni troncature : désactive celles du backend, avant tout partage
+        self.tokenizer("", add_special_tokens=False)
+        return (
+            [None if token_id == lang_id else token_id for token_id in prefix],
+            [None if token_id == lang_id else token_id for token_id in suffix],
+        )
+
+    def encode(self, texts, src_lang, bucketed=False):
+        """
+        Ids d'entrée avec padding pour un lot de textes, sans modifier le tokenizer :
+        [code langue source] + sous-mots + [eos] (selon le gabarit du checkpoint).
+        Avec bucketed, la longueur est complétée jusqu'au palier du décodage compilé.
+        """
+        src_lang_id = self.get_lang_id(src_lang)
+        prefix, suffix = (
+            [src_lang_id if token_id is None else token_id for token_id in tokens]
+            for tokens in self.source_template
+        )
+        # tokenizer(...) réécrit le post-processeur du backend à chaque appel : on lit
+        # directement le backend Rust, en accès partagé, donc sans conflit entre threads
+        backend = getattr(self.tokenizer, 'backend_tokenizer', None)
+        if backend is not None:
+            token_ids = [
+                # Padding éventuellement laissé actif sur le backend : on ne garde que les vrais tokens
+                [token_id for token_id, mask in zip(encoding.ids, encoding.attention_mask) if mask]
+                for encoding in backend.encode_batch(list(texts), add_special_tokens=False)
+            ]
+        else:
+            token_ids = [self.tokenizer.convert_tokens_to_ids(self.tokenizer.tokenize(text)) for text in texts]
+        sequences = [prefix + ids + suffix for ids in token_ids]
+        if self.vocab_map is not None:
+            sequences = [self.vocab_map.model_ids(ids) for ids in sequences]
+        max_length = max(len(ids) for ids in sequences)
+        if bucketed:
+            max_length = bucket_length(max_length)
+        pad_id = self.model_token_id(self.tokenizer.pad_token_id)
+        input_ids = torch.tensor([ids + [pad_id] * (max_length - len(ids)) for ids in sequences])
+        attention_mask = torch.tensor([[1] * len(ids) + [0] * (max_length - len(ids)) for ids in sequences])
+        return {"input_ids": input_ids.to(self.device), "attention_mask": attention_mask.to(self.device)}
+
+    def model_token_id(self, token_id):
+        """Id du tokenizer -> id du modèle (différent pour un vocabulaire réduit)"""
+        return self.vocab_map.model_id(token_id) if self.vocab_map is not None else token_id
+
+    def get_lang_id(self, lang_code):
+        """Retourne l'ID du token de langue (utilisé comme forced_bos_token_id)"""
+        try:
+            return self.tokenizer.lang_code_to_id[lang_code]
+        except (KeyError, AttributeError):
+            return self.tokenizer.convert_tokens_to_ids(lang_code)
+
+    def count_tokens(self, text):
+        """Nombre de sous-mots du texte, sans les tokens spéciaux"""
+        if self.tokenizer is None:
+            return len(text.split())
+        return len(self.tokenizer.tokenize(text))
+
+    def translate(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        """
+        Traduit le texte source vers la langue cible.
+        Le texte est découpé en phrases traduites en un seul lot, puis reconstruit
+        avec les espaces, sauts de ligne et numéros de versets d'origine.
+        Avec raise_errors=True, les erreurs sont levées au lieu d'être renvoyées
+        sous forme de message. Un texte présent tel quel dans la mémoire de
+        traduction reçoit directement sa traduction validée.
+        """
+        segmented = SegmentedText(text)
+        # Une phrase seule est cherchée dans la mémoire par translate_batch, avec les autres
+        if len(segmented.segments) > 1:
+            match = lookup_memory(text, src_lang, tgt_lang)
+            if match is not None:
+                return match.translation
+
         if self.model is None or self.tokenizer is None:
+            if raise_errors:
+                raise RuntimeError("Modèle non chargé.")
             return "Erreur: Modèle non chargé."
 
         try:
-            # On définit la langue source sur le tokenizer
-            self.tokenizer.src_lang = src_lang
-            
-            encoded_input = self.tokenizer(text, return_tensors="pt", padding=True).to(self.device)
-            
-            # Récupération de l'ID du token de langue cible
-            try:
-                tgt_lang_id = self.tokenizer.lang_code_to_id[tgt_lang]
-            except (KeyError, AttributeError):
-                tgt_lang_id = self.tokenizer.convert_tokens_to_ids(tgt_lang)
-
-            generated_tokens = self.model.generate(
-                **encoded_input,
-                forced_bos_token_id=tgt_lang_id,
-                max_length=128
+            translations = self.translate_segments(
+                segmented.segments, src_lang, tgt_lang, raise_errors=True, preset=preset
             )
-            
-            translation = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
-            return translation
+        except AdmissionRefused:
+            # File pleine, échéance : refus à renvoyer au client (429/503), pas une traduction
+            raise
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Erreur pendant la traduction ({self.model_id}): {str(e)}")
             return f"Erreur de traduction: {str(e)}"
+        return segmented.join(translations)
+
+    def translate_alternatives(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", n_best=3, raise_errors=False,
+                               preset=None):
+        """
+        Les n_best meilleures traductions du texte, issues d'une seule recherche en
+        faisceau : la k-ième alternative assemble la k-ième hypothèse de chaque phrase.
+        Ces alternatives ne passent pas par le cache. Un texte présent tel quel dans la
+        mémoire de traduction n'a que sa traduction validée.
+        """
+        match = lookup_memory(text, src_lang, tgt_lang)
+        if match is not None:
+            return [match.translation]
+
+        if self.model is None or self.tokenizer is None:
+            if raise_errors:
+                raise RuntimeError("Modèle non chargé.")
+            return ["Erreur: Modèle non chargé."]
+
+        segmented = SegmentedText(text)
+        if not segmented.segments:
+            return [segmented.join([])]
+        try:
+            hypotheses = self._generate(segmented.segments, src_lang, tgt_lang, preset, num_return_sequences=n_best)
+        except AdmissionRefused:
+            raise
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Erreur pendant la traduction ({self.model_id}): {str(e)}")
+            return [f"Erreur de traduction: {str(e)}"]
+        record_translation(text)
+        per_segment = [hypotheses[i * n_best:(i + 1) * n_best] for i in range(len(segmented.segments))]
+        return [segmented.join([segment[k] for segment in per_segment]) for k in range(n_best)]
+
+    def translate_segments(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", batch_size=16, raise_errors=False,
+                           preset=None):
+        """
+        Traduit un grand nombre de segments : ils sont triés par longueur pour
+        limiter le padding, traduits par lots de batch_size, puis remis dans
+        l'ordre d'origine.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        translations = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            results = self.translate_batch(
+                [texts[i] for i in chunk], src_lang, tgt_lang, raise_errors=raise_errors, preset=preset
+            )
+            for i, translation in zip(chunk, results):
+                translations[i] = translation
+        return translations
+
+    def translate_batch(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        """
+        Traduit une liste de textes en un seul appel generate().
+        Les entrées sont complétées (padding) à la longueur de la plus longue ;
+        les traductions sont renvoyées dans l'ordre des textes reçus.
+        Avec raise_errors=True, les erreurs sont levées au lieu d'être
+        renvoyées sous forme de message à la place des traductions.
+        Les textes présents dans la mémoire de traduction n'atteignent pas le modèle.
+        """
+        if self.model is None or self.tokenizer is None:
+            if raise_errors:
+                raise RuntimeError("Modèle non chargé.")
+            return ["Erreur: Modèle non chargé."] * len(texts)
+
+        try:
+            translations = [None] * len(texts)
+            # Les phrases présentes dans la mémoire de traduction ne passent pas par le modèle
+            for i, text in enumerate(texts):
+                match = lookup_memory(text, src_lang, tgt_lang)
+                if match is not None:
+                    translations[i] = match.translation
+            pending = [i for i in range(len(texts)) if translations[i] is None]
+            if not pending:
+                return translations
+
+            pending_texts = [texts[i] for i in pending]
+            if not cache_enabled():
+                results = self._generate(pending_texts, src_lang, tgt_lang, preset)
+            else:
+                keys = [self.cache_key(text, src_lang, tgt_lang, preset) for text in pending_texts]
+                results = TranslationCache().translate_many(
+                    keys, pending_texts, lambda batch: self._generate(batch, src_lang, tgt_lang, preset)
+                )
+            for i, translation in zip(pending, results):
+                translations[i] = translation
+                record_translation(texts[i])
+            return translations
+        except AdmissionRefused:
+            raise
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Erreur pendant la traduction ({self.model_id}): {str(e)}")
+            return [f"Erreur de traduction: {str(e)}"] * len(texts)
+
+    def translate_stream(self, text, src_lang="ruu_CM", tgt_lang="fr_XX"):
+        """
+        Générateur produisant la traduction morceau par morceau, au fil du décodage.
+        Les phrases sont traduites l'une après l'autre, en décodage glouton (préréglage
+        « fast », seul compatible avec le flux) ; fermer le générateur (client
+        déconnecté) interrompt le generate() en cours. Un texte présent tel quel dans
+        la mémoire de traduction est envoyé d'un seul morceau.
+        """
+        match = lookup_memory(text, src_lang, tgt_lang)
+        if match is not None:
+            yield match.translation
+            return
+        if self.model is None or self.tokenizer is None:
+            raise RuntimeError("Modèle non chargé.")
+        record_translation(text)
+
+        segmented = SegmentedText(text)
+        if segmented.separators[0]:
+            yield segmented.separators[0]
+        for segment, separator in zip(segmented.segments, segmented.separators[1:]):
+            yield from self._stream_segment(segment, src_lang, tgt_lang)
+            if separator:
+                yield separator
+
+    def _stream_segment(self, text, src_lang, tgt_lang):
+        key = self.cache_key(text, src_lang, tgt_lang, "fast")
+        direction = model_type_for_pair(src_lang, tgt_lang)
+        if cache_enabled():
+            cached = TranslationCache().get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        tokenize_start = time.perf_counter()
+        encoded_input = self.encode([text], src_lang, bucketed=self.compiles("fast"))
+        tokenize_seconds = time.perf_counter() - tokenize_start
+        STAGE_SECONDS.labels(stage='tokenize', direction=direction).observe(tokenize_seconds)
+        add_timing('tokenize', tokenize_seconds)
+        generation_kwargs = self.generation_kwargs(encoded_input, "fast")
+        if self.vocab_map is not None:
+            streamer = RemappedStreamer(self.tokenizer, self.vocab_map, skip_prompt=True, skip_special_tokens=True)
+        else:
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop = threading.Event()
+        errors = []
+
+        def run():
+            generate_start = time.perf_counter()
+            try:
+                with self.inference_context(), generation_phases():
+                    self.model.generate(
+                        **encoded_input,
+                        forced_bos_token_id=self.model_token_id(self.get_lang_id(tgt_lang)),
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StopOnEvent(stop)]),
+                        max_time=generation_time_limit(),
+                        **generation_kwargs
+                    )
+                check_deadline()
+                STAGE_SECONDS.labels(stage='generate', direction=direction).observe(
+                    time.perf_counter() - generate_start
+                )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        def end_if_refused(future):
+            # Refusé avant de démarrer (échéance, éviction) : run() ne terminera pas le flux
+            if future.cancelled() or future.exception() is not None:
+                streamer.end()
+
+        # Le décodage occupe un worker de l'exécuteur d'inférence, comme une traduction normale
+        future = InferenceExecutor().submit(run)
+        future.add_done_callback(end_if_refused)
+        parts = []
+        try:
+            for chunk in streamer:
+                if chunk:
+                    parts.append(chunk)
+                    yield chunk
+        finally:
+            # Générateur fermé avant la fin : on arrête le décodage au pas suivant
+            stop.set()
+            future.result()
+
+        if errors:
+            raise errors[0]
+        if cache_enabled():
+            TranslationCache().set(key, ''.join(parts).strip())
+
+    def _generate(self, texts, src_lang, tgt_lang, preset=None, num_return_sequences=1):
+        """
+        Tokenisation avec padding, un seul generate() et décodage du lot.
+        Avec num_return_sequences > 1, les hypothèses de chaque texte se suivent.
+        """
+        if len(texts) > 1 and num_return_sequences == 1 and uses_source_lookup(preset) and self.source_lookup:
+            # Le décodage assisté ne traite qu'une séquence par generate()
+            return [translation for text in texts for translation in self._generate([text], src_lang, tgt_lang, preset)]
+        # Direction de l'appel, pour les métriques : un checkpoint bidirectionnel sert les deux
+        direction = model_type_for_pair(src_lang, tgt_lang)
+        tokenize_start = time.perf_counter()
+        encoded_input = self.encode(texts, src_lang, bucketed=self.compiles(preset, num_return_sequences))
+        tokenize_seconds = time.perf_counter() - tokenize_start
+        STAGE_SECONDS.labels(stage='tokenize', direction=direction).observe(tokenize_seconds)
+        add_timing('tokenize', tokenize_seconds)
+        generation_kwargs = self.generation_kwargs(encoded_input, preset, num_return_sequences)
+
+        # Récupération de l'ID du token de langue cible
+        tgt_lang_id = self.model_token_id(self.get_lang_id(tgt_lang))
+        drafts = None
+        if "prompt_lookup_num_tokens" in generation_kwargs:
+            drafts = DraftStats()
+            # Décodeur amorcé avec le code de langue cible : son jeton de départ étant eos, le
+            # décodage assisté de transformers considérerait la séquence terminée dès le départ
+            generation_kwargs["decoder_input_ids"] = torch.tensor(
+                [[self.model.config.decoder_start_token_id, tgt_lang_id]], device=self.device
+            )
+            generation_kwargs["max_new_tokens"] -= 1
+
+        def run():
+            generate_start = time.perf_counter()
+            with self.inference_context(), generation_phases(), drafting(drafts):
+                tokens = self.model.generate(
+                    **encoded_input,
+                    forced_bos_token_id=tgt_lang_id,
+                    max_time=generation_time_limit(),
+                    **generation_kwargs
+                )
+            check_deadline()
+            return tokens, time.perf_counter() - generate_start
+
+        generated_tokens, generate_seconds = InferenceExecutor().run(run)
+        observe_generation(
+            direction,
+            int(encoded_input['attention_mask'].sum()),
+            int((generated_tokens != self.model.generation_config.pad_token_id).sum()),
+            generate_seconds,
+        )
+        if drafts is not None:
+            record_drafts(direction, drafts)
+        decode_start = time.perf_counter()
+        if self.vocab_map is not None:
+            generated_tokens = self.vocab_map.tokenizer_ids(generated_tokens)
+        translations = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+        decode_seconds = time.perf_counter() - decode_start
+        STAGE_SECONDS.labels(stage='decode', direction=direction).observe(decode_seconds)
+        add_timing('decode', decode_seconds)
+        return translations
@@ -0,0 +1,66 @@
+import json
+import os
+import logging
+
+import torch
+import transformers
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PREPARED_MANIFEST_FILENAME = 'prepared.json'
+# À incrémenter quand la préparation change : les anciens artefacts sont alors ignorés
+PREPARED_FORMAT = 1
+
+
+def prepared_models_enabled():
+    """Chargement des artefacts préparés (python manage.py prepare_models), désactivable via MODEL_PREPARED=false"""
+    return os.environ.get('MODEL_PREPARED', 'True').lower() == 'true'
+
+
+def prepared_model_dir(model_id):
+    """Dossier versionné de l'artefact préparé d'un modèle (MODEL_PREPARED_DIR, par défaut models/prepared/)"""
+    root = os.environ.get('MODEL_PREPARED_DIR') or settings.BASE_DIR / 'models' / 'prepared'
+    return os.path.join(root, str(model_id).strip('/').replace('/', '--'), f"v{PREPARED_FORMAT}")
+
+
+def load_manifest(path):
+    """Description de l'artefact préparé dans path, ou None s'il est absent ou d'un autre format"""
+    manifest_path = os.path.join(path, PREPARED_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != PREPARED_FORMAT:
+        return None
+    if manifest.get('transformers') != transformers.__version__:
+        logger.info(
+            f"Artefact {path} préparé avec transformers {manifest.get('transformers')} "
+            f"(installé : {transformers.__version__})."
+        )
+    return manifest
+
+
+def save_prepared(model, tokenizer, model_id, revision, path):
+    """
+    Enregistre le modèle déjà redimensionné (safetensors, fp32) et le tokenizer complété
+    (ruu_CM) dans path. Le manifeste est écrit en dernier : un artefact incomplet est ignoré.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, PREPARED_MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    manifest = {
+        'format': PREPARED_FORMAT,
+        'model_id': model_id,
+        # Révision du checkpoint d'origine : le cache des traductions reste partagé avec lui
+        'revision': revision,
+        'vocab_size': model.get_input_embeddings().num_embeddings,
+        'transformers': transformers.__version__,
+        'torch': torch.__version__,
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,172 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+
+import torch
+from django.conf import settings
+
+# Durées par phase de la requête en cours (en-tête Server-Timing), positionnées par les vues.
+# InferenceExecutor.submit() transmet le contexte au worker qui exécute generate().
+server_timing = contextvars.ContextVar('server_timing', default=None)
+# Profileur de la requête en cours (?profile=cprofile|torch, administrateurs seulement)
+request_profiler = contextvars.ContextVar('request_profiler', default=None)
+
+PROFILE_KINDS = ('cprofile', 'torch')
+
+# Début du forward de l'encodeur en cours, par thread
+_encoder_calls = threading.local()
+
+
+class ServerTiming:
+    """Durées cumulées par phase d'une requête, au format de l'en-tête Server-Timing"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self):
+        """« tokenize;dur=1.2, queue;dur=0.0, encoder;dur=4.8, ..., total;dur=93.5 » (millisecondes)"""
+        with self._lock:
+            phases = list(self.phases.items())
+        phases.append(('total', time.perf_counter() - self.start))
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases)
+
+
+def add_timing(name, seconds):
+    """Ajoute une durée à la phase name de la requête en cours, s'il y en a une"""
+    timing = server_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+def encoder_started(module, args):
+    _encoder_calls.start = time.perf_counter()
+
+
+def encoder_finished(module, args, output):
+    add_timing('encoder', time.perf_counter() - _encoder_calls.start)
+
+
+def register_encoder_hooks(model):
+    """Mesure du forward de l'encodeur, pour séparer encodeur et décodeur dans generate()"""
+    encoder = model.get_encoder()
+    encoder.register_forward_pre_hook(encoder_started)
+    encoder.register_forward_hook(encoder_finished)
+
+
+@contextlib.contextmanager
+def generation_phases():
+    """
+    Autour d'un generate() : la durée hors encodeur est comptée comme « decoder »
+    (pas de décodage, recherche en faisceau), et le profileur éventuel est actif.
+    """
+    timing = server_timing.get()
+    profiler = request_profiler.get()
+    # Démarrage du profileur et export des traces hors de la durée mesurée
+    with profiler.worker() if profiler is not None else contextlib.nullcontext():
+        encoder_before = timing.phases.get('encoder', 0.0) if timing is not None else 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if timing is not None:
+                elapsed = time.perf_counter() - start
+                timing.add('decoder', elapsed - (timing.phases.get('encoder', 0.0) - encoder_before))
+
+
+class RequestProfiler:
+    """
+    Profilage d'une requête : cProfile (code Python, dans le thread de la requête et dans
+    celui de l'exécuteur d'inférence) ou profileur torch (opérateurs de chaque generate()).
+    Les traces sont enregistrées dans TRANSLATION_PROFILE_DIR (par défaut profiles/) ;
+    report() en renvoie les chemins et un résumé.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.directory = os.environ.get('TRANSLATION_PROFILE_DIR') or settings.BASE_DIR / 'profiles'
+        self._profiles = []
+        self._summaries = []
+        self._traces = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _cprofile(self):
+        # Un profil par thread : un même profil ne peut pas être actif dans deux threads
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python >= 3.12 : le profil de la requête couvre déjà tous les threads
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def request(self):
+        """Autour de tout le traitement de la requête"""
+        return self._cprofile() if self.kind == 'cprofile' else contextlib.nullcontext()
+
+    @contextlib.contextmanager
+    def worker(self):
+        """Autour d'un generate(), dans le thread de l'exécuteur d'inférence"""
+        if self.kind == 'cprofile':
+            with self._cprofile():
+                yield
+            return
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as profile:
+            yield
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            path = os.path.join(self.directory, f"{self.id}-{len(self._traces)}.json")
+            self._traces.append(path)
+        profile.export_chrome_trace(path)
+        with self._lock:
+            self._summaries.append(profile.key_averages().table(sort_by='self_cpu_time_total', row_limit=20))
+
+    def report(self):
+        """{'kind', 'traces': chemins des traces, 'summary': résumé texte}"""
+        if self.kind == 'cprofile' and self._profiles:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{self.id}.prof")
+            output = io.StringIO()
+            stats = pstats.Stats(*self._profiles, stream=output)
+            stats.dump_stats(path)
+            stats.sort_stats('cumulative').print_stats(30)
+            self._traces.append(path)
+            self._summaries.append(output.getvalue())
+        return {'kind': self.kind, 'traces': [str(path) for path in self._traces], 'summary': '\n'.join(self._summaries)}
+
+
+@contextlib.contextmanager
+def observed_request(profile=None):
+    """
+    Active la mesure des phases (et le profileur si profile est donné) pour la requête
+    en cours ; fournit (ServerTiming, RequestProfiler ou None).
+    """
+    timing = ServerTiming()
+    profiler = RequestProfiler(profile) if profile else None
+    timing_token = server_timing.set(timing)
+    profiler_token = request_profiler.set(profiler)
+    try:
+        with profiler.request() if profiler is not None else contextlib.nullcontext():
+            yield timing, profiler
+    finally:
+        server_timing.reset(timing_token)
+        request_profiler.reset(profiler_token)
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from .utils import model_size_bytes
+
+logger = logging.getLogger(__name__)
+
+# Directions historiques et leur paire de codes de langue mBART
+MODEL_TYPE_PAIRS = {
+    'ruu_fr': ('ruu_CM', 'fr_XX'),
+    'fr_ruu': ('fr_XX', 'ruu_CM'),
+}
+
+
+def pair_for_model_type(model_type):
+    """« ruu_fr » -> ('ruu_CM', 'fr_XX') ; les autres paires sont nommées « src:tgt »"""
+    if model_type in MODEL_TYPE_PAIRS:
+        return MODEL_TYPE_PAIRS[model_type]
+    src_lang, _, tgt_lang = model_type.partition(':')
+    return src_lang, tgt_lang
+
+
+def model_type_for_pair(src_lang, tgt_lang):
+    """Direction servant la paire ; une paire non déclarée retombe sur la direction historique"""
+    for model_type, pair in MODEL_TYPE_PAIRS.items():
+        if pair == (src_lang, tgt_lang):
+            return model_type
+    if (src_lang, tgt_lang) in configured_pairs():
+        return f"{src_lang}:{tgt_lang}"
+    return "ruu_fr" if src_lang == "ruu_CM" else "fr_ruu"
+
+
+def _parse_pairs(value):
+    """« src:tgt,src:tgt » -> [(src, tgt), ...]"""
+    pairs = []
+    for item in value.split(','):
+        src, _, tgt = item.strip().partition(':')
+        if src and tgt:
+            pairs.append((src.strip(), tgt.strip()))
+    return pairs
+
+
+def bidirectional_checkpoint():
+    """MODEL_BIDIRECTIONAL : checkpoint unique servant ruu_CM -> fr_XX et fr_XX -> ruu_CM, ou None"""
+    return os.environ.get('MODEL_BIDIRECTIONAL', '').strip() or None
+
+
+def configured_pairs():
+    """
+    Paires (src_lang, tgt_lang) -> checkpoint. Les deux directions Ruund/Français
+    viennent de MODEL_RUU_FR / MODEL_FR_RUU, ou toutes deux de MODEL_BIDIRECTIONAL
+    (un seul jeu de poids, la direction ne dépendant que de src_lang et du code de
+    langue forcé en tête de la sortie) ; d'autres paires peuvent être déclarées dans
+    TRANSLATION_MODEL_PAIRS (« src:tgt=checkpoint,... »).
+    """
+    bidirectional = bidirectional_checkpoint()
+    pairs = {
+        MODEL_TYPE_PAIRS['ruu_fr']: bidirectional or os.environ.get('MODEL_RUU_FR', 'eliezermga/ruund-translate'),
+        MODEL_TYPE_PAIRS['fr_ruu']: bidirectional or os.environ.get('MODEL_FR_RUU', 'eliezermga/french-rund-translator'),
+    }
+    for item in os.environ.get('TRANSLATION_MODEL_PAIRS', '').split(','):
+        pair, _, model_id = item.partition('=')
+        for src, tgt in _parse_pairs(pair):
+            if model_id.strip():
+                pairs[(src, tgt)] = model_id.strip()
+    return pairs
+
+
+def pinned_pairs():
+    """Paires gardées en mémoire en permanence (TRANSLATION_MODEL_PINNED), les deux directions par défaut"""
+    default = ','.join(f"{src}:{tgt}" for src, tgt in MODEL_TYPE_PAIRS.values())
+    return _parse_pairs(os.environ.get('TRANSLATION_MODEL_PINNED', default))
+
+
+class _RegistryEntry:
+    __slots__ = ('instance', 'bytes', 'load_seconds', 'loaded_at', 'last_used', 'uses')
+
+    def __init__(self, instance, size, load_seconds):
+        self.instance = instance
+        self.bytes = size
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+
+
+class ModelRegistry:
+    """
+    Registre des modèles chargés, clé (checkpoint, précision).
+    Les modèles sont chargés à la première utilisation ; quand la mémoire des
+    poids dépasse TRANSLATION_MODEL_MEMORY_BUDGET_MB, les modèles les moins
+    récemment utilisés sont retirés, sauf ceux des paires épinglées.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(ModelRegistry, cls).__new__(cls)
+                instance.budget_bytes = int(os.environ.get('TRANSLATION_MODEL_MEMORY_BUDGET_MB', '0')) * 2 ** 20
+                instance._entries = OrderedDict()
+                instance._loading = {}
+                instance._lock = threading.Lock()
+                instance.evictions = 0
+                cls._instance = instance
+            return cls._instance
+
+    def pinned_model_ids(self):
+        pairs = configured_pairs()
+        return {pairs[pair] for pair in pinned_pairs() if pair in pairs}
+
+    def acquire(self, key, factory):
+        """Retourne le modèle de la clé, en le créant via factory() s'il n'est pas chargé"""
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.instance
+            loading_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Un verrou par clé : le chargement d'un modèle ne bloque pas l'accès aux autres
+        with loading_lock:
+            with self._lock:
+                entry = self._touch(key)
+                if entry is not None:
+                    return entry.instance
+
+            start_time = time.perf_counter()
+            instance = factory()
+            load_seconds = time.perf_counter() - start_time
+            size = model_size_bytes(instance.model) if getattr(instance, 'model', None) is not None else 0
+
+            with self._lock:
+                self._entries[key] = _RegistryEntry(instance, size, load_seconds)
+                self._touch(key)
+                self._loading.pop(key, None)
+                self._evict_over_budget(keep=key)
+            return instance
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.last_used = time.time()
+            entry.uses += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def _evict_over_budget(self, keep):
+        if not self.budget_bytes:
+            return
+        pinned = self.pinned_model_ids()
+        while self.total_bytes() > self.budget_bytes:
+            victim = next(
+                (key for key in self._entries if key != keep and key[0] not in pinned),
+                None,
+            )
+            if victim is None:
+                logger.warning(
+                    f"Budget mémoire des modèles dépassé ({self.total_bytes() / 2 ** 20:.0f} Mo > "
+                    f"{self.budget_bytes / 2 ** 20:.0f} Mo) mais aucun modèle non épinglé à retirer."
+                )
+                return
+            self._remove(victim)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            logger.info(f"Modèle {key[0]} ({key[1]}) retiré de la mémoire ({entry.bytes / 2 ** 20:.0f} Mo).")
+
+    def evict(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def total_bytes(self):
+        return sum(entry.bytes for entry in self._entries.values())
+
+    def stats(self):
+        """État du registre, pour l'endpoint de supervision"""
+        pinned = self.pinned_model_ids()
+        with self._lock:
+            models = [
+                {
+                    'model_id': model_id,
+                    'precision': precision,
+                    'model_type': entry.instance.model_type,
+                    'loaded': getattr(entry.instance, 'model', None) is not None,
+                    'bytes': entry.bytes,
+                    'load_seconds': round(entry.load_seconds, 3),
+                    'loaded_at': entry.loaded_at,
+                    'last_used': entry.last_used,
+                    'uses': entry.uses,
+                    'pinned': model_id in pinned,
+                }
+                for (model_id, precision), entry in self._entries.items()
+            ]
+            return {
+                'models': models,
+                'total_bytes': self.total_bytes(),
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+                'pairs': {f"{src}:{tgt}": model_id for (src, tgt), model_id in configured_pairs().items()},
+            }
@@ -0,0 +1,410 @@
+import contextlib
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import logging
+
+from .drafting import draft_stats, observed_drafts
+from .memory import memory_usage, observed_memory
+from .inference import PRIORITIES, DeadlineExceeded, InferenceExecutor, InferenceQueueFull, request_deadline, request_priority
+from .models import TranslationModel
+from .profiling import add_timing, observed_request
+from .warmup import FAILED, ModelNotReady, ModelWarmup
+
+logger = logging.getLogger(__name__)
+
+# Trame : longueur (4 octets, gros-boutiste) puis le message en JSON UTF-8
+FRAME_HEADER = struct.Struct('!I')
+MAX_MESSAGE_BYTES = 64 * 2 ** 20
+
+# Méthodes de TranslationModel appelables à distance
+REMOTE_METHODS = ('translate', 'translate_alternatives', 'translate_segments', 'translate_batch', 'count_tokens')
+
+UNAVAILABLE = 'unavailable'
+
+
+def inference_sockets():
+    """Sockets des serveurs d'inférence (TRANSLATION_INFERENCE_SOCKET, séparés par des virgules), ou []"""
+    return [path.strip() for path in os.environ.get('TRANSLATION_INFERENCE_SOCKET', '').split(',') if path.strip()]
+
+
+def translation_model(model_type):
+    """
+    Modèle de la direction : client du serveur d'inférence si TRANSLATION_INFERENCE_SOCKET
+    est défini, sinon TranslationModel local. Lève ModelNotReady pendant le préchargement.
+    """
+    ModelWarmup().check(model_type)
+    if inference_sockets():
+        return RemoteTranslationModel(model_type)
+    return TranslationModel(model_type=model_type)
+
+
+def send_message(sock, message):
+    body = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+
+def recv_message(stream):
+    """Message suivant lu sur stream (fichier binaire du socket), None si la connexion est fermée"""
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise ConnectionError("Trame tronquée.")
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"Message trop volumineux ({size} octets).")
+    body = stream.read(size)
+    if len(body) < size:
+        raise ConnectionError("Trame tronquée.")
+    return json.loads(body)
+
+
+def error_message(error):
+    """Réponse d'erreur du serveur ; type permet au client de relever la même exception"""
+    if isinstance(error, InferenceQueueFull):
+        kind = 'queue_full'
+    elif isinstance(error, DeadlineExceeded):
+        kind = 'deadline'
+    elif isinstance(error, ModelNotReady):
+        return {'error': str(error), 'type': 'not_ready', 'state': error.state}
+    elif isinstance(error, ValueError):
+        kind = 'invalid'
+    else:
+        kind = 'error'
+    return {'error': str(error), 'type': kind}
+
+
+class RemoteInferenceError(RuntimeError):
+    """Erreur survenue dans le serveur d'inférence"""
+
+
+def raise_remote_error(response, model_type):
+    kind, message = response.get('type'), response['error']
+    if kind == 'queue_full':
+        raise InferenceQueueFull(message)
+    if kind == 'deadline':
+        raise DeadlineExceeded(message)
+    if kind == 'not_ready':
+        raise ModelNotReady(model_type, response.get('state', FAILED))
+    if kind == 'invalid':
+        raise ValueError(message)
+    raise RemoteInferenceError(message)
+
+
+def merge_memory_usage(response):
+    """Reporte l'origine des traductions faites par le serveur dans celles de la requête en cours"""
+    usage = memory_usage.get()
+    if usage is not None and response.get('memory'):
+        usage.merge(response['memory'])
+
+
+@contextlib.contextmanager
+def forwarded_request(message):
+    """Échéance et classe de priorité de la requête du worker web, pendant son traitement par le serveur"""
+    deadline_token = request_deadline.set(
+        time.monotonic() + message['timeout'] if message.get('timeout') is not None else None
+    )
+    priority_token = request_priority.set(message['priority'] if message.get('priority') in PRIORITIES else 'api')
+    try:
+        yield
+    finally:
+        request_deadline.reset(deadline_token)
+        request_priority.reset(priority_token)
+
+
+class InferenceRequestHandler(socketserver.StreamRequestHandler):
+    """Une connexion cliente : requêtes traitées l'une après l'autre, jusqu'à sa fermeture"""
+
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.rfile)
+            except (ConnectionError, ValueError) as e:
+                logger.warning(f"Serveur d'inférence : message invalide ({e}), connexion fermée.")
+                return
+            if message is None:
+                return
+            try:
+                if message.get('op') == 'translate_stream':
+                    self.stream(message)
+                else:
+                    send_message(self.connection, self.dispatch(message))
+            except OSError:
+                # Client parti (déconnexion, délai dépassé) : la connexion n'est plus utilisable
+                return
+
+    def dispatch(self, message):
+        op = message.get('op')
+        if op == 'status':
+            warmup = ModelWarmup()
+            return {'result': {'ready': warmup.ready(), **warmup.stats(), 'inference': InferenceExecutor().stats()}}
+        if op not in REMOTE_METHODS:
+            return {'error': f"Opération inconnue : {op}", 'type': 'invalid'}
+        try:
+            with forwarded_request(message), observed_request() as (timing, _), observed_drafts() as drafts, \
+                    observed_memory() as usage:
+                model = TranslationModel(model_type=message['model_type'])
+                result = getattr(model, op)(**message.get('args', {}))
+            return {'result': result, 'timing': timing.phases, 'drafts': drafts.as_dict(), 'memory': usage.entries}
+        except Exception as e:
+            if not isinstance(e, (InferenceQueueFull, DeadlineExceeded, ValueError)):
+                logger.exception(f"Serveur d'inférence : échec de {op} ({message.get('model_type')}) : {e}")
+            return error_message(e)
+
+    def stream(self, message):
+        """Un message « chunk » par morceau décodé, puis « done » (avec l'origine du texte) ou une erreur"""
+        with forwarded_request(message), observed_memory() as usage:
+            self._stream(message, usage)
+
+    def _stream(self, message, usage):
+        try:
+            model = TranslationModel(model_type=message['model_type'])
+            chunks = model.translate_stream(**message.get('args', {}))
+        except Exception as e:
+            send_message(self.connection, error_message(e))
+            return
+        try:
+            for chunk in chunks:
+                send_message(self.connection, {'chunk': chunk})
+            send_message(self.connection, {'done': True, 'memory': usage.entries})
+        except OSError:
+            raise
+        except Exception as e:
+            send_message(self.connection, error_message(e))
+        finally:
+            # Client déconnecté : fermer le générateur interrompt le generate() en cours
+            chunks.close()
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    """Serveur d'inférence sur un socket Unix, un thread par connexion (python manage.py inference_server)"""
+    daemon_threads = True
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, InferenceRequestHandler)
+        # Socket réservé au propriétaire et à son groupe (les workers web)
+        os.chmod(path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class _Connection:
+    __slots__ = ('sock', 'rfile')
+
+    def __init__(self, path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile('rb')
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+class InferenceClient:
+    """
+    Client des serveurs d'inférence, partagé par les threads du worker web : connexions
+    réutilisées (au plus TRANSLATION_INFERENCE_POOL_SIZE inactives par socket), délai
+    TRANSLATION_INFERENCE_TIMEOUT borné par l'échéance de la requête, serveurs pris à tour de rôle.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(InferenceClient, cls).__new__(cls)
+                instance.paths = inference_sockets()
+                instance.pool_size = int(os.environ.get('TRANSLATION_INFERENCE_POOL_SIZE', '8'))
+                instance.timeout = float(os.environ.get('TRANSLATION_INFERENCE_TIMEOUT', '60'))
+                instance._pools = {path: queue.LifoQueue() for path in instance.paths}
+                instance._next = itertools.count()
+                cls._instance = instance
+            return cls._instance
+
+    def _timeout(self):
+        deadline = request_deadline.get()
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Échéance de la requête dépassée avant l'envoi au serveur d'inférence.")
+        return min(self.timeout, remaining)
+
+    def _acquire(self, timeout):
+        """(connexion, réutilisée) vers le prochain serveur joignable"""
+        start = next(self._next)
+        for i in range(len(self.paths)):
+            path = self.paths[(start + i) % len(self.paths)]
+            try:
+                connection = self._pools[path].get_nowait()
+                connection.sock.settimeout(timeout)
+                return path, connection, True
+            except queue.Empty:
+                pass
+            try:
+                return path, _Connection(path, timeout), False
+            except OSError as e:
+                logger.warning(f"Serveur d'inférence {path} injoignable : {e}")
+        raise ConnectionError("Aucun serveur d'inférence joignable.")
+
+    def _release(self, path, connection):
+        if self._pools[path].qsize() < self.pool_size:
+            self._pools[path].put(connection)
+        else:
+            connection.close()
+
+    def request(self, message, model_type):
+        """Envoie un message et retourne la réponse ; une connexion réutilisée périmée est remplacée une fois"""
+        timeout = self._timeout()
+        message = dict(message, timeout=timeout, priority=request_priority.get())
+        for attempt in range(2):
+            try:
+                path, connection, reused = self._acquire(timeout)
+            except ConnectionError:
+                raise ModelNotReady(model_type, UNAVAILABLE)
+            try:
+                send_message(connection.sock, message)
+                response = recv_message(connection.rfile)
+                if response is None:
+                    raise ConnectionError("Connexion fermée par le serveur d'inférence.")
+            except socket.timeout:
+                connection.close()
+                raise DeadlineExceeded(f"Pas de réponse du serveur d'inférence en {timeout:.1f}s.")
+            except (ConnectionError, OSError):
+                connection.close()
+                # Serveur redémarré depuis la mise en réserve de la connexion : nouvel essai
+                if reused and attempt == 0:
+                    continue
+                raise ModelNotReady(model_type, UNAVAILABLE)
+            self._release(path, connection)
+            return response
+
+    def stream(self, message, model_type):
+        """Générateur des morceaux d'une traduction en flux ; le fermer coupe la connexion (et le décodage)"""
+        timeout = self._timeout()
+        message = dict(message, timeout=timeout, priority=request_priority.get())
+        try:
+            path, connection, _ = self._acquire(timeout)
+        except ConnectionError:
+            raise ModelNotReady(model_type, UNAVAILABLE)
+        finished = False
+        try:
+            send_message(connection.sock, message)
+            while True:
+                response = recv_message(connection.rfile)
+                if response is None:
+                    raise RemoteInferenceError("Connexion fermée par le serveur d'inférence.")
+                if 'error' in response:
+                    finished = True
+                    raise_remote_error(response, model_type)
+                if response.get('done'):
+                    finished = True
+                    merge_memory_usage(response)
+                    return
+                yield response['chunk']
+        except socket.timeout:
+            raise DeadlineExceeded(f"Pas de réponse du serveur d'inférence en {timeout:.1f}s.")
+        finally:
+            if finished:
+                self._release(path, connection)
+            else:
+                connection.close()
+
+    def status(self):
+        """État de chaque serveur d'inférence : {socket: état ou None s'il est injoignable}"""
+        statuses = {}
+        for path in self.paths:
+            try:
+                connection = _Connection(path, min(self.timeout, 5))
+            except OSError:
+                statuses[path] = None
+                continue
+            try:
+                send_message(connection.sock, {'op': 'status'})
+                response = recv_message(connection.rfile)
+                statuses[path] = response['result'] if response else None
+            except OSError:
+                statuses[path] = None
+            finally:
+                connection.close()
+        return statuses
+
+
+class RemoteTranslationModel:
+    """
+    Équivalent de TranslationModel dont les méthodes de traduction sont exécutées par le
+    serveur d'inférence ; le worker web ne charge ni poids ni tokenizer.
+    """
+
+    def __init__(self, model_type="ruu_fr"):
+        self.model_type = model_type
+        self.model_id, self.precision = TranslationModel.resolve(model_type)
+
+    def _call(self, op, **args):
+        start = time.perf_counter()
+        response = InferenceClient().request({'op': op, 'model_type': self.model_type, 'args': args}, self.model_type)
+        if 'error' in response:
+            raise_remote_error(response, self.model_type)
+        # Phases mesurées par le serveur, et le reste de l'aller-retour
+        phases = response.get('timing', {})
+        for name, seconds in phases.items():
+            add_timing(name, seconds)
+        add_timing('transport', max(0.0, time.perf_counter() - start - sum(phases.values())))
+        drafts = draft_stats.get()
+        if drafts is not None and response.get('drafts'):
+            drafts.merge(response['drafts'])
+        merge_memory_usage(response)
+        return response['result']
+
+    def count_tokens(self, text):
+        return self._call('count_tokens', text=text)
+
+    def translate(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        return self._call(
+            'translate', text=text, src_lang=src_lang, tgt_lang=tgt_lang, raise_errors=raise_errors, preset=preset
+        )
+
+    def translate_alternatives(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", n_best=3, raise_errors=False,
+                               preset=None):
+        return self._call(
+            'translate_alternatives', text=text, src_lang=src_lang, tgt_lang=tgt_lang, n_best=n_best,
+            raise_errors=raise_errors, preset=preset,
+        )
+
+    def translate_segments(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", batch_size=16, raise_errors=False,
+                           preset=None):
+        return self._call(
+            'translate_segments', texts=list(texts), src_lang=src_lang, tgt_lang=tgt_lang, batch_size=batch_size,
+            raise_errors=raise_errors, preset=preset,
+        )
+
+    def translate_batch(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        return self._call(
+            'translate_batch', texts=list(texts), src_lang=src_lang, tgt_lang=tgt_lang, raise_errors=raise_errors,
+            preset=preset,
+        )
+
+    def translate_stream(self, text, src_lang="ruu_CM", tgt_lang="fr_XX"):
+        return InferenceClient().stream(
+            {'op': 'translate_stream', 'model_type': self.model_type,
+             'args': {'text': text, 'src_lang': src_lang, 'tgt_lang': tgt_lang}},
+            self.model_type,
+        )
@@ -0,0 +1,153 @@
+import os
+import re
+
+# Ponctuation finale, guillemets fermants éventuels, puis espace
+SENTENCE_END_RE = re.compile(r"[.!?…]+[”»’\"')\]]*(?=\s)")
+# Retour à la ligne suivi d'un numéro de verset : début d'une nouvelle phrase
+VERSE_BREAK_RE = re.compile(r"\n(?=\d{1,3}[.:°]?(?:\s|[“‘«\"])\s*\D)")
+# Séparation en paragraphes : ligne vide (espaces compris)
+PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+# Ponctuation secondaire, utilisée seulement pour couper une phrase trop longue
+CLAUSE_END_RE = re.compile(r"[;:](?=\s)")
+# Numéro de verset en tête de phrase : « 18 Zakariy », « 25“Katat », « 3. Yuda »
+VERSE_NUMBER_RE = re.compile(r"^\d{1,3}[.:°]?(?:\s+|(?=[“‘«\"]))(?=\D)")
+# Segment sans rien à traduire (numéros, ponctuation seule)
+NOTHING_TO_TRANSLATE_RE = re.compile(r"^[\W\d_]*$")
+
+OPENING_QUOTES = "‘“«"
+CLOSING_QUOTES = "’”»"
+
+# Abréviations françaises courantes qui ne terminent pas une phrase
+ABBREVIATIONS = {
+    'm', 'mm', 'mme', 'mmes', 'mlle', 'dr', 'pr', 'st', 'ste', 'cf', 'etc', 'ex',
+    'p', 'pp', 'ch', 'chap', 'v', 'vv', 'av', 'apr', 'env', 'no', 'vol', 'éd',
+}
+
+
+def _quote_depths(text):
+    """
+    Profondeur de citation à chaque position du texte.
+    ’ sert aussi d'apostrophe (qu’une, a’ntu) : il ne ferme une citation
+    que s'il n'est pas suivi d'une lettre.
+    """
+    depths = []
+    depth = 0
+    for i, char in enumerate(text):
+        if char in OPENING_QUOTES:
+            depth += 1
+        elif char in CLOSING_QUOTES and depth > 0:
+            next_char = text[i + 1] if i + 1 < len(text) else ''
+            if char != '’' or not next_char.isalpha():
+                depth -= 1
+        depths.append(depth)
+    return depths
+
+
+def _is_abbreviation(text, end):
+    """Vrai si le point en position end termine une abréviation ou une initiale"""
+    words = text[:end].split()
+    if not words:
+        return False
+    word = words[-1].lstrip(OPENING_QUOTES + "(\"'").lower()
+    return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+class SegmentedText:
+    """
+    Découpe un texte Ruund ou français en phrases à traduire séparément.
+    Les séparateurs (espaces, sauts de ligne, paragraphes, numéros de versets)
+    sont conservés tels quels pour reconstruire le texte avec join().
+    Invariant : separators[0] + segments[0] + separators[1] + ... + separators[-1] == texte.
+    """
+
+    def __init__(self, text, max_chars=None):
+        self.max_chars = max_chars or int(os.environ.get('TRANSLATION_SEGMENT_MAX_CHARS', '300'))
+        self.segments = []
+        self.separators = ['']
+
+        position = 0
+        for match in PARAGRAPH_RE.finditer(text):
+            self._add_paragraph(text[position:match.start()])
+            self.separators[-1] += match.group()
+            position = match.end()
+        self._add_paragraph(text[position:])
+
+    def _add_paragraph(self, paragraph):
+        stripped = paragraph.strip()
+        if not stripped:
+            self.separators[-1] += paragraph
+            return
+        start = paragraph.index(stripped[0])
+        end = start + len(stripped)
+        self.separators[-1] += paragraph[:start]
+        for sentence in self._split_sentences(stripped):
+            self._add_sentence(sentence)
+        self.separators[-1] += paragraph[end:]
+
+    def _split_sentences(self, paragraph):
+        """
+        Coupe aux fins de phrase hors citation et avant les numéros de versets,
+        puis à l'intérieur des citations trop longues.
+        """
+        depths = _quote_depths(paragraph)
+        if depths[-1] != 0:
+            # Citation jamais fermée (fréquent dans les versets) : on ignore les guillemets
+            depths = [0] * len(depths)
+        outer, inner = [], []
+        for match in SENTENCE_END_RE.finditer(paragraph):
+            if match.group().startswith('.') and _is_abbreviation(paragraph, match.start()):
+                continue
+            (outer if depths[match.end() - 1] == 0 else inner).append(match.end())
+        outer.extend(match.start() for match in VERSE_BREAK_RE.finditer(paragraph))
+
+        pieces = []
+        for piece_start, piece_end in self._spans(paragraph, outer):
+            piece = paragraph[piece_start:piece_end]
+            if len(piece) <= self.max_chars:
+                pieces.append(piece)
+                continue
+            cuts = [cut - piece_start for cut in inner if piece_start < cut < piece_end]
+            for sub_start, sub_end in self._spans(piece, cuts):
+                pieces.extend(self._split_long(piece[sub_start:sub_end]))
+        return pieces
+
+    def _split_long(self, sentence):
+        """Dernier recours pour une phrase trop longue : coupe aux « ; » et « : »"""
+        if len(sentence) <= self.max_chars:
+            return [sentence]
+        cuts = [match.end() for match in CLAUSE_END_RE.finditer(sentence)]
+        return [sentence[start:end] for start, end in self._spans(sentence, cuts)]
+
+    @staticmethod
+    def _spans(text, cuts):
+        """(début, fin) des morceaux de text coupés aux positions cuts (espaces inclus à la fin)"""
+        spans = []
+        start = 0
+        for cut in sorted(cuts):
+            while cut < len(text) and text[cut].isspace():
+                cut += 1
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, len(text)))
+        return [(start, end) for start, end in spans if text[start:end].strip()]
+
+    def _add_sentence(self, sentence):
+        stripped = sentence.rstrip()
+        trailing = sentence[len(stripped):]
+        verse = VERSE_NUMBER_RE.match(stripped)
+        if verse:
+            self.separators[-1] += verse.group()
+            stripped = stripped[verse.end():]
+        if NOTHING_TO_TRANSLATE_RE.match(stripped):
+            self.separators[-1] += stripped + trailing
+            return
+        self.segments.append(stripped)
+        self.separators.append(trailing)
+
+    def join(self, translations):
+        """Reconstruit le texte en remplaçant chaque phrase par sa traduction"""
+        parts = [self.separators[0]]
+        for translation, separator in zip(translations, self.separators[1:]):
+            parts.append(translation.strip())
+            parts.append(separator)
+        return ''.join(parts)
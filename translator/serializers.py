@@ -1,7 +1,49 @@
+import os
 from rest_framework import serializers
 
+from .models import GENERATION_PRESETS
+
 class TranslateSerializer(serializers.Serializer):
     """Séreialiseur pour valider la requête de traduction"""
     text = serializers.CharField(max_length=2000, help_text="Le texte à traduire")
     src_lang = serializers.CharField(max_length=10, default="ruu_CM")
     tgt_lang = serializers.CharField(max_length=10, default="fr_XX")
+    preset = serializers.ChoiceField(
+        choices=list(GENERATION_PRESETS), required=False,
+        help_text="Préréglage de décodage : fast, balanced, best ou lookup",
+    )
+    n_best = serializers.IntegerField(
+        min_value=1, max_value=5, default=1, help_text="Nombre de traductions alternatives renvoyées"
+    )
+
+
+class TranslateBatchSerializer(serializers.Serializer):
+    """Sérialiseur pour valider une requête de traduction en masse"""
+    segments = serializers.ListField(
+        child=serializers.CharField(max_length=2000, trim_whitespace=False),
+        allow_empty=False,
+        help_text="Les segments à traduire, dans l'ordre (au plus TRANSLATION_BULK_MAX_SEGMENTS)",
+    )
+    src_lang = serializers.CharField(max_length=10, default="ruu_CM")
+    tgt_lang = serializers.CharField(max_length=10, default="fr_XX")
+    preset = serializers.ChoiceField(
+        choices=list(GENERATION_PRESETS), required=False,
+        help_text="Préréglage de décodage : fast, balanced, best ou lookup",
+    )
+
+    def validate_segments(self, value):
+        # Limite lue à chaque requête, comme TRANSLATION_BULK_MAX_TOKENS dans la vue
+        max_segments = int(os.environ.get('TRANSLATION_BULK_MAX_SEGMENTS', '100'))
+        if len(value) > max_segments:
+            raise serializers.ValidationError(
+                f"Au plus {max_segments} segments par requête ({len(value)} reçus)."
+            )
+        return value
+
+
+class SuggestSerializer(serializers.Serializer):
+    """Sérialiseur pour valider une demande de suggestions de la mémoire de traduction"""
+    text = serializers.CharField(max_length=2000, help_text="Le texte pour lequel chercher des paires proches")
+    src_lang = serializers.CharField(max_length=10, default="ruu_CM")
+    tgt_lang = serializers.CharField(max_length=10, default="fr_XX")
+    k = serializers.IntegerField(min_value=1, max_value=20, default=5, help_text="Nombre maximal de suggestions")
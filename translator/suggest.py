@@ -0,0 +1,145 @@
+import threading
+import time
+import logging
+from array import array
+
+import numpy as np
+
+from .memory import TranslationMemory, memory_key
+
+logger = logging.getLogger(__name__)
+
+# Les 4-grammes restent tolérants aux fautes de frappe, avec des listes de postings
+# deux fois plus courtes que les trigrammes sur un corpus de 100k paires
+NGRAM_SIZE = 4
+
+
+def char_ngrams(text, n=NGRAM_SIZE):
+    """N-grammes de caractères distincts du texte normalisé, bordé d'espaces"""
+    padded = f" {memory_key(text)} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class NgramIndex:
+    """
+    Index inversé de n-grammes de caractères sur une liste de MemoryMatch (texte d'origine,
+    traduction, source). Les listes de postings sont stockées bout à bout dans un seul
+    tableau numpy (offsets[g]:offsets[g + 1] pour le n-gramme g), triées par document.
+    La similarité est le coefficient de Dice entre ensembles de n-grammes.
+    """
+
+    def __init__(self, entries, n=NGRAM_SIZE):
+        self.n = n
+        self.entries = list(entries)
+        self.gram_ids = {}
+        grams = array('i')
+        docs = array('i')
+        sizes = array('i')
+        for doc, entry in enumerate(self.entries):
+            entry_grams = char_ngrams(entry.source_text, n)
+            sizes.append(len(entry_grams))
+            for gram in entry_grams:
+                grams.append(self.gram_ids.setdefault(gram, len(self.gram_ids)))
+                docs.append(doc)
+
+        grams = np.frombuffer(grams, dtype=np.int32)
+        # Tri stable : chaque liste de postings reste dans l'ordre des documents
+        order = np.argsort(grams, kind='stable')
+        self.postings = np.frombuffer(docs, dtype=np.int32)[order]
+        self.offsets = np.zeros(len(self.gram_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=len(self.gram_ids)), out=self.offsets[1:])
+        self.sizes = np.frombuffer(sizes, dtype=np.int32).copy()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def nbytes(self):
+        """Taille des tableaux de l'index (hors textes et dictionnaire des n-grammes)"""
+        return self.postings.nbytes + self.offsets.nbytes + self.sizes.nbytes
+
+    def search(self, text, k=5, min_score=0.3):
+        """Les k entrées les plus proches du texte : liste de (score, MemoryMatch)"""
+        query_grams = char_ngrams(text, self.n)
+        gram_ids = [self.gram_ids[gram] for gram in query_grams if gram in self.gram_ids]
+        if not gram_ids or not self.entries:
+            return []
+        matched = np.concatenate([self.postings[self.offsets[g]:self.offsets[g + 1]] for g in gram_ids])
+        shared = np.bincount(matched, minlength=len(self.entries))
+        # Dice >= min_score impose au moins min_score * q / (2 - min_score) n-grammes communs
+        candidates = np.flatnonzero(shared >= min_score * len(query_grams) / (2 - min_score))
+        scores = 2 * shared[candidates] / (len(query_grams) + self.sizes[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [(float(scores[i]), self.entries[candidates[i]]) for i in order]
+
+
+class TranslationSuggester:
+    """
+    Suggestions de paires connues proches d'un texte, par direction, à partir des paires
+    de la mémoire de traduction. L'index d'une direction est construit à la première
+    demande, puis reconstruit en arrière-plan quand la mémoire change ; les recherches
+    utilisent l'index courant pendant la reconstruction. Singleton.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(TranslationSuggester, cls).__new__(cls)
+                # (src_lang, tgt_lang) -> (version de la mémoire, NgramIndex)
+                instance._indexes = {}
+                instance._building = set()
+                instance._lock = threading.Lock()
+                cls._instance = instance
+            return cls._instance
+
+    def index(self, src_lang, tgt_lang):
+        memory = TranslationMemory()
+        memory.refresh()
+        direction = (src_lang, tgt_lang)
+        current = self._indexes.get(direction)
+        if current is None:
+            with self._lock:
+                current = self._indexes.get(direction)
+                if current is None:
+                    self._build(direction)
+                    current = self._indexes[direction]
+        elif current[0] != memory.version:
+            with self._lock:
+                if direction not in self._building:
+                    self._building.add(direction)
+                    threading.Thread(
+                        target=self._build, args=(direction,), name='translation-suggest-index', daemon=True
+                    ).start()
+        return current[1]
+
+    def _build(self, direction):
+        try:
+            memory = TranslationMemory()
+            version = memory.version
+            start = time.perf_counter()
+            index = NgramIndex(memory.pairs(*direction))
+            self._indexes[direction] = (version, index)
+            logger.info(
+                f"Index de suggestions {direction[0]} -> {direction[1]} : {len(index)} paires, "
+                f"{index.nbytes() / 2 ** 20:.1f} Mo, construit en {time.perf_counter() - start:.2f}s."
+            )
+        finally:
+            self._building.discard(direction)
+
+    def suggest(self, text, src_lang, tgt_lang, k=5):
+        """Jusqu'à k paires connues proches du texte, de la plus similaire à la moins similaire"""
+        return [
+            {
+                'source': match.source_text,
+                'translation': match.translation,
+                'score': round(score, 3),
+                'origin': match.origin,
+            }
+            for score, match in self.index(src_lang, tgt_lang).search(text, k=k)
+        ]
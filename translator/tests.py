@@ -1,3 +1,1003 @@
-from django.test import TestCase
+import copy
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import torch
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, Client, RequestFactory, TestCase
+
+from contribution.models import ContributionText
+from core.models import Language, User
+
+from .admission import AdmissionController, QuotaExceeded, page_token, request_class
+from .batching import BatchScheduler
+from .cache import ENTRY_OVERHEAD_BYTES, TranslationCache, make_cache_key, normalize_text
+from .compiled import bucket_length
+from .drafting import DraftStats, SourceLookupCandidateGenerator, install_source_lookup, observed_drafts
+from .memory import MemoryMatch, TranslationMemory
+from .inference import DeadlineExceeded, InferenceExecutor, InferenceQueueFull, request_deadline, request_priority
+from .models import StopOnEvent, TranslationModel
+from .prepared import prepared_model_dir, save_prepared
+from .registry import ModelRegistry
+from .remote import InferenceClient, InferenceServer, RemoteTranslationModel
+from .segmentation import SegmentedText
+from .suggest import NgramIndex, char_ngrams
+from .tiny_model import build_tiny_model
+from .serializers import TranslateBatchSerializer
+from .vocab import VocabMap, prune_model
+from .weights import load_mmap_model
+from .warmup import ModelNotReady, ModelWarmup
+
+
+class UppercaseModel(TranslationModel):
+    """TranslationModel sans poids : « traduit » en majuscules et garde la trace des lots"""
+
+    def __new__(cls):
+        instance = object.__new__(cls)
+        instance.model_id = 'test/uppercase'
+        instance.model_type = 'ruu_fr'
+        instance.model = instance.tokenizer = object()
+        instance.batches = []
+        return instance
+
+    def translate_batch(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+
+class PrecisionModeTests(TestCase):
+    def precision_model(self, precision, device='cpu'):
+        instance = object.__new__(TranslationModel)
+        instance.precision = precision
+        instance.device = device
+        instance.model = torch.nn.Sequential(torch.nn.Linear(4, 4))
+        instance._apply_precision()
+        return instance
+
+    def test_resolves_the_precision_from_the_argument_then_the_environment(self):
+        with mock.patch.dict(os.environ, {'MODEL_RUU_FR': 'test/ruu-fr'}):
+            os.environ.pop('MODEL_BIDIRECTIONAL', None)
+            os.environ.pop('MODEL_PRECISION', None)
+            self.assertEqual(TranslationModel.resolve('ruu_fr'), ('test/ruu-fr', 'fp32'))
+            os.environ['MODEL_PRECISION'] = 'int8-dynamic'
+            self.assertEqual(TranslationModel.resolve('ruu_fr'), ('test/ruu-fr', 'int8-dynamic'))
+            self.assertEqual(TranslationModel.resolve('ruu_fr', 'bf16'), ('test/ruu-fr', 'bf16'))
+            os.environ['MODEL_PRECISION'] = 'fp8'
+            with self.assertRaises(ValueError):
+                TranslationModel.resolve('ruu_fr')
+
+    def test_falls_back_to_fp32_when_the_mode_is_not_supported(self):
+        quantized = self.precision_model('int8-dynamic')
+        self.assertIsInstance(quantized.model[0], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertEqual(self.precision_model('int8-dynamic', device='cuda').precision, 'fp32')
+
+        with mock.patch('translator.models.bf16_supported', return_value=False):
+            fallback = self.precision_model('bf16')
+        self.assertEqual(fallback.precision, 'fp32')
+        self.assertIsInstance(fallback.model[0], torch.nn.Linear)
+        with fallback.inference_context():
+            self.assertFalse(torch.is_autocast_enabled('cpu'))
+        with mock.patch('translator.models.bf16_supported', return_value=True):
+            bf16 = self.precision_model('bf16')
+        with bf16.inference_context():
+            self.assertTrue(torch.is_autocast_enabled('cpu'))
+
+
+class TranslateSegmentsTests(TestCase):
+    def test_returns_translations_in_input_order(self):
+        model = UppercaseModel()
+        segments = ['ccc ccc', 'a', 'bb', 'dddd dddd dddd']
+
+        translations = model.translate_segments(segments, batch_size=2)
+
+        self.assertEqual(translations, ['CCC CCC', 'A', 'BB', 'DDDD DDDD DDDD'])
+        self.assertEqual(model.batches, [['a', 'bb'], ['ccc ccc', 'dddd dddd dddd']])
+
+
+class BatchSchedulerTests(TestCase):
+    def setUp(self):
+        self.model = UppercaseModel()
+        for patch in (
+            mock.patch.dict(BatchScheduler._instances, clear=True),
+            mock.patch.dict(os.environ, {'TRANSLATION_BATCH_WINDOW_MS': '200', 'TRANSLATION_BATCH_LENGTH_RATIO': '2'}),
+            mock.patch('translator.batching.translation_model', lambda model_type: self.model),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scheduler = BatchScheduler(model_type='ruu_fr')
+
+    def test_groups_similar_lengths_and_returns_results_in_order(self):
+        texts = ['a', 'b c d e f', 'g', 'h i']
+
+        futures = [self.scheduler.submit(text) for text in texts]
+
+        self.assertEqual([future.result(timeout=5) for future in futures], ['A', 'B C D E F', 'G', 'H I'])
+        self.assertEqual(self.model.batches, [['a', 'g', 'h i'], ['b c d e f']])
+
+    def test_failures_fail_their_requests_and_keep_the_scheduler_running(self):
+        unavailable = ModelNotReady('ruu_fr', 'unavailable')
+        with mock.patch.object(self.model, 'count_tokens', side_effect=unavailable):
+            with self.assertRaises(ModelNotReady):
+                self.scheduler.submit('a').result(timeout=5)
+        with mock.patch.object(self.model, 'translate_batch', side_effect=RuntimeError('generate')):
+            with self.assertRaises(RuntimeError):
+                self.scheduler.submit('a').result(timeout=5)
+
+        self.assertTrue(self.scheduler._thread.is_alive())
+        self.assertEqual(self.scheduler.submit('b').result(timeout=5), 'B')
+
+    def test_waits_for_the_batch_until_the_request_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        token = request_deadline.set(time.monotonic() + 0.3)
+        try:
+            with mock.patch.object(self.model, 'translate_batch', side_effect=lambda *args, **kwargs: release.wait()):
+                with self.assertRaises(DeadlineExceeded):
+                    self.scheduler.translate('a')
+        finally:
+            request_deadline.reset(token)
+
+
+class GenerationKwargsTests(TestCase):
+    def test_derives_max_new_tokens_from_source_length(self):
+        model = UppercaseModel()
+        model.source_template = ([None], [2])
+
+        def kwargs(n_tokens, **options):
+            encoded = {'attention_mask': torch.ones((1, n_tokens + 2), dtype=torch.long)}
+            return model.generation_kwargs(encoded, 'fast', **options)
+
+        self.assertEqual(kwargs(5)['max_new_tokens'], 5 * 2 + 2 + 8)
+        self.assertEqual(kwargs(500)['max_new_tokens'], TranslationModel.max_output_tokens)
+        self.assertEqual(kwargs(5, num_return_sequences=3)['num_beams'], 3)
+
+
+class SegmentedTextTests(TestCase):
+    def test_splits_sentences_and_keeps_verse_numbers_out_of_segments(self):
+        text = "18 Zakariy wamwipula muruu. Ndiy wamwakula!\n19 Muruu wa mwiur wamwakula.\n\nCf. Luka 1:26 "
+
+        segmented = SegmentedText(text)
+
+        self.assertEqual(segmented.segments, [
+            'Zakariy wamwipula muruu.', 'Ndiy wamwakula!', 'Muruu wa mwiur wamwakula.', 'Cf. Luka 1:26',
+        ])
+        self.assertEqual(segmented.join(segmented.segments), text)
+
+    def test_does_not_split_inside_balanced_quotes_or_on_apostrophes(self):
+        text = "Yesu walonda anch: ‘Ov, am nikez? Mulong am.’ Je ne suis qu’une antilope."
+
+        segmented = SegmentedText(text)
+
+        self.assertEqual(segmented.segments, [
+            "Yesu walonda anch: ‘Ov, am nikez? Mulong am.’", "Je ne suis qu’une antilope.",
+        ])
+
+    def test_translate_reassembles_with_original_layout(self):
+        model = UppercaseModel()
+
+        translation = model.translate("1 Aburaham wamuvala Isak.  Isak wamuvala Jakob.\n\n2 Yuda.")
+
+        self.assertEqual(translation, "1 ABURAHAM WAMUVALA ISAK.  ISAK WAMUVALA JAKOB.\n\n2 YUDA.")
+        self.assertEqual(len(model.batches), 1)
+
+
+class TranslateBatchSerializerTests(TestCase):
+    def test_rejects_empty_segment_list(self):
+        serializer = TranslateBatchSerializer(data={'segments': []})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('segments', serializer.errors)
+
+
+class GeneratingUppercaseModel(UppercaseModel):
+    """UppercaseModel dont seul _generate est remplacé : translate_batch consulte la mémoire de traduction"""
+    translate_batch = TranslationModel.translate_batch
+
+    def _generate(self, texts, src_lang, tgt_lang, preset=None, num_return_sequences=1):
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+class MemoryViewTestMixin:
+    """Mémoire de traduction limitée à « Moyo ey -> Bonjour » et GeneratingUppercaseModel derrière les vues"""
+
+    def setUp(self):
+        AdmissionController._instance = None
+        self.addCleanup(setattr, AdmissionController, '_instance', None)
+        TranslationMemory._instance = None
+        self.addCleanup(setattr, TranslationMemory, '_instance', None)
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write("Ruund\tFrench\nMoyo ey\tBonjour\n")
+        self.model = GeneratingUppercaseModel()
+        for patch in (
+            mock.patch.object(TranslationMemory, 'tsv_sources', return_value={path: 'ruu_CM'}),
+            mock.patch.dict(os.environ, {'TRANSLATION_MEMORY': 'true', 'TRANSLATION_CACHE': 'false'}),
+            mock.patch('translator.views.translation_model', return_value=self.model),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class TranslateAPIViewMemoryTests(MemoryViewTestMixin, TestCase):
+    def post(self, text):
+        return Client(HTTP_HOST='localhost').post(
+            '/translator/api/translate/', {'text': text, 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'},
+            content_type='application/json',
+        )
+
+    def test_looks_up_the_memory_once_and_reports_the_origin(self):
+        memory_hit = self.post('Moyo ey')
+        model_output = self.post('dddd dddd')
+
+        self.assertEqual(memory_hit.json()['translation'], 'Bonjour')
+        self.assertEqual(memory_hit.json()['source'], 'memory')
+        self.assertEqual(model_output.json()['translation'], 'DDDD DDDD')
+        self.assertEqual(model_output.json()['source'], 'model')
+        self.assertEqual((TranslationMemory().hits, TranslationMemory().misses), (1, 1))
+        self.assertEqual(self.model.batches, [['dddd dddd']])
+
+
+class TranslateBatchAPIViewTests(MemoryViewTestMixin, TestCase):
+    url = '/translator/api/translate/batch/'
+
+    def post(self, segments):
+        return Client(HTTP_HOST='localhost').post(self.url, {'segments': segments}, content_type='application/json')
+
+    def test_returns_memory_and_model_translations_in_segment_order(self):
+        response = self.post(['dddd dddd dddd', 'Moyo ey', 'a', 'bb cc'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['translations'], ['DDDD DDDD DDDD', 'Bonjour', 'A', 'BB CC'])
+        self.assertNotIn('Moyo ey', sum(self.model.batches, []))
+
+    def test_rejects_requests_over_the_segment_and_token_limits(self):
+        with mock.patch.dict(os.environ, {'TRANSLATION_BULK_MAX_SEGMENTS': '2'}):
+            too_many_segments = self.post(['a', 'b', 'c'])
+        with mock.patch.dict(os.environ, {'TRANSLATION_BULK_MAX_TOKENS': '3'}):
+            too_many_tokens = self.post(['a b', 'c d'])
+
+        self.assertEqual(too_many_segments.status_code, 400)
+        self.assertIn('segments', too_many_segments.json())
+        self.assertEqual(too_many_tokens.status_code, 400)
+        self.assertIn('4 > 3', too_many_tokens.json()['error'])
+        self.assertEqual(self.model.batches, [])
+
+
+class NormalizeTextTests(TestCase):
+    def test_applies_nfc_and_folds_whitespace(self):
+        decomposed = 'Yesu  Kristú\n\tmwin '
+
+        self.assertEqual(normalize_text(decomposed), 'Yesu Kristú mwin')
+
+
+class TranslationCacheTests(TestCase):
+    def setUp(self):
+        self.cache = TranslationCache()
+        self.cache.clear()
+
+    def test_translates_each_distinct_text_once(self):
+        calls = []
+
+        def generate(texts):
+            calls.append(list(texts))
+            return [text.upper() for text in texts]
+
+        keys = [make_cache_key('m', 'r', 'ruu_CM', 'fr_XX', {}, text) for text in ['a', 'b', 'a ']]
+        first = self.cache.translate_many(keys, ['a', 'b', 'a '], generate)
+        second = self.cache.translate_many(keys[:1], ['a'], generate)
+
+        self.assertEqual(first, ['A', 'B', 'A'])
+        self.assertEqual(second, ['A'])
+        self.assertEqual(calls, [['a', 'b']])
+
+    def test_evicts_least_recently_used_entries_over_budget(self):
+        max_bytes = self.cache.max_bytes
+        self.cache.max_bytes = 2 * (64 + 1 + ENTRY_OVERHEAD_BYTES)
+        try:
+            for text in ['a', 'b', 'c']:
+                self.cache.set(make_cache_key('m', 'r', 'ruu_CM', 'fr_XX', {}, text), text)
+        finally:
+            self.cache.max_bytes = max_bytes
+
+        self.assertIsNone(self.cache.get(make_cache_key('m', 'r', 'ruu_CM', 'fr_XX', {}, 'a')))
+        self.assertEqual(self.cache.get(make_cache_key('m', 'r', 'ruu_CM', 'fr_XX', {}, 'c')), 'c')
+
+
+class LinearModel:
+    """Stand-in de TranslationModel pour le registre : seuls model et model_type sont lus"""
+
+    def __init__(self):
+        self.model_type = 'ruu_fr'
+        self.model = torch.nn.Linear(16, 16, bias=False)
+
+
+class ModelRegistryTests(TestCase):
+    def test_evicts_least_recently_used_model_over_budget(self):
+        registry = ModelRegistry()
+        keys = [(f'test/model-{name}', 'fp32') for name in 'abc']
+        budget_bytes = registry.budget_bytes
+        registry.budget_bytes = 2 * 16 * 16 * 4
+        try:
+            first = registry.acquire(keys[0], LinearModel)
+            registry.acquire(keys[1], LinearModel)
+            self.assertIs(registry.acquire(keys[0], LinearModel), first)
+            registry.acquire(keys[2], LinearModel)
+            loaded = {model['model_id'] for model in registry.stats()['models']}
+        finally:
+            registry.budget_bytes = budget_bytes
+            for key in keys:
+                registry.evict(key)
+
+        self.assertEqual(loaded, {'test/model-a', 'test/model-c'})
+
+
+class InferenceExecutorTests(TestCase):
+    def test_runs_at_most_the_configured_number_of_calls_in_parallel(self):
+        executor = InferenceExecutor()
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def call():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        futures = [executor.submit(call) for _ in range(3 * executor.workers)]
+        for future in futures:
+            future.result()
+
+        self.assertEqual(max(peak), executor.workers)
+
+    def test_rejects_calls_when_queue_is_full(self):
+        executor = InferenceExecutor()
+        max_queue_depth = executor.max_queue_depth
+        executor.max_queue_depth = 0
+        try:
+            with self.assertRaises(InferenceQueueFull):
+                executor.submit(lambda: None)
+        finally:
+            executor.max_queue_depth = max_queue_depth
+
+    def test_skips_calls_past_the_request_deadline(self):
+        token = request_deadline.set(time.monotonic() - 1)
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                InferenceExecutor().run(lambda: None)
+        finally:
+            request_deadline.reset(token)
+
+
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        AdmissionController._instance = None
+        self.addCleanup(setattr, AdmissionController, '_instance', None)
+
+    def submit(self, executor, priority, fn):
+        token = request_priority.set(priority)
+        try:
+            return executor.submit(fn)
+        finally:
+            request_priority.reset(token)
+
+    def test_serves_interactive_first_and_sheds_bulk_when_the_queue_is_full(self):
+        executor = InferenceExecutor()
+        max_queue_depth = executor.max_queue_depth
+        self.addCleanup(setattr, executor, 'max_queue_depth', max_queue_depth)
+        release = threading.Event()
+        busy = [self.submit(executor, 'api', release.wait) for _ in range(executor.workers)]
+        while executor.running < executor.workers:
+            time.sleep(0.001)
+        executor.max_queue_depth = 2
+        order = []
+
+        first_bulk = self.submit(executor, 'bulk', lambda: order.append('bulk'))
+        last_bulk = self.submit(executor, 'bulk', lambda: order.append('bulk'))
+        interactive = self.submit(executor, 'interactive', lambda: order.append('interactive'))
+        with self.assertRaises(InferenceQueueFull):
+            self.submit(executor, 'bulk', lambda: None)
+        release.set()
+        for future in busy + [first_bulk, interactive]:
+            future.result()
+
+        with self.assertRaises(InferenceQueueFull):
+            last_bulk.result()
+        self.assertEqual(order, ['interactive', 'bulk'])
+
+    def test_client_quotas_on_requests_and_tokens(self):
+        with mock.patch.dict(os.environ, {'TRANSLATION_CLIENT_MAX_REQUESTS': '2', 'TRANSLATION_CLIENT_MAX_TOKENS': '100'}):
+            controller = AdmissionController()
+        # Une requête plus grosse que le quota de tokens passe si le client n'a rien d'autre en cours
+        with controller.admit('ip:1', 'bulk', tokens=500):
+            with self.assertRaises(QuotaExceeded):
+                with controller.admit('ip:1', 'api', tokens=1):
+                    pass
+            with controller.admit('ip:2', 'api', tokens=50), controller.admit('ip:2', 'api', tokens=50):
+                with self.assertRaises(QuotaExceeded):
+                    with controller.admit('ip:2', 'api'):
+                        pass
+        self.assertEqual(controller.stats()['requests_in_flight'], 0)
+
+    def test_refused_stream_calls_end_with_an_error(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        payload = {'text': 'Moyo ey mwaan.', 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'}
+        environ = {'TRANSLATION_REQUEST_TIMEOUT': '0', 'TRANSLATION_MEMORY': 'false', 'TRANSLATION_CACHE': 'false'}
+
+        # Échéance dépassée dans la file : événement « error » plutôt qu'un flux qui ne se termine jamais
+        with mock.patch.dict(os.environ, environ), mock.patch('translator.views.translation_model', return_value=model):
+            response = Client(HTTP_HOST='localhost').post(
+                '/translator/api/translate/stream/', payload, content_type='application/json'
+            )
+            events = b''.join(response.streaming_content).decode()
+        self.assertTrue(events.startswith('event: error\n'))
+        self.assertEqual(AdmissionController().stats()['requests_in_flight'], 0)
+
+        # Génération en flux évincée de la file par une génération interactive
+        executor = InferenceExecutor()
+        max_queue_depth = executor.max_queue_depth
+        self.addCleanup(setattr, executor, 'max_queue_depth', max_queue_depth)
+        release = threading.Event()
+        busy = [self.submit(executor, 'api', release.wait) for _ in range(executor.workers)]
+        while executor.running < executor.workers:
+            time.sleep(0.001)
+        executor.max_queue_depth = 1
+        errors = []
+
+        def consume():
+            request_priority.set('bulk')
+            try:
+                list(model._stream_segment(payload['text'], 'ruu_CM', 'fr_XX'))
+            except InferenceQueueFull as e:
+                errors.append(e)
+
+        consumer = threading.Thread(target=consume)
+        with mock.patch.dict(os.environ, {'TRANSLATION_CACHE': 'false'}):
+            consumer.start()
+            while not executor.queued_by_priority['bulk']:
+                time.sleep(0.001)
+            interactive = self.submit(executor, 'interactive', lambda: None)
+            consumer.join(timeout=5)
+            release.set()
+            for future in busy + [interactive]:
+                future.result()
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(len(errors), 1)
+
+    def test_clients_can_lower_but_not_raise_their_priority(self):
+        factory = RequestFactory()
+        token = page_token('ip:127.0.0.1')
+
+        def priority(client='ip:127.0.0.1', bulk=False, **headers):
+            return request_class(factory.post('/', **headers), client, bulk=bulk)
+
+        self.assertEqual(priority(HTTP_X_TRANSLATION_PAGE_TOKEN=token), 'interactive')
+        # Un en-tête forgé, le jeton d'un autre client ou un jeton altéré ne donnent pas la priorité interactive
+        self.assertEqual(priority(HTTP_SEC_FETCH_SITE='same-origin'), 'api')
+        self.assertEqual(priority('ip:10.0.0.2', HTTP_X_TRANSLATION_PAGE_TOKEN=token), 'api')
+        self.assertEqual(priority(HTTP_X_TRANSLATION_PAGE_TOKEN=token[:-1]), 'api')
+        self.assertEqual(priority(HTTP_X_TRANSLATION_PRIORITY='bulk'), 'bulk')
+        self.assertEqual(priority(HTTP_X_TRANSLATION_PRIORITY='interactive'), 'api')
+        self.assertEqual(priority(bulk=True, HTTP_X_TRANSLATION_PAGE_TOKEN=token), 'bulk')
+
+
+class SlowFirstLineModel(UppercaseModel):
+    """UppercaseModel dont le lot contenant « a » se termine après les suivants"""
+
+    def translate_batch(self, texts, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        if 'a' in texts:
+            time.sleep(0.2)
+        return super().translate_batch(texts, src_lang, tgt_lang, raise_errors, preset)
+
+
+class TranslateFileCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patch = mock.patch('translator.models.TranslationModel', lambda model_type, precision: SlowFirstLineModel())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def translate_file(self, name, content, *args):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        output = os.path.join(self.directory, f"out-{name}")
+        call_command('translate_file', path, '--output', output, *args, stdout=io.StringIO())
+        with open(output, encoding='utf-8') as f:
+            return f.read()
+
+    def test_writes_lines_in_input_order_with_several_workers(self):
+        output = self.translate_file('a.txt', 'a\nb\nc\nd\n', '--workers', '2', '--chunk-size', '1')
+
+        self.assertEqual(output, 'A\nB\nC\nD\n')
+
+    def test_copies_the_tsv_header_and_appends_the_translated_column(self):
+        output = self.translate_file('a.tsv', 'Ruund\tFrench\nmoyo\tbonjour\nkudiokal\n', '--column', '0')
+
+        self.assertEqual(output, 'Ruund\tFrench\tfr_XX\nmoyo\tbonjour\tMOYO\nkudiokal\tKUDIOKAL\n')
+        self.assertEqual(self.translate_file('b.tsv', 'moyo\tbonjour\n', '--column', '1', '--no-header'),
+                         'moyo\tbonjour\tBONJOUR\n')
+
+    def test_resumes_from_the_checkpoint_and_rejects_another_run(self):
+        path = os.path.join(self.directory, 'a.tsv')
+        output = os.path.join(self.directory, 'out.tsv')
+        content = 'Ruund\nmoyo\ney\nmwaan\n'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # Interruption après l'en-tête et la première ligne, suivie de lignes incomplètes
+        written = 'Ruund\tfr_XX\nmoyo\tdéjà traduit\n'
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(written + 'ey\tE')
+        run = {
+            'input': path, 'input_size': len(content), 'direction': 'ruu_fr', 'column': 0, 'header': True, 'preset': None,
+        }
+        with open(f"{output}.checkpoint", 'w', encoding='utf-8') as f:
+            json.dump({'run': run, 'lines': 2, 'output_bytes': len(written.encode('utf-8'))}, f)
+
+        with self.assertRaises(CommandError):
+            call_command('translate_file', path, '--output', output, '--direction', 'fr_ruu', stdout=io.StringIO())
+        call_command('translate_file', path, '--output', output, stdout=io.StringIO())
+
+        with open(output, encoding='utf-8') as f:
+            self.assertEqual(f.read(), written + 'ey\tEY\nmwaan\tMWAAN\n')
+        self.assertFalse(os.path.exists(f"{output}.checkpoint"))
+
+
+class SlowModel(UppercaseModel):
+    def translate(self, text, src_lang="ruu_CM", tgt_lang="fr_XX", raise_errors=False, preset=None):
+        time.sleep(0.5)
+        return super().translate(text, src_lang, tgt_lang, raise_errors, preset)
+
+
+class TranslateAsyncAPIViewTests(TestCase):
+    url = '/translator/api/translate/async/'
+    payload = {'text': 'Moyo ey', 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'}
+
+    def setUp(self):
+        AdmissionController._instance = None
+        self.addCleanup(setattr, AdmissionController, '_instance', None)
+        patch = mock.patch.dict(os.environ, {'TRANSLATION_MEMORY': 'false', 'TRANSLATION_CACHE': 'false'})
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.user = User.objects.create_user(
+            username='traducteur', email='traducteur@example.com', password='secret', first_name='Kat', last_name='Mwad',
+        )
+
+    async def post(self, model, client=None):
+        with mock.patch('translator.views.translation_model', return_value=model):
+            return await (client or AsyncClient(HTTP_HOST='localhost')).post(
+                self.url, self.payload, content_type='application/json'
+            )
+
+    async def test_translates_or_refuses_with_retry_after(self):
+        response = await self.post(UppercaseModel())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['translation'], 'MOYO EY')
+
+        with mock.patch.object(InferenceExecutor, 'saturated', return_value=True):
+            saturated = await self.post(UppercaseModel())
+        self.assertEqual(saturated.status_code, 429)
+        self.assertIn('Retry-After', saturated)
+
+        with mock.patch.dict(os.environ, {'TRANSLATION_REQUEST_TIMEOUT': '0.05'}):
+            expired = await self.post(SlowModel())
+        self.assertEqual(expired.status_code, 503)
+        self.assertIn('Retry-After', expired)
+
+    async def test_requires_the_csrf_token_for_session_requests_only(self):
+        client = AsyncClient(HTTP_HOST='localhost', enforce_csrf_checks=True)
+        self.assertEqual((await self.post(UppercaseModel(), client)).status_code, 200)
+
+        await client.aforce_login(self.user)
+        self.assertEqual((await self.post(UppercaseModel(), client)).status_code, 403)
+
+
+class VocabPruningTests(TestCase):
+    def test_pruned_model_scores_kept_tokens_like_the_full_model(self):
+        from transformers import MBartConfig, MBartForConditionalGeneration
+
+        torch.manual_seed(0)
+        config = MBartConfig(
+            vocab_size=40, d_model=16, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2,
+            decoder_attention_heads=2, encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=32,
+        )
+        full = MBartForConditionalGeneration(config).eval()
+        kept_ids = [0, 1, 2, 3, 7, 11, 25, 39]
+        vocab_map = VocabMap(kept_ids, unk_token_id=3)
+        pruned = prune_model(copy.deepcopy(full), kept_ids)
+
+        input_ids = torch.tensor([[0, 7, 25, 2]])
+        decoder_input_ids = torch.tensor([[2, 39, 11]])
+        with torch.no_grad():
+            expected = full(input_ids=input_ids, decoder_input_ids=decoder_input_ids).logits[..., kept_ids]
+            logits = pruned(
+                input_ids=torch.tensor([vocab_map.model_ids(input_ids[0].tolist())]),
+                decoder_input_ids=torch.tensor([vocab_map.model_ids(decoder_input_ids[0].tolist())]),
+            ).logits
+
+        self.assertEqual(vocab_map.model_ids([7, 39, 8, 500]), [4, 7, 3, 3])
+        self.assertEqual(vocab_map.tokenizer_ids(torch.tensor([4, 7])).tolist(), [7, 39])
+        self.assertTrue(torch.allclose(logits, expected, atol=1e-5))
+
+
+class TranslationMemoryTests(TestCase):
+    def setUp(self):
+        TranslationMemory._instance = None
+        self.addCleanup(setattr, TranslationMemory, '_instance', None)
+        fd, self.path = tempfile.mkstemp(suffix='.tsv')
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write("Ruund\tFrench\nMoyo ey\tBonjour\n")
+        patcher = mock.patch.object(TranslationMemory, 'tsv_sources', return_value={self.path: 'ruu_CM'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_finds_exact_pairs_in_both_directions(self):
+        memory = TranslationMemory()
+
+        self.assertEqual(memory.lookup(' moyo  EY ', 'ruu_CM', 'fr_XX'), MemoryMatch('Bonjour', self.path, 'Moyo ey'))
+        self.assertEqual(memory.lookup('Bonjour', 'fr_XX', 'ruu_CM').translation, 'Moyo ey')
+        self.assertIsNone(memory.lookup('Moyo', 'ruu_CM', 'fr_XX'))
+
+    def test_picks_up_new_contributions_and_tsv_lines(self):
+        memory = TranslationMemory()
+        memory.lookup('Bonjour', 'fr_XX', 'ruu_CM')
+
+        staff = User.objects.create_user(
+            username='equipe', email='equipe@example.com', password='secret',
+            first_name='Kat', last_name='Mwad', is_staff=True,
+        )
+        user = User.objects.create_user(
+            username='contributeur', email='contributeur@example.com', password='secret',
+            first_name='Nawej', last_name='Mbay',
+        )
+        language = Language.objects.create(name='Ruund', code='ruund')
+        ContributionText.objects.create(user=staff, language=language, phrase_native='Tuyaak', phrase_french='Allons-y')
+        ContributionText.objects.create(user=user, language=language, phrase_native='Tuyend', phrase_french='Partons')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("Kuyaak\tPartir\n")
+        memory.refresh(force=True)
+
+        self.assertEqual(memory.lookup('Allons-y', 'fr_XX', 'ruu_CM'), MemoryMatch('Tuyaak', 'contributions', 'Allons-y'))
+        self.assertEqual(memory.lookup('Kuyaak', 'ruu_CM', 'fr_XX').translation, 'Partir')
+        # Contributions non modérées d'un non-membre de l'équipe : pas indexées par défaut
+        self.assertIsNone(memory.lookup('Partons', 'fr_XX', 'ruu_CM'))
+
+
+class NgramIndexTests(TestCase):
+    def test_ranks_pairs_by_character_ngram_similarity(self):
+        sources = ['Moyo ey mwaan', 'Akandiling payaaw', 'Tuyaak ku chikolu', 'Moyo']
+        index = NgramIndex([MemoryMatch(text.upper(), 'test', text) for text in sources])
+
+        results = index.search('moyo ey mwan', k=2)
+
+        query = char_ngrams('moyo ey mwan')
+        expected = [
+            2 * len(query & char_ngrams(text)) / (len(query) + len(char_ngrams(text)))
+            for text in ('Moyo ey mwaan', 'Moyo')
+        ]
+        self.assertEqual([match.source_text for _, match in results], ['Moyo ey mwaan', 'Moyo'])
+        self.assertEqual([score for score, _ in results], expected)
+
+
+class MetricsViewTests(TestCase):
+    def test_exposes_request_metrics_and_honours_token(self):
+        client = Client(HTTP_HOST='localhost')
+        client.get('/translator/api/suggest/')
+
+        with mock.patch.dict(os.environ, {'METRICS_TOKEN': 'secret'}):
+            self.assertEqual(client.get('/metrics').status_code, 401)
+            response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",status="4xx",view="translator:api_suggest"}',
+            response.content.decode(),
+        )
+
+
+class ServerTimingTests(TestCase):
+    def test_reports_phases_and_restricts_profiling_to_admins(self):
+        client = Client(HTTP_HOST='localhost')
+        payload = {'text': 'Moyo ey', 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'}
+        with mock.patch('translator.views.translation_model', return_value=UppercaseModel()):
+            response = client.post('/translator/api/translate/', payload, content_type='application/json')
+            refused = client.post('/translator/api/translate/?profile=cprofile', payload, content_type='application/json')
+
+        self.assertEqual(response.json()['translation'], 'MOYO EY')
+        self.assertRegex(response['Server-Timing'], r'total;dur=\d+\.\d$')
+        self.assertEqual(refused.status_code, 403)
+
+
+class TinyModelTests(TestCase):
+    def test_translates_with_locally_built_stand_in(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+
+        with mock.patch.dict(os.environ, {'MODEL_RUU_FR': directory.name, 'TRANSLATION_MEMORY': 'false'}):
+            model = TranslationModel(model_type='ruu_fr')
+            try:
+                translation = model.translate("Moyo ey mwaan.", 'ruu_CM', 'fr_XX', raise_errors=True, preset='fast')
+            finally:
+                TranslationModel.unload('ruu_fr')
+
+        self.assertEqual(model.model_id, directory.name)
+        self.assertTrue(translation)
+
+
+class TranslationStreamTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        self.model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        patch = mock.patch.dict(os.environ, {'TRANSLATION_MEMORY': 'false', 'TRANSLATION_CACHE': 'false'})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_sends_token_events_then_the_full_translation(self):
+        payload = {'text': 'Moyo ey mwaan. Moyo!', 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'}
+
+        with mock.patch('translator.views.translation_model', return_value=self.model):
+            response = Client(HTTP_HOST='localhost').post(
+                '/translator/api/translate/stream/', payload, content_type='application/json'
+            )
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block.split('\n', 1) for block in body.split('\n\n') if block]
+        names = [name for name, _ in events]
+        data = [json.loads(line.removeprefix('data: ')) for _, line in events]
+        self.assertEqual(set(names[:-1]), {'event: token'})
+        self.assertEqual(names[-1], 'event: done')
+        self.assertEqual(data[-1]['translation'], ''.join(event['text'] for event in data[:-1]))
+        self.assertEqual(data[-1]['source'], 'model')
+
+    def test_closing_the_stream_stops_the_generation(self):
+        stops = []
+
+        def stopping_criteria(event):
+            stops.append(event)
+            return StopOnEvent(event)
+
+        with mock.patch('translator.models.StopOnEvent', side_effect=stopping_criteria):
+            stream = self.model.translate_stream('Moyo ey mwaan.', 'ruu_CM', 'fr_XX')
+            self.assertTrue(next(stream))
+            stream.close()
+
+        self.assertTrue(stops[0].is_set())
+
+
+class SharedTokenizerTests(TestCase):
+    def test_encode_keeps_each_call_language_across_threads(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        src_lang = model.tokenizer.src_lang
+        texts = {'ruu_CM': 'Aburaham wamuvala Isak.', 'fr_XX': 'Abraham engendra Isaac.'}
+        expected = {}
+        for lang, text in texts.items():
+            reference = copy.deepcopy(model.tokenizer)
+            reference.src_lang = lang
+            expected[lang] = reference(text)['input_ids']
+            self.assertEqual(model.encode([text], lang)['input_ids'][0].tolist(), expected[lang])
+
+        mismatches = []
+
+        def encode(lang):
+            for _ in range(50):
+                ids = model.encode([texts[lang]], lang)['input_ids'][0].tolist()
+                if ids != expected[lang]:
+                    mismatches.append((lang, ids))
+
+        threads = [threading.Thread(target=encode, args=(lang,)) for lang in list(texts) * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mismatches, [])
+        self.assertEqual(model.tokenizer.src_lang, src_lang)
+
+
+class BidirectionalCheckpointTests(TestCase):
+    def test_both_directions_share_weights_and_batching_queue(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+
+        with mock.patch.dict(os.environ, {'MODEL_BIDIRECTIONAL': directory.name, 'TRANSLATION_MEMORY': 'false'}):
+            ruu_fr, fr_ruu = TranslationModel(model_type='ruu_fr'), TranslationModel(model_type='fr_ruu')
+            try:
+                translations = [
+                    ruu_fr.translate("Moyo ey mwaan.", 'ruu_CM', 'fr_XX', raise_errors=True, preset='fast'),
+                    fr_ruu.translate("Bonjour à tous.", 'fr_XX', 'ruu_CM', raise_errors=True, preset='fast'),
+                ]
+                scheduler = BatchScheduler(model_type='ruu_fr')
+                self.assertIs(BatchScheduler(model_type='fr_ruu'), scheduler)
+            finally:
+                TranslationModel.unload('ruu_fr')
+
+        self.assertIs(ruu_fr, fr_ruu)
+        self.assertTrue(all(translations))
+
+
+class SourceLookupTests(TestCase):
+    def test_drafts_follow_the_copied_span_in_the_source(self):
+        stats = DraftStats()
+        generator = SourceLookupCandidateGenerator(
+            torch.tensor([9, 5, 6, 7, 5, 8, 2]), num_output_tokens=2, max_length=20, stats=stats
+        )
+
+        candidates, _ = generator.get_candidates(torch.tensor([[2, 1, 5]]))
+        self.assertEqual(candidates[0, 3:].tolist(), [6, 7])
+        generator.update_candidate_strategy(candidates, None, torch.tensor(2))
+        # « 5 » apparaît deux fois : l'occurrence après le passage déjà copié est préférée
+        candidates, _ = generator.get_candidates(torch.tensor([[2, 1, 5, 6, 7, 3, 5]]))
+        self.assertEqual(candidates[0, 7:].tolist(), [8, 2])
+        generator.update_candidate_strategy(candidates, None, torch.tensor(0))
+
+        self.assertEqual(stats.as_dict(), {'calls': 0, 'proposed': 4, 'accepted': 2, 'acceptance_rate': 0.5})
+
+    def test_lookup_preset_matches_greedy_decoding(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        source = ["Aburaham wamuvala Isak, Isak wamuvala Jakob."]
+
+        with observed_drafts() as drafts:
+            translation = model._generate(source, 'ruu_CM', 'fr_XX', preset='lookup')
+
+        self.assertEqual(translation, model._generate(source, 'ruu_CM', 'fr_XX', preset='fast'))
+        self.assertEqual(drafts.calls, 1)
+
+    def test_lookup_preset_falls_back_to_greedy_without_the_private_hook(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        source = ["Aburaham wamuvala Isak, Isak wamuvala Jakob."]
+        greedy = model._generate(source, 'ruu_CM', 'fr_XX', preset='fast')
+
+        with self.assertLogs('translator.drafting', 'WARNING'):
+            self.assertFalse(install_source_lookup(object()))
+        model.source_lookup = False
+        with observed_drafts() as drafts:
+            translation = model._generate(source, 'ruu_CM', 'fr_XX', preset='lookup')
+
+        self.assertEqual(translation, greedy)
+        self.assertEqual(drafts.calls, 0)
+
+
+class CompiledDecodingTests(TestCase):
+    def test_lengths_round_up_to_the_next_bucket(self):
+        self.assertEqual([bucket_length(length, (16, 32)) for length in (3, 16, 17, 40, 70)], [16, 16, 32, 64, 96])
+
+    def test_static_cache_path_matches_eager_decoding(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        model = TranslationModel._create('ruu_fr', directory.name, 'fp32')
+        source = ["Aburaham wamuvala Isak, Isak wamuvala Jakob."]
+        eager = model._generate(source, 'ruu_CM', 'fr_XX', preset='fast')
+
+        model.compiled = True
+        encoded_input = model.encode(source, 'ruu_CM', bucketed=True)
+        self.assertEqual(encoded_input['input_ids'].shape[1], 16)
+        cache = model.generation_kwargs(encoded_input, 'fast')['past_key_values']
+        self.assertEqual(cache.cross_attention_cache.max_cache_len, 16)
+        self.assertNotIn('past_key_values', model.generation_kwargs(encoded_input, 'best'))
+        # Sans torch.compile (plusieurs dizaines de secondes sur CPU) : palier et cache statique seuls
+        with mock.patch('translator.models.compile_config', return_value=None):
+            self.assertEqual(model._generate(source, 'ruu_CM', 'fr_XX', preset='fast'), eager)
+
+
+class MmapWeightsTests(TestCase):
+    def test_mmap_load_matches_from_pretrained(self):
+        from transformers import GenerationConfig, MBartForConditionalGeneration
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_tiny_model(directory.name)
+        # Réglages propres au checkpoint, absents de config.json
+        generation_config = GenerationConfig.from_pretrained(directory.name)
+        generation_config.update(num_beams=4, max_length=77)
+        generation_config.save_pretrained(directory.name)
+
+        mapped = load_mmap_model(directory.name)
+        loaded = MBartForConditionalGeneration.from_pretrained(directory.name).eval()
+        inputs = {'input_ids': torch.tensor([[0, 57, 12, 2]]), 'decoder_input_ids': torch.tensor([[2, 250]])}
+        with torch.no_grad():
+            self.assertTrue(torch.equal(mapped(**inputs).logits, loaded(**inputs).logits))
+        self.assertEqual(mapped.generation_config.to_diff_dict(), loaded.generation_config.to_diff_dict())
+        self.assertEqual(mapped.generation_config.num_beams, 4)
+        self.assertEqual(mapped.model.shared.weight.data_ptr(), mapped.lm_head.weight.data_ptr())
+
+
+class PreparedModelTests(TestCase):
+    def test_loads_prepared_artifact_with_the_source_revision(self):
+        source, root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        build_tiny_model(source.name)
+
+        with mock.patch.dict(os.environ, {'MODEL_PREPARED_DIR': root.name, 'MODEL_PREPARED': 'true'}):
+            path = prepared_model_dir(source.name)
+            model = TranslationModel._create('ruu_fr', source.name, 'fp32')
+            save_prepared(model.model, model.tokenizer, source.name, model.revision, path)
+            prepared = TranslationModel._create('ruu_fr', source.name, 'fp32')
+
+        self.assertEqual(prepared.checkpoint, path)
+        self.assertEqual(prepared.revision, model.revision)
+        self.assertEqual(
+            prepared._generate(['Moyo ey mwaan.'], 'ruu_CM', 'fr_XX', preset='fast'),
+            model._generate(['Moyo ey mwaan.'], 'ruu_CM', 'fr_XX', preset='fast'),
+        )
+
+
+class ModelWarmupTests(TestCase):
+    def setUp(self):
+        ModelWarmup._instance = None
+        self.addCleanup(setattr, ModelWarmup, '_instance', None)
+
+    def test_translation_and_readiness_wait_for_pinned_models(self):
+        ModelWarmup()._models['ruu_fr'] = {'model_id': 'test/model', 'state': 'loading', 'error': None, 'seconds': None}
+        client = Client(HTTP_HOST='localhost')
+        payload = {'text': 'Moyo ey', 'src_lang': 'ruu_CM', 'tgt_lang': 'fr_XX'}
+
+        with mock.patch.dict(os.environ, {'TRANSLATION_MEMORY': 'false'}):
+            response = client.post('/translator/api/translate/', payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(client.get('/readyz').status_code, 503)
+        self.assertEqual(client.get('/healthz').json()['models']['ruu_fr']['state'], 'loading')
+
+
+class InferenceServerTests(TestCase):
+    def setUp(self):
+        InferenceClient._instance = None
+        self.addCleanup(setattr, InferenceClient, '_instance', None)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'inference.sock')
+
+    def test_remote_model_round_trip_and_unreachable_server(self):
+        server = InferenceServer(self.path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        model = RemoteTranslationModel('ruu_fr')
+        with mock.patch.dict(os.environ, {'TRANSLATION_INFERENCE_SOCKET': self.path}), \
+                mock.patch('translator.remote.TranslationModel', lambda model_type: UppercaseModel()):
+            self.assertEqual(model.translate_batch(['moyo', 'ey']), ['MOYO', 'EY'])
+            self.assertTrue(InferenceClient().status()[self.path]['ready'])
+
+            server.shutdown()
+            server.server_close()
+            InferenceClient._instance = None
+            with self.assertRaises(ModelNotReady) as raised:
+                model.translate_batch(['moyo'])
+        self.assertEqual(raised.exception.state, 'unavailable')
@@ -0,0 +1,54 @@
+import os
+from collections import Counter
+
+import torch
+from transformers import MBart50Tokenizer, MBartConfig, MBartForConditionalGeneration
+
+from .utils import load_parallel_pairs
+
+# Caractères isolés ajoutés au vocabulaire : tout texte du corpus reste tokenisable sans <unk>
+FALLBACK_CHARS = "abcdefghijklmnopqrstuvwxyzéèêàâùûîïôçœ.,;:!?'’‘«»()-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def build_tiny_model(path, vocab_size=3000, d_model=64, layers=2, seed=0):
+    """
+    Enregistre dans path un MBartForConditionalGeneration initialisé aléatoirement (graine fixe)
+    et son tokenizer, construit à partir des mots du corpus parallèle. Les chemins de code sont
+    ceux des vrais checkpoints (mBART-50, codes de langue fr_XX et ruu_CM) sans passer par
+    Hugging Face : les traductions n'ont pas de sens, seule la mesure des performances en a.
+    """
+    counts = Counter(
+        f"▁{word}" for pair in load_parallel_pairs() for column in pair for word in column.split()
+    )
+    pieces = [('<unk>', 0.0), ('<s>', 0.0), ('</s>', 0.0)]
+    pieces += [(word, -1.0 - rank / 1000) for rank, (word, _) in enumerate(counts.most_common(vocab_size))]
+    for char in FALLBACK_CHARS:
+        pieces += [(char, -20.0), (f"▁{char}", -20.0)]
+    seen = set()
+    pieces = [piece for piece in pieces if not (piece[0] in seen or seen.add(piece[0]))]
+
+    tokenizer = MBart50Tokenizer(vocab=pieces, src_lang='fr_XX')
+    tokenizer.add_special_tokens({'additional_special_tokens': ['ruu_CM']})
+
+    torch.manual_seed(seed)
+    config = MBartConfig(
+        vocab_size=len(tokenizer), d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+        encoder_attention_heads=4, decoder_attention_heads=4, encoder_ffn_dim=2 * d_model,
+        decoder_ffn_dim=2 * d_model, max_position_embeddings=1024,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2,
+    )
+    model = MBartForConditionalGeneration(config)
+    # Jamais de token spécial au milieu d'une traduction ; la fin de phrase reste improbable, si bien
+    # que les sorties atteignent max_new_tokens : le coût ne dépend que de la longueur de l'entrée
+    special_ids = [
+        token_id for token, token_id in tokenizer.get_vocab().items()
+        if token in tokenizer.lang_code_to_id or token in ('ruu_CM', '<s>', '<pad>', '<mask>', '<unk>')
+    ]
+    with torch.no_grad():
+        model.final_logits_bias[0, special_ids] = -1e4
+        model.final_logits_bias[0, config.eos_token_id] = -3.0
+
+    os.makedirs(path, exist_ok=True)
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
@@ -1,9 +1,18 @@
 from django.urls import path
-from .views import TranslatorView, TranslateAPIView
+from .views import (
+    TranslatorView, TranslateAPIView, TranslateAsyncAPIView, TranslateBatchAPIView, TranslateStreamAPIView,
+    SuggestAPIView, ModelRegistryAPIView, InferenceStatsAPIView,
+)
 
 app_name = 'translator'
 
 urlpatterns = [
     path('', TranslatorView.as_view(), name='index'),
     path('api/translate/', TranslateAPIView.as_view(), name='api_translate'),
+    path('api/translate/async/', TranslateAsyncAPIView.as_view(), name='api_translate_async'),
+    path('api/translate/stream/', TranslateStreamAPIView.as_view(), name='api_translate_stream'),
+    path('api/translate/batch/', TranslateBatchAPIView.as_view(), name='api_translate_batch'),
+    path('api/suggest/', SuggestAPIView.as_view(), name='api_suggest'),
+    path('api/models/', ModelRegistryAPIView.as_view(), name='api_models'),
+    path('api/inference/', InferenceStatsAPIView.as_view(), name='api_inference'),
 ]
@@ -0,0 +1,81 @@
+import csv
+import os
+import random
+import resource
+
+import torch
+from django.conf import settings
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche sur une liste de durées"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_parallel_pairs(path=None):
+    """
+    Paires (Ruund, Français) du corpus parallèle, en ignorant l'en-tête
+    et les lignes incomplètes.
+    """
+    path = path or settings.BASE_DIR / 'corpus' / 'both' / 'ruund-french.tsv'
+    pairs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) >= 2 and row[0].strip() and row[1].strip():
+                pairs.append((row[0].strip(), row[1].strip()))
+    if pairs and pairs[0] == ('Ruund', 'French'):
+        pairs = pairs[1:]
+    return pairs
+
+
+# Le corpus parallèle commence par des proverbes ; les versets du Nouveau Testament suivent,
+# à partir de ce titre de Matthieu 1
+VERSES_START = 'Angakiril a Yesu Kristu'
+
+
+def verse_pairs():
+    """Paires (Ruund, Français) de la partie biblique du corpus parallèle"""
+    pairs = load_parallel_pairs()
+    start = next((i for i, (ruund, _) in enumerate(pairs) if ruund == VERSES_START), 0)
+    return pairs[start:]
+
+
+def sample_pairs(model_type, size, seed=42, verses=False):
+    """Échantillon reproductible de (source, référence) selon la direction, éventuellement limité aux versets"""
+    pairs = verse_pairs() if verses else load_parallel_pairs()
+    random.Random(seed).shuffle(pairs)
+    if model_type == 'fr_ruu':
+        pairs = [(french, ruund) for ruund, french in pairs]
+    return pairs[:size]
+
+
+def current_rss_bytes():
+    """Mémoire résidente actuelle du processus (Linux), sinon le pic connu"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def model_size_bytes(model):
+    """
+    Taille des poids et buffers, y compris les poids empaquetés des couches quantifiées.
+    Les poids liés (embeddings partagés, tête LM) ne sont comptés qu'une fois.
+    """
+    seen = set()
+
+    def tensor_bytes(value):
+        if isinstance(value, torch.Tensor):
+            key = (value.data_ptr(), value.numel(), value.dtype)
+            if value.data_ptr() and key in seen:
+                return 0
+            seen.add(key)
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(item) for item in value)
+        return 0
+
+    return sum(tensor_bytes(value) for value in model.state_dict().values())
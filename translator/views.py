@@ -1,13 +1,36 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
 import logging
+import os
 import time
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import TranslateSerializer
-from .models import TranslationModel
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAdminUser
+from .serializers import SuggestSerializer, TranslateSerializer, TranslateBatchSerializer
+from .admission import (
+    AdmissionController, QuotaExceeded, admitted, client_key, page_token, request_class, request_timeout,
+)
+from .batching import BatchScheduler, batching_enabled
+from .drafting import observed_drafts
+from .memory import lookup_memory, observed_memory
+from .metrics import render_metrics
+from .profiling import PROFILE_KINDS, ServerTiming, observed_request, server_timing
+from .inference import DeadlineExceeded, InferenceExecutor, InferenceQueueFull
+from .registry import ModelRegistry, model_type_for_pair
+from .remote import InferenceClient, inference_sockets, translation_model
+from .suggest import TranslationSuggester
+from .warmup import FAILED, WARMUP_RETRY_AFTER_SECONDS, ModelNotReady, ModelWarmup
 from django.utils.translation import gettext_lazy as _
 
 logger = logging.getLogger(__name__)
@@ -18,35 +41,449 @@ class TranslatorView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = _("Traducteur Ruund - Français")
+        # Les traductions demandées depuis la page passent en priorité interactive
+        context['page_token'] = page_token(client_key(self.request, self.request.user))
         return context
 
+def profile_error(request):
+    """Réponse d'erreur si ?profile= est demandé sans être administrateur ou avec un type inconnu"""
+    profile = request.query_params.get('profile')
+    if profile is None:
+        return None
+    if not request.user.is_staff:
+        return Response({'error': _("Profilage réservé aux administrateurs.")}, status=status.HTTP_403_FORBIDDEN)
+    if profile not in PROFILE_KINDS:
+        return Response({
+            'error': _("Profil inconnu : %(profile)s (%(kinds)s).") % {'profile': profile, 'kinds': ', '.join(PROFILE_KINDS)}
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def observed(process):
+    """
+    Décore post() d'une vue DRF : en-tête Server-Timing (durée de chaque phase) et,
+    avec ?profile=cprofile|torch pour un administrateur, profil de la requête dans la réponse.
+    """
+    def post(self, request):
+        error = profile_error(request)
+        if error is not None:
+            return error
+        with observed_request(request.query_params.get('profile')) as (timing, profiler):
+            response = process(self, request)
+        # Après la sortie du bloc : le profil du thread de la requête est alors arrêté
+        if profiler is not None and response.status_code == status.HTTP_200_OK:
+            response.data['profile'] = profiler.report()
+        response['Server-Timing'] = timing.header()
+        return response
+    return post
+
+
+def memory_fallback(error, text, src_lang, tgt_lang):
+    """
+    Modèle en cours de chargement : traduction validée de la mémoire s'il y en a une
+    (l'origine est relevée par lookup_memory), sinon ModelNotReady est relancée.
+    Hors de ce cas, la mémoire est consultée par le modèle, une seule fois par texte.
+    """
+    match = lookup_memory(text, src_lang, tgt_lang)
+    if match is None:
+        raise error
+    return match.translation
+
+
 class TranslateAPIView(APIView):
     """
     Endpoint API pour traiter les demandes de traduction.
     POST /translator/api/translate/
+    ?profile=cprofile|torch (administrateurs) ajoute le profil de la requête à la réponse.
     """
+    @observed
     def post(self, request):
         serializer = TranslateSerializer(data=request.data)
         if serializer.is_valid():
             text = serializer.validated_data['text']
             src_lang = serializer.validated_data['src_lang']
             tgt_lang = serializer.validated_data['tgt_lang']
+            preset = serializer.validated_data.get('preset')
+            n_best = serializer.validated_data['n_best']
             
             # Déterminer quel modèle utiliser
-            model_type = "ruu_fr" if src_lang == "ruu_CM" else "fr_ruu"
+            model_type = model_type_for_pair(src_lang, tgt_lang)
             
-            # Appel du Singleton/Manager
-            model = TranslationModel(model_type=model_type)
             request_start = time.perf_counter()
-            translation = model.translate(text, src_lang, tgt_lang)
+            alternatives = None
+            try:
+                # Brouillons du préréglage lookup, comptés pour le taux d'acceptation ;
+                # origine de la traduction (mémoire ou modèle), relevée par le modèle
+                with observed_drafts() as drafts, observed_memory() as usage:
+                    try:
+                        # Modèle local (registre) ou serveur d'inférence
+                        model = translation_model(model_type)
+                    except ModelNotReady as e:
+                        translation = memory_fallback(e, text, src_lang, tgt_lang)
+                    else:
+                        # Quota du client, classe de priorité et échéance de la requête
+                        client = client_key(request, request.user)
+                        with admitted(client, request_class(request, client), model.count_tokens(text)):
+                            if n_best > 1:
+                                # Une seule recherche en faisceau, qui renvoie les n meilleures hypothèses
+                                alternatives = model.translate_alternatives(
+                                    text, src_lang, tgt_lang, n_best=n_best, preset=preset
+                                )
+                                translation = alternatives[0]
+                            elif batching_enabled():
+                                # Regroupement avec les requêtes concurrentes de la même direction
+                                translation = BatchScheduler(model_type=model_type).translate(
+                                    text, src_lang, tgt_lang, preset=preset
+                                )
+                            else:
+                                translation = model.translate(text, src_lang, tgt_lang, preset=preset)
+            except ModelNotReady as e:
+                return not_ready_response(e)
+            except (QuotaExceeded, InferenceQueueFull, DeadlineExceeded) as e:
+                return refused_response(e)
             request_duration = time.perf_counter() - request_start
             logger.info(f"Requête traduction traitée en {request_duration:.3f}s.")
             
-            return Response({
+            data = {
                 'original': text,
                 'translation': translation,
                 'src_lang': src_lang,
-                'tgt_lang': tgt_lang
-            }, status=status.HTTP_200_OK)
+                'tgt_lang': tgt_lang,
+                **usage.source(),
+            }
+            # Un texte de la mémoire n'a que sa traduction validée
+            if alternatives is not None and len(alternatives) > 1:
+                data['alternatives'] = alternatives
+            if drafts.calls:
+                data['drafts'] = drafts.as_dict()
+            return Response(data, status=status.HTTP_200_OK)
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def sse_event(event, data):
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class TranslateStreamAPIView(APIView):
+    """
+    Variante en flux de l'API de traduction (Server-Sent Events).
+    POST /translator/api/translate/stream/
+    Événements : « token » pour chaque morceau décodé, puis « done » avec la
+    traduction complète, ou « error ». La déconnexion du client interrompt la génération.
+    """
+    def post(self, request):
+        serializer = TranslateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        text = serializer.validated_data['text']
+        src_lang = serializer.validated_data['src_lang']
+        tgt_lang = serializer.validated_data['tgt_lang']
+
+        client = client_key(request, request.user)
+        priority = request_class(request, client)
+        try:
+            model = translation_model(model_type_for_pair(src_lang, tgt_lang))
+            tokens = model.count_tokens(text)
+        except ModelNotReady as e:
+            with observed_memory() as usage:
+                try:
+                    translation = memory_fallback(e, text, src_lang, tgt_lang)
+                except ModelNotReady:
+                    return not_ready_response(e)
+            # Traduction validée : envoyée d'un seul morceau
+            events = iter([
+                sse_event('token', {'text': translation}),
+                sse_event('done', {'translation': translation, **usage.source()}),
+            ])
+            return self.event_stream(events)
+        # Refus avant d'ouvrir le flux ; la place du client n'est réservée que pendant le décodage
+        if AdmissionController().would_refuse(client, tokens):
+            return refused_response(QuotaExceeded(_("Trop de traductions en cours pour ce client, réessayez plus tard.")))
+
+        def events():
+            request_start = time.perf_counter()
+            parts = []
+            try:
+                # Dans le générateur : le flux est consommé après le retour de la vue
+                with observed_memory() as usage, admitted(client, priority, tokens):
+                    stream = model.translate_stream(text, src_lang, tgt_lang)
+                    try:
+                        for chunk in stream:
+                            parts.append(chunk)
+                            yield sse_event('token', {'text': chunk})
+                    finally:
+                        # Appelé aussi quand le serveur ferme la réponse après une déconnexion du client
+                        stream.close()
+                yield sse_event('done', {'translation': ''.join(parts), **usage.source()})
+                logger.info(f"Requête de traduction en flux traitée en {time.perf_counter() - request_start:.3f}s.")
+            except Exception as e:
+                logger.error(f"Erreur pendant la traduction en flux ({model.model_id}): {str(e)}")
+                yield sse_event('error', {'error': f"Erreur de traduction: {str(e)}"})
+
+        return self.event_stream(events())
+
+    @staticmethod
+    def event_stream(events):
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class TranslateBatchAPIView(APIView):
+    """
+    Endpoint API pour traduire une liste de segments en un seul appel.
+    POST /translator/api/translate/batch/
+    Les traductions sont renvoyées dans l'ordre des segments reçus.
+    ?profile=cprofile|torch (administrateurs) ajoute le profil de la requête à la réponse.
+    """
+    @observed
+    def post(self, request):
+        serializer = TranslateBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        segments = serializer.validated_data['segments']
+        src_lang = serializer.validated_data['src_lang']
+        tgt_lang = serializer.validated_data['tgt_lang']
+
+        try:
+            model = translation_model(model_type_for_pair(src_lang, tgt_lang))
+            # Limite sur le volume total de tokens, pour borner le coût d'un seul appel
+            max_tokens = int(os.environ.get('TRANSLATION_BULK_MAX_TOKENS', '4096'))
+            total_tokens = sum(model.count_tokens(segment) for segment in segments)
+        except ModelNotReady as e:
+            return not_ready_response(e)
+        if total_tokens > max_tokens:
+            return Response({
+                'error': _("Trop de tokens dans la requête (%(total)d > %(max)d).") % {
+                    'total': total_tokens, 'max': max_tokens,
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        request_start = time.perf_counter()
+        batch_size = int(os.environ.get('TRANSLATION_BATCH_MAX_SIZE', '16'))
+        try:
+            # Classe bulk : servie après les requêtes interactives et API, évincée la première
+            client = client_key(request, request.user)
+            with admitted(client, request_class(request, client, bulk=True), total_tokens):
+                translations = model.translate_segments(
+                    segments, src_lang, tgt_lang, batch_size=batch_size, preset=serializer.validated_data.get('preset')
+                )
+        except ModelNotReady as e:
+            return not_ready_response(e)
+        except (QuotaExceeded, InferenceQueueFull, DeadlineExceeded) as e:
+            return refused_response(e)
+        request_duration = time.perf_counter() - request_start
+        logger.info(f"Requête de traduction en masse ({len(segments)} segments) traitée en {request_duration:.3f}s.")
+
+        return Response({
+            'translations': translations,
+            'src_lang': src_lang,
+            'tgt_lang': tgt_lang
+        }, status=status.HTTP_200_OK)
+
+
+class SuggestAPIView(APIView):
+    """
+    Paires connues proches d'un texte (recherche approchée par n-grammes de caractères).
+    GET /translator/api/suggest/?text=...&src_lang=ruu_CM&tgt_lang=fr_XX&k=5
+    """
+    def get(self, request):
+        serializer = SuggestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        text = serializer.validated_data['text']
+        src_lang = serializer.validated_data['src_lang']
+        tgt_lang = serializer.validated_data['tgt_lang']
+        suggestions = TranslationSuggester().suggest(text, src_lang, tgt_lang, k=serializer.validated_data['k'])
+        return Response({
+            'text': text,
+            'src_lang': src_lang,
+            'tgt_lang': tgt_lang,
+            'suggestions': suggestions,
+        }, status=status.HTTP_200_OK)
+
+
+class ModelRegistryAPIView(APIView):
+    """
+    État du registre des modèles (réservé aux administrateurs).
+    GET /translator/api/models/
+    Modèles chargés, mémoire des poids, temps de chargement, dernière utilisation.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(ModelRegistry().stats(), status=status.HTTP_200_OK)
+
+
+def not_ready_response(error):
+    """503 tant que le modèle se charge (avec Retry-After), ou s'il n'a pas pu être chargé"""
+    response = JsonResponse({'error': str(error), 'model_state': error.state}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if error.state != FAILED:
+        response['Retry-After'] = str(WARMUP_RETRY_AFTER_SECONDS)
+    return response
+
+
+def overloaded_response(status_code, message):
+    """Réponse de refus (429/503) avec le délai conseillé avant de réessayer"""
+    response = JsonResponse({'error': str(message)}, status=status_code)
+    response['Retry-After'] = str(InferenceExecutor().retry_after())
+    return response
+
+
+def refused_response(error):
+    """Refus du contrôle d'admission : 429 (quota du client, file pleine) ou 503 (échéance dépassée)"""
+    if isinstance(error, DeadlineExceeded):
+        return overloaded_response(status.HTTP_503_SERVICE_UNAVAILABLE, _("Délai de traduction dépassé."))
+    return overloaded_response(status.HTTP_429_TOO_MANY_REQUESTS, error)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TranslateAsyncAPIView(View):
+    """
+    Variante asynchrone de l'API de traduction, à servir via ASGI (lugayetu.asgi).
+    POST /translator/api/translate/async/
+    L'inférence passe par l'exécuteur borné : quota du client ou file pleine -> 429,
+    échéance de la requête (TRANSLATION_REQUEST_TIMEOUT) dépassée -> 503, avec Retry-After.
+    Vue Django et non APIView (asynchrone) : csrf_exempt laisse passer les clients API sans
+    cookie, et le jeton CSRF est exigé des sessions comme le fait SessionAuthentication.
+    """
+    async def post(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            try:
+                SessionAuthentication().enforce_csrf(request)
+            except PermissionDenied as e:
+                return JsonResponse({'error': str(e.detail)}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            data = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'error': _("Corps JSON invalide.")}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TranslateSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        text = serializer.validated_data['text']
+        src_lang = serializer.validated_data['src_lang']
+        tgt_lang = serializer.validated_data['tgt_lang']
+
+        client = client_key(request, user)
+        priority = request_class(request, client)
+        # Refus immédiat plutôt qu'une attente vouée au timeout
+        if InferenceExecutor().saturated(priority):
+            return overloaded_response(status.HTTP_429_TOO_MANY_REQUESTS, _("Service saturé, réessayez plus tard."))
+
+        timeout = request_timeout(priority)
+        request_start = time.perf_counter()
+        timing = ServerTiming()
+        server_timing.set(timing)
+        translate = sync_to_async(self.translate, thread_sensitive=False)
+        try:
+            alternatives, usage = await asyncio.wait_for(
+                translate(
+                    text, src_lang, tgt_lang,
+                    serializer.validated_data.get('preset'), serializer.validated_data['n_best'], client, priority,
+                ),
+                timeout,
+            )
+        except (QuotaExceeded, InferenceQueueFull) as e:
+            return overloaded_response(status.HTTP_429_TOO_MANY_REQUESTS, e)
+        except ModelNotReady as e:
+            return not_ready_response(e)
+        except (DeadlineExceeded, asyncio.TimeoutError):
+            logger.warning(f"Requête de traduction abandonnée après {time.perf_counter() - request_start:.3f}s (échéance {timeout}s).")
+            return overloaded_response(status.HTTP_503_SERVICE_UNAVAILABLE, _("Délai de traduction dépassé."))
+        except Exception as e:
+            logger.error(f"Erreur pendant la traduction asynchrone : {str(e)}")
+            return JsonResponse({'error': f"Erreur de traduction: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.info(f"Requête traduction asynchrone traitée en {time.perf_counter() - request_start:.3f}s.")
+
+        data = {
+            'original': text,
+            'translation': alternatives[0],
+            'src_lang': src_lang,
+            'tgt_lang': tgt_lang,
+            **usage.source(),
+        }
+        if len(alternatives) > 1:
+            data['alternatives'] = alternatives
+        response = JsonResponse(data)
+        response['Server-Timing'] = timing.header()
+        return response
+
+    @staticmethod
+    def translate(text, src_lang, tgt_lang, preset, n_best, client, priority):
+        """
+        (alternatives, origine des traductions) ; dans un thread, car la mémoire de
+        traduction interroge la base et le premier appel peut charger le modèle
+        """
+        with observed_memory() as usage:
+            try:
+                model = translation_model(model_type_for_pair(src_lang, tgt_lang))
+            except ModelNotReady as e:
+                return [memory_fallback(e, text, src_lang, tgt_lang)], usage
+            with admitted(client, priority, model.count_tokens(text)):
+                if n_best > 1:
+                    return model.translate_alternatives(
+                        text, src_lang, tgt_lang, n_best=n_best, raise_errors=True, preset=preset
+                    ), usage
+                return [model.translate(text, src_lang, tgt_lang, raise_errors=True, preset=preset)], usage
+
+
+class InferenceStatsAPIView(APIView):
+    """
+    État de l'exécuteur d'inférence (réservé aux administrateurs).
+    GET /translator/api/inference/
+    Générations en cours, profondeur de file par priorité, refus, évictions, échéances
+    dépassées, temps d'attente, et quotas des clients.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {**InferenceExecutor().stats(), 'admission': AdmissionController().stats()}, status=status.HTTP_200_OK
+        )
+
+
+def healthz_view(request):
+    """Vivacité : le processus répond, même pendant le chargement des modèles (état de chacun)"""
+    return JsonResponse({'status': 'ok', **ModelWarmup().stats()})
+
+
+def readyz_view(request):
+    """
+    Disponibilité : 200 quand tous les modèles préchargés sont prêts, 503 sinon. Avec un
+    serveur d'inférence, il faut aussi qu'au moins un serveur réponde et soit prêt.
+    """
+    warmup = ModelWarmup()
+    ready = warmup.ready()
+    data = warmup.stats()
+    if inference_sockets():
+        servers = InferenceClient().status()
+        data['inference_servers'] = servers
+        ready = ready and any(server is not None and server['ready'] for server in servers.values())
+    response = JsonResponse(
+        {'status': 'ready' if ready else 'not ready', **data},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    if not ready:
+        response['Retry-After'] = str(WARMUP_RETRY_AFTER_SECONDS)
+    return response
+
+
+def metrics_view(request):
+    """
+    Métriques au format Prometheus, agrégées sur les workers.
+    GET /metrics
+    Si METRICS_TOKEN est défini, l'en-tête Authorization: Bearer <jeton> est exigé.
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
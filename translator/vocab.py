@@ -0,0 +1,127 @@
+import json
+import os
+import logging
+
+import torch
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+VOCAB_MAP_FILENAME = 'vocab_map.json'
+
+
+def pruned_vocab_enabled():
+    """Chargement des checkpoints à vocabulaire réduit, activé via MODEL_PRUNED_VOCAB=true"""
+    return os.environ.get('MODEL_PRUNED_VOCAB', 'False').lower() == 'true'
+
+
+def pruned_checkpoint_dir(model_id):
+    """Dossier du checkpoint réduit d'un modèle (MODEL_PRUNED_DIR, par défaut models/pruned/)"""
+    root = os.environ.get('MODEL_PRUNED_DIR') or settings.BASE_DIR / 'models' / 'pruned'
+    return os.path.join(root, str(model_id).strip('/').replace('/', '--'))
+
+
+class VocabMap:
+    """
+    Correspondance entre les ids du tokenizer (vocabulaire complet de mBART-50) et
+    ceux d'un modèle au vocabulaire réduit : l'id i du modèle est l'id kept_ids[i]
+    du tokenizer. Les sous-mots absents du modèle sont remplacés par <unk>.
+    """
+
+    def __init__(self, kept_ids, unk_token_id):
+        self.kept_ids = list(kept_ids)
+        self.unk_token_id = unk_token_id
+        self.unk_model_id = self.kept_ids.index(unk_token_id)
+        self.to_tokenizer = torch.tensor(self.kept_ids, dtype=torch.long)
+        self.to_model = torch.full((max(self.kept_ids) + 1,), self.unk_model_id, dtype=torch.long)
+        self.to_model[self.to_tokenizer] = torch.arange(len(self.kept_ids))
+
+    def __len__(self):
+        return len(self.kept_ids)
+
+    @classmethod
+    def load(cls, path):
+        """VocabMap du dossier du checkpoint, ou None s'il n'a pas été réduit"""
+        map_path = os.path.join(path, VOCAB_MAP_FILENAME)
+        if not os.path.exists(map_path):
+            return None
+        with open(map_path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['kept_ids'], data['unk_token_id'])
+
+    def save(self, path):
+        with open(os.path.join(path, VOCAB_MAP_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump({'kept_ids': self.kept_ids, 'unk_token_id': self.unk_token_id}, f)
+
+    def model_id(self, token_id):
+        """Id du tokenizer -> id du modèle"""
+        return int(self.to_model[token_id]) if token_id < len(self.to_model) else self.unk_model_id
+
+    def model_ids(self, token_ids):
+        """Liste d'ids du tokenizer -> liste d'ids du modèle"""
+        return [self.model_id(token_id) for token_id in token_ids]
+
+    def tokenizer_ids(self, model_ids):
+        """Tenseur d'ids du modèle -> tenseur d'ids du tokenizer"""
+        return self.to_tokenizer.to(model_ids.device)[model_ids]
+
+
+def used_token_ids(tokenizer, texts, batch_size=1000):
+    """Ids du tokenizer effectivement produits par les textes, tokens spéciaux compris"""
+    used = set(tokenizer.all_special_ids)
+    used.update(getattr(tokenizer, 'lang_code_to_id', {}).values())
+    backend = getattr(tokenizer, 'backend_tokenizer', None)
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        if backend is not None:
+            for encoding in backend.encode_batch(batch, add_special_tokens=False):
+                used.update(encoding.ids)
+        else:
+            for text in batch:
+                used.update(tokenizer.convert_tokens_to_ids(tokenizer.tokenize(text)))
+    return sorted(used)
+
+
+def prune_model(model, kept_ids):
+    """
+    Réduit en place les embeddings, la tête LM et final_logits_bias de
+    MBartForConditionalGeneration aux lignes de kept_ids (ids du tokenizer),
+    et renumérote les ids spéciaux de la configuration.
+    """
+    old_vocab_size = model.get_input_embeddings().num_embeddings
+    index = torch.tensor(kept_ids, dtype=torch.long)
+    new_ids = {old_id: new_id for new_id, old_id in enumerate(kept_ids)}
+
+    # Un seul paramètre réduit par paramètre d'origine : les poids liés restent liés
+    pruned = {}
+
+    def prune(parameter):
+        if id(parameter) not in pruned:
+            pruned[id(parameter)] = torch.nn.Parameter(
+                parameter.data.index_select(0, index).clone(), requires_grad=False
+            )
+        return pruned[id(parameter)]
+
+    for module in model.modules():
+        if isinstance(module, torch.nn.Embedding) and module.num_embeddings == old_vocab_size:
+            module.weight = prune(module.weight)
+            module.num_embeddings = len(kept_ids)
+            if module.padding_idx is not None:
+                module.padding_idx = new_ids[module.padding_idx]
+        elif isinstance(module, torch.nn.Linear) and module.out_features == old_vocab_size:
+            module.weight = prune(module.weight)
+            module.out_features = len(kept_ids)
+
+    if hasattr(model, 'final_logits_bias'):
+        model.final_logits_bias = model.final_logits_bias.index_select(1, index).clone()
+
+    model.config.vocab_size = len(kept_ids)
+    for config in (model.config, model.generation_config):
+        for name in ('pad_token_id', 'bos_token_id', 'eos_token_id', 'decoder_start_token_id',
+                     'forced_bos_token_id', 'forced_eos_token_id'):
+            value = getattr(config, name, None)
+            if isinstance(value, int):
+                setattr(config, name, new_ids[value])
+            elif isinstance(value, list):
+                setattr(config, name, [new_ids[token_id] for token_id in value])
+    return model
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Délai conseillé (Retry-After) pendant le chargement des modèles
+WARMUP_RETRY_AFTER_SECONDS = 10
+
+PENDING, LOADING, READY, FAILED = 'pending', 'loading', 'ready', 'failed'
+
+
+def warmup_mode():
+    """
+    TRANSLATION_WARMUP : background (défaut) charge les paires épinglées dans un thread, les
+    autres routes répondent aussitôt ; blocking les charge pendant le démarrage, indispensable
+    avec le préchargement Gunicorn (un thread ne survit pas au fork des workers, voir
+    lugayetu.gunicorn_shared) ; off les laisse se charger à la première utilisation.
+    """
+    mode = os.environ.get('TRANSLATION_WARMUP', 'background').lower()
+    if mode not in ('background', 'blocking', 'off'):
+        raise ValueError(f"TRANSLATION_WARMUP inconnu : {mode} (attendu : background, blocking, off)")
+    return mode
+
+
+class ModelNotReady(Exception):
+    """Le modèle de la direction demandée est encore en cours de chargement, ou son chargement a échoué"""
+
+    def __init__(self, model_type, state):
+        self.model_type = model_type
+        self.state = state
+        super().__init__(f"Modèle {model_type} {'en cours de chargement' if state in (PENDING, LOADING) else 'indisponible'}.")
+
+
+class ModelWarmup:
+    """
+    Chargement des paires épinglées après le démarrage et état de chaque modèle, pour
+    /healthz, /readyz et les vues de traduction (503 tant que le modèle n'est pas prêt).
+    Les directions hors du préchargement restent chargées à leur première utilisation.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(ModelWarmup, cls).__new__(cls)
+                instance._models = {}
+                instance._lock = threading.Lock()
+                instance._thread = None
+                instance.started_at = time.time()
+                cls._instance = instance
+            return cls._instance
+
+    def start(self, blocking=False):
+        """Planifie le chargement des paires épinglées, dans un thread sauf si blocking"""
+        from .registry import model_type_for_pair, pinned_pairs
+        from .models import TranslationModel
+
+        with self._lock:
+            for src_lang, tgt_lang in pinned_pairs():
+                model_type = model_type_for_pair(src_lang, tgt_lang)
+                try:
+                    model_id, _ = TranslationModel.resolve(model_type)
+                except ValueError as e:
+                    logger.error(f"Préchargement de {src_lang} -> {tgt_lang} impossible : {e}")
+                    continue
+                self._models.setdefault(model_type, {'model_id': model_id, 'state': PENDING, 'error': None, 'seconds': None})
+        if blocking:
+            self._run()
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='model-warmup', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        from .models import TranslationModel
+
+        for model_type in list(self._models):
+            with self._lock:
+                model = self._models[model_type]
+                if model['state'] != PENDING:
+                    continue
+                model['state'] = LOADING
+            start = time.perf_counter()
+            try:
+                loaded = TranslationModel(model_type=model_type).model is not None
+                error = None if loaded else "Échec du chargement, voir les journaux."
+            except Exception as e:
+                logger.exception(f"Échec du préchargement de {model_type} : {e}")
+                loaded, error = False, str(e)
+            with self._lock:
+                model.update(state=READY if loaded else FAILED, error=error, seconds=round(time.perf_counter() - start, 3))
+            logger.info(f"Préchargement de {model_type} ({model['model_id']}) : {model['state']} en {model['seconds']}s.")
+
+    def check(self, model_type):
+        """Lève ModelNotReady si la direction fait partie du préchargement et n'est pas prête"""
+        with self._lock:
+            model = self._models.get(model_type)
+            state = model['state'] if model is not None else READY
+        if state != READY:
+            raise ModelNotReady(model_type, state)
+
+    def ready(self):
+        """Vrai quand tous les modèles préchargés sont prêts"""
+        with self._lock:
+            return all(model['state'] == READY for model in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'models': {model_type: dict(model) for model_type, model in self._models.items()},
+            }
@@ -0,0 +1,95 @@
+import json
+import mmap
+import os
+import struct
+import logging
+
+import torch
+from transformers import GenerationConfig, MBartConfig, MBartForConditionalGeneration
+
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool,
+}
+
+
+def mmap_weights_enabled():
+    """Chargement des poids par projection mémoire, activé via MODEL_MMAP_WEIGHTS=true"""
+    return os.environ.get('MODEL_MMAP_WEIGHTS', 'False').lower() == 'true'
+
+
+def resolve_safetensors(model_id, token=None):
+    """Chemin local du fichier model.safetensors (dossier local ou cache Hugging Face), sinon None"""
+    if os.path.isdir(model_id):
+        path = os.path.join(model_id, 'model.safetensors')
+        return path if os.path.exists(path) else None
+    try:
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(model_id, 'model.safetensors', token=token)
+    except Exception as e:
+        logger.info(f"Pas de model.safetensors unique pour {model_id} : {e}")
+        return None
+
+
+def mmap_safetensors(path):
+    """
+    Tenseurs d'un fichier safetensors adossés à une projection mémoire privée.
+    Les pages restent celles du cache de pages du système, partagées par tous
+    les processus qui projettent le même fichier, tant qu'elles ne sont pas modifiées.
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        # ACCESS_COPY : copie à l'écriture, le fichier n'est jamais modifié
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start)
+        tensors[name] = tensor.view(info['shape'])
+    return tensors
+
+
+def load_mmap_model(model_id, token=None, vocab_size=None):
+    """
+    Construit MBartForConditionalGeneration directement sur des poids projetés
+    en mémoire, sans copie. Retourne None si le checkpoint ne s'y prête pas
+    (pas de safetensors local, vocabulaire à redimensionner, poids manquants).
+    """
+    path = resolve_safetensors(model_id, token)
+    if path is None:
+        return None
+
+    config = MBartConfig.from_pretrained(model_id, token=token)
+    if vocab_size is not None and config.vocab_size != vocab_size:
+        logger.info(
+            f"Vocabulaire du checkpoint {model_id} ({config.vocab_size}) différent du tokenizer "
+            f"({vocab_size}) : redimensionnement nécessaire, pas de projection mémoire."
+        )
+        return None
+
+    with torch.device('meta'):
+        model = MBartForConditionalGeneration(config)
+    model.load_state_dict(mmap_safetensors(path), strict=False, assign=True)
+    # Les embeddings partagés et la tête LM ne sont pas dupliqués dans le fichier
+    model.tie_weights()
+    # Comme from_pretrained : réglages de generation_config.json s'il existe, sinon ceux de config.json
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(model_id, token=token)
+    except OSError:
+        pass
+
+    missing = [name for name, tensor in model.state_dict().items() if tensor.is_meta]
+    if missing:
+        logger.warning(f"Poids absents du checkpoint {model_id} : {missing[:5]}, pas de projection mémoire.")
+        return None
+    return model.requires_grad_(False).eval()